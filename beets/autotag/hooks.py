@@ -23,7 +23,7 @@ import re
 from beets import logging
 from beets import plugins
 from beets import config
-from beets.util import as_string
+from beets.util import as_string, par_map, LRUCache
 from beets.autotag import mb
 from jellyfish import levenshtein_distance
 from unidecode import unidecode
@@ -209,6 +209,32 @@ SD_PATTERNS = [
 SD_REPLACE = [
     (r'&', 'and'),
 ]
+# The number of normalized strings and of string distances to keep.
+SD_NORMALIZE_CACHE_SIZE = 20000
+SD_PAIR_CACHE_SIZE = 100000
+
+
+# The string forms computed while comparing strings (see
+# `_string_dist_prepare`, `_string_dist_normalize` and `_strip_pattern`)
+# and the resulting distances. Both are shared by all comparisons.
+normalize_cache = LRUCache(SD_NORMALIZE_CACHE_SIZE)
+string_dist_cache = LRUCache(SD_PAIR_CACHE_SIZE)
+
+
+def _string_dist_normalize(s):
+    """Return the form of `s` that `_string_dist_basic` compares: a
+    transliteration to lowercase ASCII letters and digits.
+    """
+    return re.sub(r'[^a-z0-9]', '', as_string(unidecode(s)).lower())
+
+
+def _levenshtein_ratio(str1, str2):
+    """Edit distance between two normalized strings, normalized by
+    their length.
+    """
+    if not str1 and not str2:
+        return 0.0
+    return levenshtein_distance(str1, str2) / float(max(len(str1), len(str2)))
 
 
 def _string_dist_basic(str1, str2):
@@ -219,58 +245,71 @@ def _string_dist_basic(str1, str2):
     """
     assert isinstance(str1, six.text_type)
     assert isinstance(str2, six.text_type)
-    str1 = as_string(unidecode(str1))
-    str2 = as_string(unidecode(str2))
-    str1 = re.sub(r'[^a-z0-9]', '', str1.lower())
-    str2 = re.sub(r'[^a-z0-9]', '', str2.lower())
-    if not str1 and not str2:
-        return 0.0
-    return levenshtein_distance(str1, str2) / float(max(len(str1), len(str2)))
+    return _levenshtein_ratio(_string_dist_normalize(str1),
+                              _string_dist_normalize(str2))
 
 
-def string_dist(str1, str2):
-    """Gives an "intuitive" edit distance between two strings. This is
-    an edit distance, normalized by the string length, with a number of
-    tweaks that reflect intuition about text.
+def _string_dist_prepare(s):
+    """Apply the steps of `string_dist` that only concern one string:
+    lowercasing, moving the `SD_END_WORDS` back to the front and the
+    `SD_REPLACE` substitutions.
     """
-    if str1 is None and str2 is None:
-        return 0.0
-    if str1 is None or str2 is None:
-        return 1.0
-
-    str1 = str1.lower()
-    str2 = str2.lower()
+    s = s.lower()
 
     # Don't penalize strings that move certain words to the end. For
     # example, "the something" should be considered equal to
     # "something, the".
     for word in SD_END_WORDS:
-        if str1.endswith(', %s' % word):
-            str1 = '%s %s' % (word, str1[:-len(word) - 2])
-        if str2.endswith(', %s' % word):
-            str2 = '%s %s' % (word, str2[:-len(word) - 2])
+        if s.endswith(', %s' % word):
+            s = '%s %s' % (word, s[:-len(word) - 2])
 
     # Perform a couple of basic normalizing substitutions.
     for pat, repl in SD_REPLACE:
-        str1 = re.sub(pat, repl, str1)
-        str2 = re.sub(pat, repl, str2)
+        s = re.sub(pat, repl, s)
+    return s
+
+
+def _strip_pattern(pat, s):
+    """Remove the matches of the regular expression `pat` from `s`.
+    """
+    return re.sub(pat, '', s)
+
+
+def _string_dist(str1, str2, forms):
+    """Compute the `string_dist` between two strings. The forms of the
+    strings used along the way (see `_string_dist_prepare`,
+    `_string_dist_normalize` and `_strip_pattern`) are computed through
+    `forms.call(func, *args)`, so that a cache can share them between
+    comparisons.
+    """
+    if str1 is None and str2 is None:
+        return 0.0
+    if str1 is None or str2 is None:
+        return 1.0
+
+    str1 = forms.call(_string_dist_prepare, str1)
+    str2 = forms.call(_string_dist_prepare, str2)
 
     # Change the weight for certain string portions matched by a set
     # of regular expressions. We gradually change the strings and build
     # up penalties associated with parts of the string that were
     # deleted.
-    base_dist = _string_dist_basic(str1, str2)
+    base_dist = _levenshtein_ratio(forms.call(_string_dist_normalize, str1),
+                                   forms.call(_string_dist_normalize, str2))
     penalty = 0.0
     for pat, weight in SD_PATTERNS:
         # Get strings that drop the pattern.
-        case_str1 = re.sub(pat, '', str1)
-        case_str2 = re.sub(pat, '', str2)
+        case_str1 = forms.call(_strip_pattern, pat, str1)
+        case_str2 = forms.call(_strip_pattern, pat, str2)
 
         if case_str1 != str1 or case_str2 != str2:
             # If the pattern was present (i.e., it is deleted in the
             # the current case), recalculate the distances for the
             # modified strings.
-            case_dist = _string_dist_basic(case_str1, case_str2)
+            case_dist = _levenshtein_ratio(
+                forms.call(_string_dist_normalize, case_str1),
+                forms.call(_string_dist_normalize, case_str2),
+            )
             case_delta = max(0.0, base_dist - case_dist)
             if case_delta == 0.0:
                 continue
@@ -286,6 +325,37 @@ def string_dist(str1, str2):
     return base_dist + penalty
 
 
+def string_dist(str1, str2):
+    """Gives an "intuitive" edit distance between two strings. This is
+    an edit distance, normalized by the string length, with a number of
+    tweaks that reflect intuition about text.
+
+    The result for recently compared strings comes from
+    `string_dist_cache`, and the forms of recently seen strings from
+    `normalize_cache`.
+    """
+    return string_dist_cache.call(_string_dist, str1, str2, normalize_cache)
+
+
+def string_dist_matrix(strs1, strs2):
+    """Compute the `string_dist` between each string in `strs1` and
+    each string in `strs2`, as a list of rows (one for each string in
+    `strs1`).
+    """
+    strs2 = list(strs2)
+    return [[string_dist(str1, str2) for str2 in strs2] for str1 in strs1]
+
+
+def log_cache_stats():
+    """Log how often the string distance caches were used.
+    """
+    for name, cache in (('string normalization', normalize_cache),
+                        ('string distance', string_dist_cache)):
+        if cache.hits or cache.misses:
+            log.debug(u'{0} cache: {1} hits, {2} misses ({3:.0%})',
+                      name, cache.hits, cache.misses, cache.hit_rate)
+
+
 class LazyClassProperty(object):
     """A decorator implementing a read-only property that is *lazy* in
     the sense that the getter is only invoked once. Subsequent accesses
@@ -573,6 +643,40 @@ def tracks_for_id(track_id):
             yield t
 
 
+def _search(search):
+    """Run a search given as a tuple of a function and its arguments and
+    return the list of its results.
+    """
+    func, args = search[0], search[1:]
+    return list(func(*args))
+
+
+def _search_mb(func, *args):
+    """Run the MusicBrainz search function `func` and return the list
+    of its results. If MusicBrainz reports an error, it is logged and
+    the search has no results.
+    """
+    try:
+        return list(func(*args))
+    except mb.MusicBrainzAPIError as exc:
+        exc.log(log)
+        return []
+
+
+def _run_searches(searches):
+    """Run the searches (see `_search`) concurrently, as many at a time
+    as the `search_workers` option allows, and generate their results
+    in the order of `searches`.
+
+    Each search runs in a single thread, so that the requests to a
+    given source stay sequential and within its rate limit.
+    """
+    workers = config['match']['search_workers'].get(int)
+    for results in par_map(_search, searches, workers):
+        for result in results:
+            yield result
+
+
 @plugins.notify_info_yielded(u'albuminfo_received')
 def album_candidates(items, artist, album, va_likely):
     """Search for album matches. ``items`` is a list of Item objects
@@ -581,24 +685,23 @@ def album_candidates(items, artist, album, va_likely):
     entered by the user. ``va_likely`` is a boolean indicating whether
     the album is likely to be a "various artists" release.
     """
+    searches = []
+
     # Base candidates if we have album and artist to match.
     if artist and album:
-        try:
-            for candidate in mb.match_album(artist, album, len(items)):
-                yield candidate
-        except mb.MusicBrainzAPIError as exc:
-            exc.log(log)
+        searches.append((_search_mb, mb.match_album, artist, album,
+                         len(items)))
 
     # Also add VA matches from MusicBrainz where appropriate.
     if va_likely and album:
-        try:
-            for candidate in mb.match_album(None, album, len(items)):
-                yield candidate
-        except mb.MusicBrainzAPIError as exc:
-            exc.log(log)
+        searches.append((_search_mb, mb.match_album, None, album,
+                         len(items)))
 
     # Candidates from plugins.
-    for candidate in plugins.candidates(items, artist, album, va_likely):
+    for plugin in plugins.find_plugins():
+        searches.append((plugin.candidates, items, artist, album, va_likely))
+
+    for candidate in _run_searches(searches):
         yield candidate
 
 
@@ -608,15 +711,15 @@ def item_candidates(item, artist, title):
     ``artist`` and ``title`` are strings and either reflect the item or
     are specified by the user.
     """
+    searches = []
 
     # MusicBrainz candidates.
     if artist and title:
-        try:
-            for candidate in mb.match_track(artist, title):
-                yield candidate
-        except mb.MusicBrainzAPIError as exc:
-            exc.log(log)
+        searches.append((_search_mb, mb.match_track, artist, title))
 
     # Plugin candidates.
-    for candidate in plugins.item_candidates(item, artist, title):
+    for plugin in plugins.find_plugins():
+        searches.append((plugin.item_candidates, item, artist, title))
+
+    for candidate in _run_searches(searches):
         yield candidate
@@ -21,8 +21,9 @@ from __future__ import division, absolute_import, print_function
 
 import datetime
 import re
+from bisect import insort
 from munkres import Munkres
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 from beets import logging
 from beets import plugins
@@ -31,6 +32,11 @@ from beets.util import plurality
 from beets.autotag import hooks
 from beets.util.enumeration import OrderedEnum
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Artist signals that indicate "various artists". These are used at the
 # album level to determine whether a given release is likely a VA
 # release and also on the track level to to remove the penalty for
@@ -95,12 +101,7 @@ def assign_items(items, tracks):
     of objects of the two types.
     """
     # Construct the cost matrix.
-    costs = []
-    for item in items:
-        row = []
-        for i, track in enumerate(tracks):
-            row.append(track_distance(item, track))
-        costs.append(row)
+    costs = assignment_costs(items, tracks)
 
     # Find a minimum-cost bipartite matching.
     log.debug('Computing track assignment...')
@@ -116,6 +117,85 @@ def assign_items(items, tracks):
     return mapping, extra_items, extra_tracks
 
 
+def assignment_costs(items, tracks):
+    """Compute the distance between each of the Items and each of the
+    TrackInfo objects. Returns a list of rows (one for each item) of
+    floats, equal to the `track_distance` of each pair.
+
+    The configuration is read once, each title is normalized once and,
+    unless plugins contribute to the track distance, the distances are
+    computed for the whole matrix at once with NumPy (if available).
+    """
+    titles = hooks.string_dist_matrix([item.title for item in items],
+                                      [track.title for track in tracks])
+    grace = config['match']['track_length_grace'].as_number()
+    length_max = config['match']['track_length_max'].as_number()
+
+    if numpy is not None and items and tracks and \
+            not plugins.track_distance_plugins():
+        return _assignment_costs_numpy(items, tracks, titles, grace,
+                                       length_max)
+
+    return [
+        [_track_distance(item, track, False, title_dist, grace,
+                         length_max).distance
+         for track, title_dist in zip(tracks, row)]
+        for item, row in zip(items, titles)
+    ]
+
+
+def _assignment_costs_numpy(items, tracks, titles, grace, length_max):
+    """Compute the matrix of `assignment_costs` with NumPy, from the
+    title distances `titles` and the track length options. Plugin
+    distances are not included. The components are added in the same
+    order as by `track_distance`, so the results are identical.
+    """
+    weights = hooks.Distance._weights
+    shape = (len(items), len(tracks))
+    raw = numpy.zeros(shape)
+    dist_max = numpy.zeros(shape)
+
+    def add(key, dist, present):
+        raw[...] += numpy.where(present, dist * weights[key], 0.0)
+        dist_max[...] += numpy.where(present, weights[key], 0.0)
+
+    def column(values, dtype=object):
+        return numpy.array(values, dtype=dtype)[:, numpy.newaxis]
+
+    def row(values, dtype=object):
+        return numpy.array(values, dtype=dtype)[numpy.newaxis, :]
+
+    # Length.
+    lengths = row([track.length or 0.0 for track in tracks], float)
+    diff = numpy.abs(column([item.length for item in items], float) -
+                     lengths) - grace
+    if length_max:
+        dist = numpy.maximum(numpy.minimum(diff, length_max), 0) / length_max
+    else:
+        dist = numpy.zeros(shape)
+    add('track_length', dist, row([bool(t.length) for t in tracks], bool))
+
+    # Title.
+    add('track_title', numpy.array(titles, dtype=float), True)
+
+    # Track index.
+    item_tracks = column([item.track for item in items])
+    changed = (item_tracks != row([t.medium_index for t in tracks])) & \
+        (item_tracks != row([t.index for t in tracks]))
+    add('track_index', changed.astype(float),
+        column([bool(item.track) for item in items], bool) &
+        row([bool(t.index) for t in tracks], bool))
+
+    # Track ID.
+    item_ids = column([item.mb_trackid for item in items])
+    add('track_id', (item_ids != row([t.track_id for t in tracks]))
+        .astype(float), item_ids.astype(bool))
+
+    costs = numpy.zeros(shape)
+    numpy.divide(raw, dist_max, out=costs, where=dist_max != 0)
+    return costs.tolist()
+
+
 def track_index_changed(item, track_info):
     """Returns True if the item and track info index is different. Tolerates
     per disc and per release numbering.
@@ -128,17 +208,28 @@ def track_distance(item, track_info, incl_artist=False):
     Distance object. `incl_artist` indicates that a distance component should
     be included for the track artist (i.e., for various-artist releases).
     """
+    return _track_distance(
+        item, track_info, incl_artist,
+        hooks.string_dist(item.title, track_info.title),
+        config['match']['track_length_grace'].as_number(),
+        config['match']['track_length_max'].as_number(),
+    )
+
+
+def _track_distance(item, track_info, incl_artist, title_dist, grace,
+                    length_max):
+    """Compute the `track_distance`, given the title distance and the
+    track length options.
+    """
     dist = hooks.Distance()
 
     # Length.
     if track_info.length:
-        diff = abs(item.length - track_info.length) - \
-            config['match']['track_length_grace'].as_number()
-        dist.add_ratio('track_length', diff,
-                       config['match']['track_length_max'].as_number())
+        diff = abs(item.length - track_info.length) - grace
+        dist.add_ratio('track_length', diff, length_max)
 
     # Title.
-    dist.add_string('track_title', item.title, track_info.title)
+    dist.add('track_title', title_dist)
 
     # Artist. Only check if there is actually an artist in the track data.
     if incl_artist and track_info.artist and \
@@ -169,7 +260,61 @@ def distance(items, album_info, mapping):
     `album_info.tracks`.
     """
     likelies, _ = current_metadata(items)
+    dist = _metadata_distance(likelies, album_info)
+
+    # Tracks.
+    dist.tracks = {}
+    for item, track in mapping.items():
+        dist.tracks[track] = track_distance(item, track, album_info.va)
+        dist.add('tracks', dist.tracks[track].distance)
+
+    # Missing tracks.
+    for i in range(len(album_info.tracks) - len(mapping)):
+        dist.add('missing_tracks', 1.0)
+
+    # Unmatched tracks.
+    for i in range(len(items) - len(mapping)):
+        dist.add('unmatched_tracks', 1.0)
+
+    # Plugins.
+    dist.update(plugins.album_distance(items, album_info, mapping))
+
+    return dist
+
+
+def distance_bound(items, album_info, likelies=None):
+    """Return a lower bound for the `distance` between `items` and
+    `album_info`, whatever the track distances are, without computing
+    the track assignment. The mapping between them is assumed to be
+    complete, as the one made by `assign_items` is. `likelies` may
+    hold the `current_metadata` of the items.
+
+    Plugins may add album distances with any weight, so there is no
+    bound if some do: the result is 0.0 then.
+    """
+    if plugins.album_distance_plugins():
+        return 0.0
+    if likelies is None:
+        likelies, _ = current_metadata(items)
+    dist = _metadata_distance(likelies, album_info)
+
+    # The penalties are added in the same order as by `distance`, so
+    # that the bound is not off by a rounding error.
+    matched = min(len(items), len(album_info.tracks))
+    for i in range(matched):
+        dist.add('tracks', 0.0)
+    for i in range(len(album_info.tracks) - matched):
+        dist.add('missing_tracks', 1.0)
+    for i in range(len(items) - matched):
+        dist.add('unmatched_tracks', 1.0)
+    return dist.distance
 
+
+def _metadata_distance(likelies, album_info):
+    """Compute the album-level part of the `distance`, which compares
+    the `current_metadata` of the items with `album_info`, as a
+    Distance object.
+    """
     dist = hooks.Distance()
 
     # Artist, if not various.
@@ -245,23 +390,6 @@ def distance(items, album_info, mapping):
         dist.add_equality('album_id', likelies['mb_albumid'],
                           album_info.album_id)
 
-    # Tracks.
-    dist.tracks = {}
-    for item, track in mapping.items():
-        dist.tracks[track] = track_distance(item, track, album_info.va)
-        dist.add('tracks', dist.tracks[track].distance)
-
-    # Missing tracks.
-    for i in range(len(album_info.tracks) - len(mapping)):
-        dist.add('missing_tracks', 1.0)
-
-    # Unmatched tracks.
-    for i in range(len(items) - len(mapping)):
-        dist.add('unmatched_tracks', 1.0)
-
-    # Plugins.
-    dist.update(plugins.album_distance(items, album_info, mapping))
-
     return dist
 
 
@@ -345,30 +473,40 @@ def _sort_candidates(candidates):
     return sorted(candidates, key=lambda match: match.distance)
 
 
-def _add_candidate(items, results, info):
-    """Given a candidate AlbumInfo object, attempt to add the candidate
-    to the output dictionary of AlbumMatch objects. This involves
-    checking the track count, ordering the items, checking for
-    duplicates, and calculating the distance.
+def _eligible(results, info):
+    """Check whether the candidate AlbumInfo object `info` may be added
+    to the dictionary of AlbumMatch objects `results`: it must have
+    tracks and the required tags, and not be there already.
     """
-    log.debug(u'Candidate: {0} - {1} ({2})',
-              info.artist, info.album, info.album_id)
-
     # Discard albums with zero tracks.
     if not info.tracks:
         log.debug(u'No tracks.')
-        return
+        return False
 
     # Don't duplicate.
     if info.album_id in results:
         log.debug(u'Duplicate.')
-        return
+        return False
 
     # Discard matches without required tags.
     for req_tag in config['match']['required'].as_str_seq():
         if getattr(info, req_tag) is None:
             log.debug(u'Ignored. Missing required tag: {0}', req_tag)
-            return
+            return False
+
+    return True
+
+
+def _add_candidate(items, results, info):
+    """Given a candidate AlbumInfo object, attempt to add the candidate
+    to the output dictionary of AlbumMatch objects. This involves
+    checking the track count, ordering the items, checking for
+    duplicates, and calculating the distance.
+    """
+    log.debug(u'Candidate: {0} - {1} ({2})',
+              info.artist, info.album, info.album_id)
+    if not _eligible(results, info):
+        return
 
     # Find mapping between the items and the track info.
     mapping, extra_items, extra_tracks = assign_items(items, info.tracks)
@@ -388,6 +526,58 @@ def _add_candidate(items, results, info):
                                               extra_items, extra_tracks)
 
 
+def _add_candidates(items, results, infos):
+    """Attempt to add each of the candidate AlbumInfo objects `infos`
+    to the dictionary of AlbumMatch objects `results` (see
+    `_add_candidate`).
+
+    If the `max_candidates` option is set, the candidates are evaluated
+    best-first by their `distance_bound`, and the ones that cannot be
+    among the best `max_candidates` (and at least two, for the
+    recommendation) are skipped without computing their track
+    assignment.
+    """
+    limit = config['match']['max_candidates'].get(int)
+    if not limit or plugins.album_distance_plugins():
+        for info in infos:
+            _add_candidate(items, results, info)
+        return
+
+    # Group the candidates by ID: the first one of each group that is
+    # not ignored is the one kept, as when adding them in order.
+    groups = OrderedDict()
+    for info in infos:
+        if info.tracks and info.album_id not in results:
+            groups.setdefault(info.album_id, []).append(info)
+
+    keep = max(limit, 2)
+    likelies, _ = current_metadata(items)
+    bounded = sorted(
+        (min(distance_bound(items, info, likelies) for info in group),
+         index, group)
+        for index, group in enumerate(groups.values())
+    )
+
+    best = sorted(m.distance.distance for m in results.values())
+    added = []
+    for i, (bound, index, group) in enumerate(bounded):
+        if len(best) >= keep and bound > best[keep - 1]:
+            log.debug(u'Skipping {0} candidates that cannot be among the '
+                      u'best {1}.', len(bounded) - i, keep)
+            break
+        for info in group:
+            _add_candidate(items, results, info)
+            if info.album_id in results:
+                insort(best, results[info.album_id].distance.distance)
+                added.append((index, info.album_id))
+                break
+
+    # Keep the order in which the candidates were found, which decides
+    # between candidates at the same distance.
+    for _, album_id in sorted(added):
+        results[album_id] = results.pop(album_id)
+
+
 def tag_album(items, search_artist=None, search_album=None,
               search_ids=[]):
     """Return a tuple of the current artist name, the current album
@@ -421,8 +611,8 @@ def tag_album(items, search_artist=None, search_album=None,
     if search_ids:
         for search_id in search_ids:
             log.debug(u'Searching for album ID: {0}', search_id)
-            for id_candidate in hooks.albums_for_id(search_id):
-                _add_candidate(items, candidates, id_candidate)
+            _add_candidates(items, candidates,
+                            list(hooks.albums_for_id(search_id)))
 
     # Use existing metadata or text search.
     else:
@@ -454,16 +644,17 @@ def tag_album(items, search_artist=None, search_album=None,
         log.debug(u'Album might be VA: {0}', va_likely)
 
         # Get the results from the data sources.
-        for matched_candidate in hooks.album_candidates(items,
-                                                        search_artist,
-                                                        search_album,
-                                                        va_likely):
-            _add_candidate(items, candidates, matched_candidate)
+        _add_candidates(items, candidates,
+                        list(hooks.album_candidates(items, search_artist,
+                                                    search_album, va_likely)))
 
     log.debug(u'Evaluating {0} candidates.', len(candidates))
     # Sort and get the recommendation.
     candidates = _sort_candidates(candidates.values())
     rec = _recommendation(candidates)
+    limit = config['match']['max_candidates'].get(int)
+    if limit:
+        candidates = candidates[:limit]
     return cur_artist, cur_album, Proposal(candidates, rec)
 
 
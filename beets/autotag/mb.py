@@ -18,7 +18,12 @@
 from __future__ import division, absolute_import, print_function
 
 import musicbrainzngs
+import json
+import os
 import re
+import sqlite3
+import threading
+import time
 import traceback
 from six.moves.urllib.parse import urljoin
 
@@ -74,16 +79,168 @@ def album_url(albumid):
     return urljoin(BASE_URL, 'release/' + albumid)
 
 
-def configure():
+def configure(processes=1):
     """Set up the python-musicbrainz-ngs module according to settings
     from the beets configuration. This should be called at startup.
+
+    When `processes` processes send requests at the same time, each of
+    them gets its share of the rate limit.
     """
+    global _cache
     hostname = config['musicbrainz']['host'].as_str()
     musicbrainzngs.set_hostname(hostname)
     musicbrainzngs.set_rate_limit(
-        config['musicbrainz']['ratelimit_interval'].as_number(),
+        config['musicbrainz']['ratelimit_interval'].as_number() * processes,
         config['musicbrainz']['ratelimit'].get(int),
     )
+    # The response cache is opened on first use.
+    with _cache_lock:
+        _cache = None
+
+
+class ResponseCache(object):
+    """A persistent cache of raw MusicBrainz responses (as returned by
+    musicbrainzngs) in an SQLite database. Responses are keyed by the
+    kind of entity, its MBID and the included subqueries. Responses
+    older than `ttl` seconds are stale, and only the `size` most recent
+    responses are kept.
+
+    The cache may be used by several threads and (forked) processes.
+    Database errors are logged and treated like cache misses.
+    """
+    # How many responses to add between removing the oldest ones.
+    prune_interval = 100
+
+    def __init__(self, path, ttl, size):
+        self.path = path
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+
+    def _connection(self):
+        # A connection must not be used in a forked process.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(util.py3_path(self.path),
+                                   check_same_thread=False)
+            conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'entity TEXT, mbid TEXT, includes TEXT, '
+                         'fetched REAL, data TEXT, '
+                         'PRIMARY KEY (entity, mbid, includes))')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_by_fetched '
+                         'ON responses (fetched)')
+            self._conn = conn
+            self._pid = os.getpid()
+            self._prune()
+        return self._conn
+
+    def _prune(self):
+        """Remove all but the `size` most recent responses.
+        """
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM responses WHERE rowid IN '
+                '(SELECT rowid FROM responses ORDER BY fetched DESC '
+                'LIMIT -1 OFFSET ?)', (self.size,)
+            )
+
+    def get(self, entity, mbid, includes, stale=False):
+        """Get a cached response, or None if there is none. Stale
+        responses are only returned if `stale` is set.
+        """
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    'SELECT fetched, data FROM responses '
+                    'WHERE entity=? AND mbid=? AND includes=?',
+                    (entity, mbid, u' '.join(includes))
+                ).fetchone()
+        except sqlite3.Error as exc:
+            log.debug(u'MusicBrainz cache not readable: {0}', exc)
+            row = None
+
+        if row and (stale or time.time() - row[0] < self.ttl):
+            self.hits += 1
+            return json.loads(row[1])
+        self.misses += 1
+        return None
+
+    def put(self, entity, mbid, includes, response):
+        """Store a response.
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO responses '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (entity, mbid, u' '.join(includes), time.time(),
+                         json.dumps(response))
+                    )
+                self._puts += 1
+                if self._puts % self.prune_interval == 0:
+                    self._prune()
+        except sqlite3.Error as exc:
+            log.debug(u'MusicBrainz cache not writable: {0}', exc)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def response_cache():
+    """Get the `ResponseCache` for lookups by MBID, or None if it is
+    disabled.
+    """
+    global _cache
+    if not config['musicbrainz']['cache'].get(bool):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                util.bytestring_path(
+                    config['musicbrainz']['cache_path'].as_filename()
+                ),
+                config['musicbrainz']['cache_ttl'].as_number() * 86400,
+                config['musicbrainz']['cache_size'].get(int),
+            )
+        return _cache
+
+
+def log_cache_stats():
+    """Log how many lookups by MBID the response cache answered.
+    """
+    if _cache is not None and (_cache.hits or _cache.misses):
+        log.debug(u'MusicBrainz cache: {0} hits, {1} misses',
+                  _cache.hits, _cache.misses)
+
+
+def _get_by_id(entity, get_func, mbid, includes):
+    """Get the raw response for the MBID of an `entity` (release or
+    recording) with the musicbrainzngs function `get_func`, unless the
+    response cache has it. In offline mode, only the cache (including
+    stale responses) is used, and None is returned for missing entries.
+    May raise musicbrainzngs errors.
+    """
+    offline = config['musicbrainz']['offline'].get(bool)
+    cache = response_cache()
+    if cache:
+        res = cache.get(entity, mbid, includes, stale=offline)
+        if res is not None:
+            return res
+    if offline:
+        log.debug(u'MusicBrainz {0} {1} not available offline.', entity, mbid)
+        return None
+
+    res = get_func(mbid, includes)
+    if cache:
+        cache.put(entity, mbid, includes, res)
+    return res
 
 
 def _preferred_alias(aliases):
@@ -408,6 +565,10 @@ def match_album(artist, album, tracks=None):
     if not any(criteria.values()):
         return
 
+    if config['musicbrainz']['offline']:
+        log.debug(u'Not searching for MusicBrainz releases offline.')
+        return
+
     try:
         log.debug(u'Searching for MusicBrainz releases with: {!r}', criteria)
         res = musicbrainzngs.search_releases(
@@ -435,6 +596,10 @@ def match_track(artist, title):
     if not any(criteria.values()):
         return
 
+    if config['musicbrainz']['offline']:
+        log.debug(u'Not searching for MusicBrainz recordings offline.')
+        return
+
     try:
         res = musicbrainzngs.search_recordings(
             limit=config['musicbrainz']['searchlimit'].get(int), **criteria)
@@ -466,14 +631,16 @@ def album_for_id(releaseid):
         log.debug(u'Invalid MBID ({0}).', releaseid)
         return
     try:
-        res = musicbrainzngs.get_release_by_id(albumid,
-                                               RELEASE_INCLUDES)
+        res = _get_by_id(u'release', musicbrainzngs.get_release_by_id,
+                         albumid, RELEASE_INCLUDES)
     except musicbrainzngs.ResponseError:
         log.debug(u'Album ID match failed.')
         return None
     except musicbrainzngs.MusicBrainzError as exc:
         raise MusicBrainzAPIError(exc, u'get release by ID', albumid,
                                   traceback.format_exc())
+    if res is None:
+        return None
     return album_info(res['release'])
 
 
@@ -486,11 +653,14 @@ def track_for_id(releaseid):
         log.debug(u'Invalid MBID ({0}).', releaseid)
         return
     try:
-        res = musicbrainzngs.get_recording_by_id(trackid, TRACK_INCLUDES)
+        res = _get_by_id(u'recording', musicbrainzngs.get_recording_by_id,
+                         trackid, TRACK_INCLUDES)
     except musicbrainzngs.ResponseError:
         log.debug(u'Track ID match failed.')
         return None
     except musicbrainzngs.MusicBrainzError as exc:
         raise MusicBrainzAPIError(exc, u'get recording by ID', trackid,
                                   traceback.format_exc())
+    if res is None:
+        return None
     return track_info(res['recording'])
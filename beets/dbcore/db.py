@@ -24,15 +24,21 @@ import threading
 import sqlite3
 import contextlib
 import collections
+import itertools
 
 import beets
+from beets import logging
 from beets.util.functemplate import Template
 from beets.util import py3_path
 from beets.dbcore import types
-from .query import MatchQuery, NullSort, TrueQuery
+from .query import MatchQuery, NullSort, TrueQuery, \
+    sqlite_regexp, sqlite_string_match
 import six
 
 
+log = logging.getLogger('beets')
+
+
 class DBAccessError(Exception):
     """The SQLite database became inaccessible.
 
@@ -58,7 +64,7 @@ class FormattedMapping(collections.Mapping):
         self.model_keys = model.keys(True)
 
     def __getitem__(self, key):
-        if key in self.model_keys:
+        if key in self.model:
             return self._get_formatted(self.model, key)
         else:
             raise KeyError(key)
@@ -134,6 +140,14 @@ class Model(object):
     terms.
     """
 
+    _indices = {}
+    """Secondary indexes on the main table, which speed up the queries
+    selecting objects by the values of some fixed fields. The keys are
+    index names and the values are sequences of the indexed columns. A
+    column may also be an SQL expression on fields, such as
+    `LOWER(title)` for an index on the case-folded titles.
+    """
+
     _types = {}
     """Optional Types for non-fixed (i.e., flexible and computed) fields.
     """
@@ -152,9 +166,11 @@ class Model(object):
     @classmethod
     def _getters(cls):
         """Return a mapping from field names to getter functions.
+
+        This is called for every field access, so implementations
+        should avoid recomputing the mapping every time. The mapping
+        may be shared and must not be modified.
         """
-        # We could cache this if it becomes a performance problem to
-        # gather the getter mapping every time.
         raise NotImplementedError()
 
     def _template_funcs(self):
@@ -217,6 +233,14 @@ class Model(object):
         if need_id and not self.id:
             raise ValueError(u'{0} has no id'.format(type(self).__name__))
 
+    def __getstate__(self):
+        """Get the object's state for pickling. The database association
+        is left out: an unpickled object has no database.
+        """
+        state = self.__dict__.copy()
+        state['_db'] = None
+        return state
+
     # Essential field accessors.
 
     @classmethod
@@ -236,7 +260,9 @@ class Model(object):
         if key in getters:  # Computed.
             return getters[key](self)
         elif key in self._fields:  # Fixed.
-            return self._values_fixed.get(key, self._type(key).null)
+            if key in self._values_fixed:
+                return self._values_fixed[key]
+            return self._type(key).null
         elif key in self._values_flex:  # Flexible.
             return self._values_flex[key]
         else:
@@ -318,7 +344,8 @@ class Model(object):
     def __contains__(self, key):
         """Determine whether `key` is an attribute on this object.
         """
-        return key in self.keys(True)
+        return key in self._fields or key in self._values_flex or \
+            key in self._getters()
 
     def __iter__(self):
         """Iterate over the available field names (excluding computed
@@ -351,56 +378,63 @@ class Model(object):
 
     # Database interaction (CRUD methods).
 
-    def store(self, fields=None):
-        """Save the object's metadata into the library database.
-        :param fields: the fields to be stored. If not specified, all fields
-        will be.
+    def _pending_changes(self, fields=None):
+        """Collect the changes to this object that have not been stored
+        and mark the object clean.
+
+        Return a tuple of three lists: (key, SQL value) pairs for the
+        dirty fixed fields among `fields` (by default, all fixed
+        fields), (key, value) pairs for the modified flexible
+        attributes, and the keys of the deleted flexible attributes.
         """
         if fields is None:
             fields = self._fields
-        self._check_db()
 
-        # Build assignments for query.
-        assignments = []
-        subvars = []
+        fixed = []
         for key in fields:
             if key != 'id' and key in self._dirty:
-                self._dirty.remove(key)
-                assignments.append(key + '=?')
-                value = self._type(key).to_sql(self[key])
-                subvars.append(value)
-        assignments = ','.join(assignments)
+                fixed.append((key, self._type(key).to_sql(self[key])))
+        flex = [(key, value) for key, value in self._values_flex.items()
+                if key in self._dirty]
+        deleted = [key for key in self._dirty
+                   if key not in self._fields and key not in self._values_flex]
+
+        self.clear_dirty()
+        return fixed, flex, deleted
+
+    def store(self, fields=None):
+        """Save the object's metadata into the library database.
+        :param fields: the fields to be stored. If not specified, all fields
+        will be.
+        """
+        self._check_db()
+        fixed, flex, deleted = self._pending_changes(fields)
 
         with self._db.transaction() as tx:
             # Main table update.
-            if assignments:
+            if fixed:
                 query = 'UPDATE {0} SET {1} WHERE id=?'.format(
-                    self._table, assignments
+                    self._table, ','.join(key + '=?' for key, _ in fixed)
                 )
-                subvars.append(self.id)
-                tx.mutate(query, subvars)
+                tx.mutate(query, [value for _, value in fixed] + [self.id])
 
             # Modified/added flexible attributes.
-            for key, value in self._values_flex.items():
-                if key in self._dirty:
-                    self._dirty.remove(key)
-                    tx.mutate(
-                        'INSERT INTO {0} '
-                        '(entity_id, key, value) '
-                        'VALUES (?, ?, ?);'.format(self._flex_table),
-                        (self.id, key, value),
-                    )
+            for key, value in flex:
+                tx.mutate(
+                    'INSERT INTO {0} '
+                    '(entity_id, key, value) '
+                    'VALUES (?, ?, ?);'.format(self._flex_table),
+                    (self.id, key, value),
+                )
 
             # Deleted flexible attributes.
-            for key in self._dirty:
+            for key in deleted:
                 tx.mutate(
                     'DELETE FROM {0} '
                     'WHERE entity_id=? AND key=?'.format(self._flex_table),
                     (self.id, key)
                 )
 
-        self.clear_dirty()
-
     def load(self):
         """Refresh the object's metadata from the library database.
         """
@@ -439,17 +473,37 @@ class Model(object):
         self._check_db(False)
 
         with self._db.transaction() as tx:
+            self._insert(tx)
+            self.store()
+
+    def _insert(self, tx):
+        """Insert a new row for the object, holding its fixed fields,
+        using the transaction `tx`. The object's `id` and `added` fields
+        are set, and its flexible attributes are left dirty: they are
+        saved by the next `store`.
+        """
+        self.added = time.time()
+        fixed = [(key, self._type(key).to_sql(self[key]))
+                 for key in self._fields
+                 if key != 'id' and self[key] is not None]
+        if fixed:
+            new_id = tx.mutate(
+                'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+                    self._table,
+                    ','.join(key for key, _ in fixed),
+                    ','.join('?' * len(fixed)),
+                ),
+                [value for _, value in fixed],
+            )
+        else:
             new_id = tx.mutate(
                 'INSERT INTO {0} DEFAULT VALUES'.format(self._table)
             )
-            self.id = new_id
-            self.added = time.time()
+        self.id = new_id
 
-            # Mark every non-null field as dirty and store.
-            for key in self:
-                if self[key] is not None:
-                    self._dirty.add(key)
-            self.store()
+        # Mark every non-null flexible attribute as dirty.
+        self._dirty = set(key for key, value in self._values_flex.items()
+                          if value is not None)
 
     # Formatting and templating.
 
@@ -495,13 +549,25 @@ class Results(object):
     """An item query result set. Iterating over the collection lazily
     constructs LibModel objects that reflect database rows.
     """
-    def __init__(self, model_class, rows, db, query=None, sort=None):
+
+    _page_size = 500
+    """The number of rows that are materialized together. The flexible
+    attributes for all the rows in a page are fetched with a single
+    query. This must stay below SQLite's limit on the number of host
+    parameters in a statement (999 by default).
+    """
+
+    def __init__(self, model_class, rows, db, query=None, sort=None,
+                 cache=True, limit=None, offset=0):
         """Create a result set that will construct objects of type
         `model_class`.
 
         `model_class` is a subclass of `LibModel` that will be
-        constructed. `rows` is a query result: a list of mappings. The
-        new objects will be associated with the database `db`.
+        constructed. `rows` is a query result: either a list of
+        mappings or, for a *streaming* result set, a callable that
+        executes the query and returns a fresh iterator over its rows
+        (e.g., a live SQLite cursor). The new objects will be
+        associated with the database `db`.
 
         If `query` is provided, it is used as a predicate to filter the
         results for a "slow query" that cannot be evaluated by the
@@ -509,53 +575,109 @@ class Results(object):
         full list of results before returning. This means it is a "slow
         sort" and all objects must be built before returning the first
         one.
+
+        If `cache` is true, materialized objects are kept so that
+        iterating over the results again does not construct them again.
+        Otherwise, every iteration walks the rows from the start (and
+        re-executes the query for streaming results), so that only the
+        current page of objects is held in memory.
+
+        `limit` and `offset` select a window of the (filtered and
+        sorted) results: the first `offset` objects are skipped and at
+        most `limit` objects are produced. They are only needed when
+        the window cannot be applied by the database, i.e., when there
+        is a slow query or a slow sort.
         """
         self.model_class = model_class
         self.rows = rows
         self.db = db
         self.query = query
         self.sort = sort
+        self.cache = cache
+        self.limit = limit
+        self.offset = offset
 
-        # We keep a queue of rows we haven't yet consumed for
-        # materialization. We preserve the original total number of
-        # rows.
-        self._rows = rows
-        self._row_count = len(rows)
+        # The number of rows, if they have already been fetched.
+        if callable(rows):
+            self._row_count = None
+        else:
+            self._row_count = len(rows)
 
-        # The materialized objects corresponding to rows that have been
-        # consumed.
+        # When caching, we keep an iterator over the rows we haven't yet
+        # consumed for materialization (or None once they are all
+        # consumed) and the materialized objects corresponding to rows
+        # that have been consumed.
+        self._rows = self._open_rows() if cache else None
         self._objects = []
 
+    def _open_rows(self):
+        """Get a new iterator over all the rows in the result set.
+        """
+        if callable(self.rows):
+            return self.rows()
+        else:
+            return iter(self.rows)
+
+    def _next_page(self, rows):
+        """Consume the next page of rows from the iterator `rows` and
+        construct their objects. Objects that do not pass the slow-query
+        predicate are dropped. Return None when the rows are exhausted.
+        """
+        with self.db.transaction(read_only=True):
+            page = list(itertools.islice(rows, self._page_size))
+            if not page:
+                return None
+            return [obj for obj in self._make_models(page)
+                    if not self.query or self.query.match(obj)]
+
+    def _stream_objects(self):
+        """Construct and generate Model objects for the query without
+        keeping them around: only one page of rows is materialized at a
+        time.
+        """
+        rows = self._open_rows()
+        try:
+            while True:
+                objects = self._next_page(rows)
+                if objects is None:
+                    break
+                for obj in objects:
+                    yield obj
+        finally:
+            if hasattr(rows, 'close'):
+                rows.close()
+
     def _get_objects(self):
         """Construct and generate Model objects for they query. The
         objects are returned in the order emitted from the database; no
         slow sort is applied.
 
         For performance, this generator caches materialized objects to
-        avoid constructing them more than once. This way, iterating over
-        a `Results` object a second time should be much faster than the
-        first.
+        avoid constructing them more than once (unless caching is
+        disabled). This way, iterating over a `Results` object a second
+        time should be much faster than the first.
         """
+        if not self.cache:
+            for obj in self._stream_objects():
+                yield obj
+            return
+
         index = 0  # Position in the materialized objects.
-        while index < len(self._objects) or self._rows:
+        while index < len(self._objects) or self._rows is not None:
             # Are there previously-materialized objects to produce?
             if index < len(self._objects):
                 yield self._objects[index]
                 index += 1
 
-            # Otherwise, we consume another row, materialize its object
-            # and produce it.
+            # Otherwise, we consume another page of rows and
+            # materialize their objects. They are produced on the next
+            # pass through the loop.
             else:
-                while self._rows:
-                    row = self._rows.pop(0)
-                    obj = self._make_model(row)
-                    # If there is a slow-query predicate, ensurer that the
-                    # object passes it.
-                    if not self.query or self.query.match(obj):
-                        self._objects.append(obj)
-                        index += 1
-                        yield obj
-                        break
+                objects = self._next_page(self._rows)
+                if objects is None:
+                    self._rows = None
+                else:
+                    self._objects.extend(objects)
 
     def __iter__(self):
         """Construct and generate Model objects for all matching
@@ -563,27 +685,58 @@ class Results(object):
         """
         if self.sort:
             # Slow sort. Must build the full list first.
-            objects = self.sort.sort(list(self._get_objects()))
-            return iter(objects)
+            objects = iter(self.sort.sort(list(self._get_objects())))
 
         else:
             # Objects are pre-sorted (i.e., by the database).
-            return self._get_objects()
+            objects = self._get_objects()
+
+        if self._sliced:
+            stop = None if self.limit is None else self.offset + self.limit
+            objects = itertools.islice(objects, self.offset, stop)
+        return objects
+
+    @property
+    def _sliced(self):
+        """Whether only a window of the objects is produced.
+        """
+        return self.limit is not None or bool(self.offset)
+
+    def _get_flex_values(self, ids):
+        """Fetch the flexible attributes for the entities with the given
+        ids. Return a dictionary mapping each id to a dictionary of
+        flexible attribute values.
+        """
+        flex_values = defaultdict(dict)
+        if not ids:
+            return flex_values
 
-    def _make_model(self, row):
-        # Get the flexible attributes for the object.
-        with self.db.transaction() as tx:
+        with self.db.transaction(read_only=True) as tx:
             flex_rows = tx.query(
-                'SELECT * FROM {0} WHERE entity_id=?'.format(
-                    self.model_class._flex_table
+                'SELECT entity_id, key, value FROM {0} '
+                'WHERE entity_id IN ({1})'.format(
+                    self.model_class._flex_table,
+                    ', '.join('?' * len(ids)),
                 ),
-                (row['id'],)
+                ids,
             )
 
+        for row in flex_rows:
+            flex_values[row['entity_id']][row['key']] = row['value']
+        return flex_values
+
+    def _make_models(self, rows):
+        """Construct Model objects for a list of rows, fetching their
+        flexible attributes in bulk.
+        """
+        flex_values = self._get_flex_values([row['id'] for row in rows])
+        return [self._make_model(row, flex_values.get(row['id'], {}))
+                for row in rows]
+
+    def _make_model(self, row, flex_values):
         cols = dict(row)
         values = dict((k, v) for (k, v) in cols.items()
                       if not k[:4] == 'flex')
-        flex_values = dict((row['key'], row['value']) for row in flex_rows)
 
         # Construct the Python object
         obj = self.model_class._awaken(self.db, values, flex_values)
@@ -592,17 +745,30 @@ class Results(object):
     def __len__(self):
         """Get the number of matching objects.
         """
-        if not self._rows:
+        if self.cache and self._rows is None and not self._sliced:
             # Fully materialized. Just count the objects.
             return len(self._objects)
 
-        elif self.query:
-            # A slow query. Fall back to testing every object.
+        elif self.query or self._sliced:
+            # A slow query or a window that could not be applied by the
+            # database. Fall back to testing every object.
             count = 0
             for obj in self:
                 count += 1
             return count
 
+        elif self._row_count is None:
+            # A fast, streaming query. Count the rows without
+            # materializing their objects. The count is not kept: the
+            # rows are fetched again on each iteration, so the table
+            # may have changed in the meantime.
+            rows = self._open_rows()
+            try:
+                return sum(1 for row in rows)
+            finally:
+                if hasattr(rows, 'close'):
+                    rows.close()
+
         else:
             # A fast query. Just count the rows.
             return self._row_count
@@ -621,7 +787,8 @@ class Results(object):
         """Get the nth item in this result set. This is inefficient: all
         items up to n are materialized and thrown away.
         """
-        if not self._rows and not self.sort:
+        if self.cache and self._rows is None and not self.sort \
+                and not self._sliced:
             # Fully materialized and already in order. Just look up the
             # object.
             return self._objects[n]
@@ -648,21 +815,38 @@ class Results(object):
 class Transaction(object):
     """A context manager for safe, concurrent access to the database.
     All SQL commands should be executed through a transaction.
+
+    A "root" transaction holds the database lock for its whole duration,
+    so transactions in different threads never overlap. When the
+    database uses write-ahead logging, transactions opened with
+    `read_only` do not take the lock, so they run concurrently with each
+    other and with a writer. The lock is taken as soon as a transaction
+    that may write is entered, so that whatever it reads cannot change
+    before it writes.
     """
-    def __init__(self, db):
+    def __init__(self, db, read_only=False):
         self.db = db
+        self.read_only = read_only
+        self._root = self
+        self._locked = False
 
     def __enter__(self):
         """Begin a transaction. This transaction may be created while
         another is active in a different thread.
         """
         with self.db._tx_stack() as stack:
-            first = not stack
             stack.append(self)
-        if first:
+            self._root = stack[0]
+        if not (self.db.wal and self.read_only):
             # Beginning a "root" transaction, which corresponds to an
-            # SQLite transaction.
-            self.db._db_lock.acquire()
+            # SQLite transaction, or the first transaction that may
+            # write within a read-only one.
+            try:
+                self._lock()
+            except Exception:
+                with self.db._tx_stack() as stack:
+                    stack.pop()
+                raise
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -673,11 +857,29 @@ class Transaction(object):
         with self.db._tx_stack() as stack:
             assert stack.pop() is self
             empty = not stack
-        if empty:
+        if empty and self._locked:
             # Ending a "root" transaction. End the SQLite transaction.
+            self._locked = False
             self.db._connection().commit()
             self.db._db_lock.release()
 
+    def _lock(self):
+        """Ensure that the root transaction holds the database lock.
+        With write-ahead logging, also start an SQLite transaction that
+        holds the write lock, so that other processes cannot commit
+        changes either.
+        """
+        if self._root._locked:
+            return
+        self.db._db_lock.acquire()
+        if self.db.wal:
+            try:
+                self.db._connection().execute('BEGIN IMMEDIATE')
+            except Exception:
+                self.db._db_lock.release()
+                raise
+        self._root._locked = True
+
     def query(self, statement, subvals=()):
         """Execute an SQL statement with substitution values and return
         a list of rows from the database.
@@ -685,10 +887,27 @@ class Transaction(object):
         cursor = self.db._connection().execute(statement, subvals)
         return cursor.fetchall()
 
+    def cursor(self, statement, subvals=()):
+        """Execute an SQL statement with substitution values and return
+        a live cursor over the resulting rows. Rows are only read from
+        the database as the cursor is consumed, which must happen in the
+        current thread.
+
+        With write-ahead logging, the cursor uses a connection of its
+        own. Its read snapshot then stays open until the cursor is
+        consumed without preventing writes from this thread.
+        """
+        if self.db.wal:
+            conn = self.db._connection(cursors=True)
+        else:
+            conn = self.db._connection()
+        return conn.execute(statement, subvals)
+
     def mutate(self, statement, subvals=()):
         """Execute an SQL statement with substitution values and return
         the row ID of the last affected row.
         """
+        self._lock()
         try:
             cursor = self.db._connection().execute(statement, subvals)
             return cursor.lastrowid
@@ -702,8 +921,23 @@ class Transaction(object):
             else:
                 raise
 
+    def mutate_many(self, statement, seq_of_subvals):
+        """Execute an SQL statement once for each sequence of
+        substitution values in `seq_of_subvals`, in a single call.
+        """
+        self._lock()
+        try:
+            self.db._connection().executemany(statement, seq_of_subvals)
+        except sqlite3.OperationalError as e:
+            if e.args[0] in ("attempt to write a readonly database",
+                             "unable to open database file"):
+                raise DBAccessError(e.args[0])
+            else:
+                raise
+
     def script(self, statements):
         """Execute a string containing multiple SQL statements."""
+        self._lock()
         self.db._connection().executescript(statements)
 
 
@@ -715,11 +949,19 @@ class Database(object):
     """The Model subclasses representing tables in this database.
     """
 
-    def __init__(self, path, timeout=5.0):
+    def __init__(self, path, timeout=5.0, wal=False):
+        """Open the database at `path`. `timeout` is how long, in
+        seconds, to wait for another connection that has locked the
+        database. If `wal` is true, the database is switched to
+        write-ahead logging and threads read concurrently; only writes
+        are serialized.
+        """
         self.path = path
         self.timeout = timeout
+        self.wal = wal
 
         self._connections = {}
+        self._cursor_connections = {}
         self._tx_stacks = defaultdict(list)
 
         # A lock to protect the _connections and _tx_stacks maps, which
@@ -733,27 +975,32 @@ class Database(object):
         # backoff algorithm in the case of contention was causing
         # whole-second sleeps (!) that would trigger its internal
         # timeout. Using this lock ensures only one SQLite transaction
-        # is active at a time.
+        # is active at a time. (In WAL mode, readers never block each
+        # other or the writer, so the lock only protects writes.)
         self._db_lock = threading.Lock()
 
         # Set up database schema.
         for model_cls in self._models:
             self._make_table(model_cls._table, model_cls._fields)
             self._make_attribute_table(model_cls._flex_table)
+            self._make_indices(model_cls._table, model_cls._indices)
 
     # Primitive access control: connections and transactions.
 
-    def _connection(self):
+    def _connection(self, cursors=False):
         """Get a SQLite connection object to the underlying database.
-        One connection object is created per thread.
+        One connection object is created per thread. If `cursors` is
+        set, get the thread's separate connection for live cursors.
         """
+        connections = self._cursor_connections if cursors \
+            else self._connections
         thread_id = threading.current_thread().ident
         with self._shared_map_lock:
-            if thread_id in self._connections:
-                return self._connections[thread_id]
+            if thread_id in connections:
+                return connections[thread_id]
             else:
                 conn = self._create_connection()
-                self._connections[thread_id] = conn
+                connections[thread_id] = conn
                 return conn
 
     def _create_connection(self):
@@ -770,8 +1017,19 @@ class Database(object):
             py3_path(self.path), timeout=self.timeout
         )
 
+        # Readers and the writer do not block one another with a
+        # write-ahead log. Syncing only at checkpoints is safe in this
+        # mode.
+        if self.wal:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+
         # Access SELECT results like dictionaries.
         conn.row_factory = sqlite3.Row
+
+        # Let query clauses evaluate Python predicates.
+        conn.create_function('regexp', 2, sqlite_regexp)
+        conn.create_function('string_match', 3, sqlite_string_match)
         return conn
 
     def _close(self):
@@ -781,6 +1039,7 @@ class Database(object):
         """
         with self._shared_map_lock:
             self._connections.clear()
+            self._cursor_connections.clear()
 
     @contextlib.contextmanager
     def _tx_stack(self):
@@ -792,11 +1051,13 @@ class Database(object):
         with self._shared_map_lock:
             yield self._tx_stacks[thread_id]
 
-    def transaction(self):
+    def transaction(self, read_only=False):
         """Get a :class:`Transaction` object for interacting directly
-        with the underlying SQLite database.
+        with the underlying SQLite database. Pass `read_only` for a
+        transaction that does not write, so that it need not wait for
+        other transactions in write-ahead logging mode.
         """
-        return Transaction(self)
+        return Transaction(self, read_only)
 
     # Schema setup and migration.
 
@@ -851,32 +1112,132 @@ class Database(object):
                     ON {0} (entity_id);
                 """.format(flex_table))
 
+    def _make_indices(self, table, indices):
+        """Create the secondary indexes `indices` on `table` (see
+        `Model._indices`) if they don't exist.
+        """
+        setup_sql = ''
+        for name, columns in sorted(indices.items()):
+            setup_sql += 'CREATE INDEX IF NOT EXISTS {0} ON {1} ({2});\n' \
+                .format(name, table, ', '.join(columns))
+        if setup_sql:
+            with self.transaction() as tx:
+                tx.script(setup_sql)
+
+    # Bulk writes.
+
+    def store_many(self, objs, fields=None):
+        """Save the changes to several objects in one transaction. This
+        is equivalent to calling `store(fields)` on each object, but
+        changes with the same shape (e.g., updates of the same set of
+        fields in a table) are written with a single `executemany`
+        call.
+        """
+        updates = defaultdict(list)
+        flex_inserts = defaultdict(list)
+        flex_deletes = defaultdict(list)
+        for obj in objs:
+            obj._check_db()
+            fixed, flex, deleted = obj._pending_changes(fields)
+            if fixed:
+                keys = tuple(key for key, _ in fixed)
+                updates[obj._table, keys].append(
+                    [value for _, value in fixed] + [obj.id]
+                )
+            for key, value in flex:
+                flex_inserts[obj._flex_table].append((obj.id, key, value))
+            for key in deleted:
+                flex_deletes[obj._flex_table].append((obj.id, key))
+
+        with self.transaction() as tx:
+            for (table, keys), subvals in updates.items():
+                tx.mutate_many(
+                    'UPDATE {0} SET {1} WHERE id=?'.format(
+                        table, ','.join(key + '=?' for key in keys)
+                    ),
+                    subvals,
+                )
+            for flex_table, subvals in flex_inserts.items():
+                tx.mutate_many(
+                    'INSERT INTO {0} '
+                    '(entity_id, key, value) '
+                    'VALUES (?, ?, ?);'.format(flex_table),
+                    subvals,
+                )
+            for flex_table, subvals in flex_deletes.items():
+                tx.mutate_many(
+                    'DELETE FROM {0} '
+                    'WHERE entity_id=? AND key=?'.format(flex_table),
+                    subvals,
+                )
+
+    def add_many(self, objs):
+        """Add several objects to the database in one transaction. Each
+        object gets one INSERT for its row; the flexible attributes of
+        all the objects are then written together (see `store_many`).
+        """
+        objs = list(objs)
+        with self.transaction() as tx:
+            for obj in objs:
+                obj._db = self
+                obj._insert(tx)
+            self.store_many(objs)
+
     # Querying.
 
-    def _fetch(self, model_cls, query=None, sort=None):
+    def _fetch(self, model_cls, query=None, sort=None, stream=False,
+               cache=None, limit=None, offset=0):
         """Fetch the objects of type `model_cls` matching the given
         query. The query may be given as a string, string sequence, a
         Query object, or None (to fetch everything). `sort` is an
         `Sort` object.
+
+        If `stream` is true, the rows are not all fetched up front:
+        they are read from a live cursor, one page at a time, as the
+        results are consumed. `cache` controls whether the resulting
+        objects are retained for iterating over the results again; by
+        default, they are unless the results are streamed.
         """
         query = query or TrueQuery()  # A null query.
         sort = sort or NullSort()  # Unsorted.
-        where, subvals = query.clause()
+        where, subvals, slow_query = query.plan(model_cls)
         order_by = sort.order_clause()
 
+        if slow_query:
+            log.debug(u'query plan for {0!r}: SQL: {1}; Python: {2!r}',
+                      query, where or u'(none)', slow_query)
+
         sql = ("SELECT * FROM {0} WHERE {1} {2}").format(
             model_cls._table,
             where or '1',
             "ORDER BY {0}".format(order_by) if order_by else '',
         )
 
-        with self.transaction() as tx:
-            rows = tx.query(sql, subvals)
+        # Push the window down to the database when no objects need to
+        # be filtered or sorted in Python first.
+        window = limit is not None or offset
+        if window and not slow_query and not sort.is_slow():
+            sql += " LIMIT ? OFFSET ?"
+            subvals = list(subvals) + [
+                -1 if limit is None else limit,
+                offset,
+            ]
+            limit, offset = None, 0
+
+        if stream:
+            def rows():
+                with self.transaction(read_only=True) as tx:
+                    return tx.cursor(sql, subvals)
+        else:
+            with self.transaction(read_only=True) as tx:
+                rows = tx.query(sql, subvals)
 
         return Results(
             model_cls, rows, self,
-            None if where else query,  # Slow query component.
+            slow_query,  # Slow query component.
             sort if sort.is_slow() else None,  # Slow sort component.
+            cache=not stream if cache is None else cache,
+            limit=limit, offset=offset,
         )
 
     def _get(self, model_cls, id):
@@ -17,6 +17,7 @@
 """
 from __future__ import division, absolute_import, print_function
 
+import copy
 import re
 from operator import mul
 from beets import util
@@ -62,6 +63,68 @@ class InvalidQueryArgumentValueError(ParsingError):
         super(InvalidQueryArgumentValueError, self).__init__(message)
 
 
+# Values that SQLite accepts as statement parameters.
+_SQL_VALUE_TYPES = six.string_types + six.integer_types + (float, bytes)
+
+
+def _overrides_classmethod(cls, name, base):
+    """Check whether `cls` provides its own class or static method
+    called `name` rather than inheriting it from `base`.
+    """
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return klass is not base and \
+                isinstance(klass.__dict__[name], (classmethod, staticmethod))
+    return False
+
+
+def _is_inherited(cls, name, base):
+    """Check whether `cls` uses the `name` method defined by `base`.
+    """
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return klass is base
+    return False
+
+
+def flex_column(model_cls, field):
+    """Get an SQL expression for the value of the flexible attribute
+    `field` of `model_cls` objects, for use in queries on the model's
+    main table. The value is NULL for objects that do not have the
+    attribute. It is cast to the SQL type of the field's `Type` so that
+    it compares like the Python value.
+    """
+    column = (u"(SELECT value FROM {0} WHERE entity_id = {1}.id "
+              u"AND key = '{2}')").format(
+        model_cls._flex_table,
+        model_cls._table,
+        field.replace(u"'", u"''"),
+    )
+    sql_type = model_cls._type(field).sql
+    if sql_type in (u'INTEGER', u'REAL'):
+        column = u'CAST({0} AS {1})'.format(column, sql_type)
+    return column
+
+
+# SQLite user functions. `Database` registers these on every connection
+# so that query clauses can call back into Python.
+
+def sqlite_regexp(pattern, value):
+    """Implement SQLite's ``pattern REGEXP value`` operator, with the
+    same semantics as `RegexpQuery`.
+    """
+    return RegexpQuery.string_match(re.compile(pattern),
+                                    util.as_string(value))
+
+
+def sqlite_string_match(name, pattern, value):
+    """Match a value using the `string_match` method of a
+    `StringFieldQuery` subclass, referred to by its `name`.
+    """
+    cls = StringFieldQuery._sql_classes[name]
+    return cls.value_match(pattern, value)
+
+
 class Query(object):
     """An abstract class representing a query into the item database.
     """
@@ -75,6 +138,22 @@ class Query(object):
         """
         return None, ()
 
+    def plan(self, model_cls):
+        """Split the query into a part that SQLite can evaluate for
+        objects of the `Model` subclass `model_cls` and a part that must
+        be evaluated in Python.
+
+        Return (clause, subvals, slow_query). `clause` and `subvals`
+        are as for `clause` (`clause` is None when no part of the query
+        can run in SQLite). `slow_query` is a query that the objects
+        selected by the clause must still match, or None.
+        """
+        clause, subvals = self.clause()
+        if clause:
+            return clause, subvals, None
+        else:
+            return None, (), self
+
     def match(self, item):
         """Check whether this query matches a given Item. Can be used to
         perform queries on arbitrary sets of Items.
@@ -114,6 +193,32 @@ class FieldQuery(Query):
             # Matching a flexattr. This is a slow query.
             return None, ()
 
+    def plan(self, model_cls):
+        if self.fast or self.field in model_cls._fields:
+            return super(FieldQuery, self).plan(model_cls)
+
+        if self.field in model_cls._getters():
+            # Computed fields are only available in Python.
+            return None, (), self
+
+        # A flexible attribute. Evaluate the column clause against a
+        # subquery that looks up the attribute's value.
+        flex_query = copy.copy(self)
+        flex_query.field = self.flex_column(model_cls)
+        clause, subvals = flex_query.col_clause()
+        if clause:
+            return clause, subvals, None
+        else:
+            return None, (), self
+
+    def flex_column(self, model_cls):
+        """Get an SQL expression for the value of this query's field as
+        a flexible attribute of `model_cls`. The value is NULL for
+        objects that do not have the attribute and is cast according to
+        the field's type.
+        """
+        return flex_column(model_cls, self.field)
+
     @classmethod
     def value_match(cls, pattern, value):
         """Determine whether the value matches the pattern. Both
@@ -170,8 +275,38 @@ class NoneQuery(FieldQuery):
 class StringFieldQuery(FieldQuery):
     """A FieldQuery that converts values to strings before matching
     them.
+
+    Subclasses that only provide a `string_match` class method (and no
+    `col_clause`) are still evaluated by SQLite: the clause calls
+    `string_match` through the `string_match` SQL function that
+    `Database` registers on its connections.
+    """
+
+    _sql_classes = {}
+    """The subclasses that can be evaluated by the `string_match` SQL
+    function, indexed by the name they are referred to with in SQL.
     """
 
+    def col_clause(self):
+        cls = type(self)
+        if not (_overrides_classmethod(cls, 'string_match',
+                                       StringFieldQuery) and
+                _is_inherited(cls, 'value_match', StringFieldQuery) and
+                _is_inherited(cls, 'match', FieldQuery) and
+                isinstance(self.pattern, _SQL_VALUE_TYPES)):
+            return None, ()
+
+        name = u'{0}.{1}'.format(cls.__module__, cls.__name__)
+        StringFieldQuery._sql_classes[name] = cls
+        return u'string_match(?, ?, {0})'.format(self.field), \
+            [name, self.pattern]
+
+    def flex_column(self, model_cls):
+        # Missing attributes match like empty strings.
+        return u"COALESCE({0}, '')".format(
+            super(StringFieldQuery, self).flex_column(model_cls)
+        )
+
     @classmethod
     def value_match(cls, pattern, value):
         """Determine whether the value matches the pattern. The value
@@ -231,6 +366,9 @@ class RegexpQuery(StringFieldQuery):
         """
         return unicodedata.normalize('NFC', s)
 
+    def col_clause(self):
+        return u'{0} REGEXP ?'.format(self.field), [self.pattern.pattern]
+
     @classmethod
     def string_match(cls, pattern, value):
         return pattern.search(cls._normalize(value)) is not None
@@ -383,6 +521,24 @@ class CollectionQuery(Query):
         clause = (' ' + joiner + ' ').join(clause_parts)
         return clause, subvals
 
+    def plan_with_joiner(self, model_cls, joiner):
+        """Plan the query as a clause joining together the clauses of
+        all subqueries with the string joiner. Unless every subquery
+        can be evaluated entirely by SQLite, the whole query is slow.
+        """
+        clause_parts = []
+        subvals = []
+        for subq in self.subqueries:
+            subq_clause, subq_subvals, subq_slow = subq.plan(model_cls)
+            if not subq_clause or subq_slow:
+                return None, (), self
+            clause_parts.append('(' + subq_clause + ')')
+            subvals += subq_subvals
+        if not clause_parts:
+            return None, (), self
+        clause = (' ' + joiner + ' ').join(clause_parts)
+        return clause, subvals, None
+
     def __repr__(self):
         return "{0.__class__.__name__}({0.subqueries!r})".format(self)
 
@@ -416,6 +572,9 @@ class AnyFieldQuery(CollectionQuery):
     def clause(self):
         return self.clause_with_joiner('or')
 
+    def plan(self, model_cls):
+        return self.plan_with_joiner(model_cls, 'or')
+
     def match(self, item):
         for subq in self.subqueries:
             if subq.match(item):
@@ -452,6 +611,29 @@ class AndQuery(MutableCollectionQuery):
     def clause(self):
         return self.clause_with_joiner('and')
 
+    def plan(self, model_cls):
+        # Evaluate in SQLite whatever subqueries we can and leave the
+        # rest to Python.
+        clause_parts = []
+        subvals = []
+        slow_queries = []
+        for subq in self.subqueries:
+            subq_clause, subq_subvals, subq_slow = subq.plan(model_cls)
+            if subq_clause:
+                clause_parts.append('(' + subq_clause + ')')
+                subvals += subq_subvals
+            if subq_slow:
+                slow_queries.append(subq_slow)
+
+        clause = ' and '.join(clause_parts) or None
+        if not slow_queries:
+            slow_query = None
+        elif len(slow_queries) == 1:
+            slow_query = slow_queries[0]
+        else:
+            slow_query = AndQuery(slow_queries)
+        return clause, subvals, slow_query
+
     def match(self, item):
         return all([q.match(item) for q in self.subqueries])
 
@@ -462,6 +644,9 @@ class OrQuery(MutableCollectionQuery):
     def clause(self):
         return self.clause_with_joiner('or')
 
+    def plan(self, model_cls):
+        return self.plan_with_joiner(model_cls, 'or')
+
     def match(self, item):
         return any([q.match(item) for q in self.subqueries])
 
@@ -483,6 +668,15 @@ class NotQuery(Query):
             # is handled by match() for slow queries.
             return clause, subvals
 
+    def plan(self, model_cls):
+        clause, subvals, slow = self.subquery.plan(model_cls)
+        if clause and not slow:
+            # A NULL result (e.g., for a missing flexible attribute)
+            # means that the subquery does not match.
+            return 'not ifnull(({0}), 0)'.format(clause), subvals, None
+        else:
+            return None, (), self
+
     def match(self, item):
         return not self.subquery.match(item)
 
@@ -916,9 +1110,31 @@ class FixedFieldSort(FieldSort):
         return "{0} {1}".format(field, order)
 
 
+class FlexFieldSort(FieldSort):
+    """Sort object to sort on a flexible attribute of `model_cls`
+    objects. The attribute's value is looked up (and cast according to
+    the field's type) in SQL, so objects without the attribute come
+    first in ascending order.
+    """
+
+    def __init__(self, model_cls, field, ascending=True,
+                 case_insensitive=True):
+        super(FlexFieldSort, self).__init__(field, ascending,
+                                            case_insensitive)
+        self.model_cls = model_cls
+
+    def order_clause(self):
+        order = "ASC" if self.ascending else "DESC"
+        field = flex_column(self.model_cls, self.field)
+        if self.case_insensitive and \
+                self.model_cls._type(self.field).sql == u'TEXT':
+            field = 'LOWER({0})'.format(field)
+        return "{0} {1}".format(field, order)
+
+
 class SlowFieldSort(FieldSort):
-    """A sort criterion by some model field other than a fixed field:
-    i.e., a computed or flexible field.
+    """A sort criterion by some model field other than a fixed or
+    flexible field: i.e., a computed field.
     """
 
     def is_slow(self):
@@ -191,9 +191,13 @@ def construct_sort_part(model_cls, part):
                                        case_insensitive)
     elif field in model_cls._fields:
         sort = query.FixedFieldSort(field, is_ascending, case_insensitive)
-    else:
-        # Flexible or computed.
+    elif field in model_cls._getters():
+        # Computed.
         sort = query.SlowFieldSort(field, is_ascending, case_insensitive)
+    else:
+        # Flexible.
+        sort = query.FlexFieldSort(model_cls, field, is_ascending,
+                                   case_insensitive)
     return sort
 
 
@@ -23,11 +23,14 @@ import os
 import re
 import pickle
 import itertools
-from collections import defaultdict
+from collections import defaultdict, deque
 from tempfile import mkdtemp
 from bisect import insort, bisect_left
 from contextlib import contextmanager
+import multiprocessing
+import multiprocessing.pool
 import shutil
+import six
 import time
 
 from beets import logging
@@ -189,6 +192,13 @@ class ImportSession(object):
         self.query = query
         self._is_resuming = dict()
 
+        # The tasks whose candidates are being looked up in worker
+        # processes, by key (see `begin_lookup`).
+        self._lookup_tasks = {}
+
+        # The `StageStats` of the last run's pipeline stages.
+        self.pipeline_stats = []
+
         # Normalize the paths.
         if self.paths:
             self.paths = list(map(normpath, self.paths))
@@ -284,6 +294,7 @@ class ImportSession(object):
         """
         self.logger.info(u'import started {0}', time.asctime())
         self.set_config(config['import'])
+        lookup_processes = self._lookup_processes()
 
         # Set up the pipeline.
         if self.query is None:
@@ -306,28 +317,79 @@ class ImportSession(object):
             # also add the music to the library database, so later
             # stages need to read and write data from there.
             if self.config['autotag']:
-                stages += [lookup_candidates(self), user_query(self)]
+                if lookup_processes:
+                    stages += [begin_lookup(self), find_candidates(),
+                               end_lookup(self)]
+                else:
+                    stages += [self._workers(u'lookup', lookup_candidates)]
+                stages += [user_query(self)]
             else:
                 stages += [import_asis(self)]
 
             # Plugin stages.
             for stage_func in plugins.import_stages():
-                stages.append(plugin_stage(self, stage_func))
-
-            stages += [manipulate_files(self)]
+                stages.append(pipeline.ordered(
+                    [plugin_stage(self, stage_func)
+                     for _ in range(self._worker_count(u'plugin'))],
+                    u'{0}.{1}'.format(stage_func.__module__,
+                                      stage_func.__name__),
+                ))
+
+            # Tasks are finalized in order, after their files have been
+            # handled.
+            stages += [self._workers(u'files', manipulate_files),
+                       finalize_tasks(self)]
 
         pl = pipeline.Pipeline(stages)
 
         # Run the pipeline.
         plugins.send('import_begin', session=self)
         try:
-            if config['threaded']:
+            if lookup_processes:
+                processes = self._worker_count(u'lookup')
+                pl.run_multiprocess(QUEUE_SIZE, processes,
+                                    _init_lookup_process, (processes,))
+            elif config['threaded']:
                 pl.run_parallel(QUEUE_SIZE)
             else:
                 pl.run_sequential()
         except ImportAbort:
             # User aborted operation. Silently stop.
             pass
+        finally:
+            self.pipeline_stats = pl.stats
+
+    def _lookup_processes(self):
+        """Return whether the candidates are looked up in worker
+        processes, as enabled by the `lookup_processes` option for
+        threaded imports.
+
+        The lookup stays in threads when plugins take part in it, since
+        they may rely on state kept in the main process.
+        """
+        if not (config['threaded'] and self.config['lookup_processes'] and
+                self.config['autotag']):
+            return False
+        names = [plugin.name for plugin in plugins.lookup_plugins()]
+        if names:
+            log.warning(u'looking up candidates in threads instead of '
+                        u'processes because of plugins: {0}',
+                        u', '.join(names))
+            return False
+        return True
+
+    def _workers(self, name, stage, *args):
+        """Create the coroutines for a pipeline stage that runs in as
+        many threads as configured in the `workers` option under
+        `name`. The stage keeps the order of the tasks.
+        """
+        count = self._worker_count(name)
+        return pipeline.ordered([stage(self, *args) for _ in range(count)])
+
+    def _worker_count(self, name):
+        """Get the number of workers configured for the stage `name`.
+        """
+        return max(self.config['workers'][name].get(int), 1)
 
     # Incremental and resumed imports
 
@@ -614,6 +676,24 @@ class ImportTask(BaseImportTask):
         self.candidates = prop.candidates
         self.rec = prop.recommendation
 
+    def take_candidates(self, copy):
+        """Take the results of `lookup_candidates` from `copy`, a copy
+        of this task (e.g., made by pickling it for another process).
+        The candidates are changed to refer to this task's items.
+        """
+        items = dict(zip(copy.items, self.items))
+        self.cur_artist = copy.cur_artist
+        self.cur_album = copy.cur_album
+        self.candidates = [
+            match._replace(
+                mapping=dict((items[item], track)
+                             for item, track in match.mapping.items()),
+                extra_items=[items[item] for item in match.extra_items],
+            )
+            for match in copy.candidates
+        ]
+        self.rec = copy.rec
+
     def find_duplicates(self, lib):
         """Return a list of albums from `lib` with the same artist and
         album name as the task.
@@ -758,6 +838,7 @@ class ImportTask(BaseImportTask):
                     displayable_path(self.album.path)
                 )
 
+        reimported_items = []
         for item in self.imported_items():
             dup_items = self.replaced_items[item]
             for dup_item in dup_items:
@@ -778,7 +859,8 @@ class ImportTask(BaseImportTask):
                     dup_item.id,
                     displayable_path(item.path)
                 )
-                item.store()
+                reimported_items.append(item)
+        lib.store_many(reimported_items)
 
     def remove_replaced(self, lib):
         """Removes all the items from the library that have the same
@@ -854,6 +936,10 @@ class SingletonImportTask(ImportTask):
         self.candidates = prop.candidates
         self.rec = prop.recommendation
 
+    def take_candidates(self, copy):
+        self.candidates = copy.candidates
+        self.rec = copy.rec
+
     def find_duplicates(self, lib):
         """Return a list of items from `lib` that have the same artist
         and title as the task.
@@ -1034,6 +1120,16 @@ class ImportTaskFactory(object):
     """Generate album and singleton import tasks for all media files
     indicated by a path.
     """
+    prefetch_dirs = 4
+    """When reading files with a pool of workers, the number of
+    directories after the current one whose files are read ahead.
+    """
+
+    read_timeout = 60
+    """The seconds to wait for a file read by the pool of workers
+    before giving up on the file.
+    """
+
     def __init__(self, toppath, session):
         """Create a new task factory.
 
@@ -1047,6 +1143,11 @@ class ImportTaskFactory(object):
         self.imported = 0  # "Real" tasks created.
         self.is_archive = ArchiveImportTask.is_archive(syspath(toppath))
 
+        # The pool reading files in parallel (if enabled) and the
+        # pending results of the reads it was given, by path.
+        self._pool = None
+        self._reads = {}
+
     def tasks(self):
         """Yield all import tasks for music found in the user-specified
         path `self.toppath`. Any necessary sentinel tasks are also
@@ -1066,19 +1167,35 @@ class ImportTaskFactory(object):
             if not archive_task:
                 return
 
-        # Search for music in the directory.
-        for dirs, paths in self.paths():
-            if self.session.config['singletons']:
-                for path in paths:
-                    tasks = self._create(self.singleton(path))
+        # Search for music in the directory. With a pool of readers,
+        # the files of the next few directories are read ahead.
+        found = self.paths()
+        workers = self.session.config['read_workers'].get(int)
+        if workers > 1:
+            self._pool = self._make_pool(workers)
+            found = self._read_ahead(found)
+        try:
+            for dirs, paths in found:
+                if self.session.config['singletons']:
+                    for path in paths:
+                        tasks = self._create(self.singleton(path))
+                        for task in tasks:
+                            yield task
+                    yield self.sentinel(dirs)
+
+                else:
+                    tasks = self._create(self.album(paths, dirs))
                     for task in tasks:
                         yield task
-                yield self.sentinel(dirs)
 
-            else:
-                tasks = self._create(self.album(paths, dirs))
-                for task in tasks:
-                    yield task
+                # Forget the reads for files that were skipped.
+                for path in paths:
+                    self._reads.pop(path, None)
+        finally:
+            if self._pool:
+                self._pool.terminate()
+                self._pool = None
+                self._reads = {}
 
         # Produce the final sentinel for this toppath to indicate that
         # it is finished. This is usually just a SentinelImportTask, but
@@ -1089,6 +1206,56 @@ class ImportTaskFactory(object):
         else:
             yield self.sentinel()
 
+    def _make_pool(self, workers):
+        """Create a pool of `workers` threads or, if configured,
+        processes to read files.
+
+        The processes are not forked from the importer, which is
+        running threads, but started afresh by the "forkserver" or
+        "spawn" method. These are not available on Python 2, where
+        threads are used instead.
+        """
+        if self.session.config['read_processes']:
+            if six.PY2:
+                log.warning(u'reading files in processes requires '
+                            u'Python 3; using threads instead')
+            else:
+                methods = multiprocessing.get_all_start_methods()
+                if 'forkserver' in methods:
+                    context = multiprocessing.get_context('forkserver')
+                else:
+                    context = multiprocessing.get_context('spawn')
+                return context.Pool(workers)
+        return multiprocessing.pool.ThreadPool(workers)
+
+    def _read_ahead(self, found):
+        """Generate the `(dirs, paths)` pairs from `found`, having
+        started to read the files of up to `prefetch_dirs` following
+        directories in the reader pool.
+        """
+        ahead = deque()
+        for dirs, paths in found:
+            self._prefetch(dirs, paths)
+            ahead.append((dirs, paths))
+            if len(ahead) > self.prefetch_dirs:
+                yield ahead.popleft()
+        while ahead:
+            yield ahead.popleft()
+
+    def _prefetch(self, dirs, paths):
+        """Start reading the files in `paths` in the reader pool, except
+        for the ones that are skipped because they were already
+        imported (see `singleton` and `album`).
+        """
+        if self.session.config['singletons']:
+            paths = [p for p in paths
+                     if not self.session.already_imported(self.toppath, [p])]
+        elif not paths or self.session.already_imported(self.toppath, dirs):
+            return
+
+        for path in paths:
+            self._reads[path] = self._pool.apply_async(_read_item, (path,))
+
     def _create(self, task):
         """Handle a new task to be emitted by the factory.
 
@@ -1204,17 +1371,39 @@ class ImportTaskFactory(object):
         If an item cannot be read, return `None` instead and log an
         error.
         """
-        try:
-            return library.Item.from_path(path)
-        except library.ReadError as exc:
-            if isinstance(exc.reason, mediafile.FileTypeError):
-                # Silently ignore non-music files.
-                pass
-            elif isinstance(exc.reason, mediafile.UnreadableFileError):
-                log.warning(u'unreadable file: {0}', displayable_path(path))
-            else:
-                log.error(u'error reading {0}: {1}',
-                          displayable_path(path), exc)
+        if path in self._reads:
+            try:
+                item, problem = self._reads.pop(path).get(self.read_timeout)
+            except multiprocessing.TimeoutError:
+                log.error(u'timed out reading {0}', displayable_path(path))
+                return None
+        else:
+            item, problem = _read_item(path)
+        if problem:
+            log.log(*problem)
+        return item
+
+
+def _read_item(path):
+    """Read an `Item` from the file at `path` for `ImportTaskFactory`.
+
+    Return a pair of the item, or None if the file cannot be read, and
+    None or the arguments for logging why the file cannot be read. This
+    is a module-level function, with picklable results, so that it can
+    run in a pool of processes.
+    """
+    try:
+        return library.Item.from_path(path), None
+    except library.ReadError as exc:
+        if isinstance(exc.reason, mediafile.FileTypeError):
+            # Silently ignore non-music files.
+            return None, None
+        elif isinstance(exc.reason, mediafile.UnreadableFileError):
+            return None, (logging.WARNING, u'unreadable file: {0}',
+                          displayable_path(path))
+        else:
+            return None, (logging.ERROR, u'error reading {0}: {1}',
+                          displayable_path(path), logging.logsafe(exc))
 
 
 # Full-album pipeline stages.
@@ -1286,6 +1475,61 @@ def lookup_candidates(session, task):
         # abstraction.
         return
 
+    _begin_lookup(session, task)
+    task.lookup_candidates()
+
+
+@pipeline.stage
+def begin_lookup(session, task):
+    """A coroutine that prepares tasks for `find_candidates`. Together
+    with `end_lookup`, the stages do the same as `lookup_candidates`.
+
+    Each task is kept in the session and sent on with its key, so that
+    `end_lookup` can pass on the original task.
+    """
+    if not task.skip:
+        _begin_lookup(session, task)
+    session._lookup_tasks[id(task)] = task
+    return id(task), task
+
+
+@pipeline.process_stage
+def find_candidates(msg):
+    """A coroutine that looks up the candidates for tasks prepared by
+    `begin_lookup`. It can run in worker processes, where it gets (and
+    yields) a copy of each task.
+    """
+    key, task = msg
+    if not task.skip:
+        task.lookup_candidates()
+    return key, task
+
+
+@pipeline.stage
+def end_lookup(session, msg):
+    """A coroutine that takes the candidates found by `find_candidates`
+    from the copy of each task it made them for, and yields the
+    original task.
+    """
+    key, copy = msg
+    task = session._lookup_tasks.pop(key)
+    if not task.skip:
+        task.take_candidates(copy)
+    return task
+
+
+def _init_lookup_process(processes):
+    """Set up one of the `processes` worker processes for
+    `find_candidates`. The MusicBrainz rate limit is shared between
+    them.
+    """
+    autotag.mb.configure(processes)
+
+
+def _begin_lookup(session, task):
+    """Announce the lookup for `task` and set its search IDs. This
+    needs the session and runs in the main process.
+    """
     plugins.send('import_task_start', session=session, task=task)
     log.debug(u'Looking up: {0}', displayable_path(task.paths))
 
@@ -1293,8 +1537,6 @@ def lookup_candidates(session, task):
     # option. Currently all the IDs are passed onto the tasks directly.
     task.search_ids = session.config['search_ids'].as_str_seq()
 
-    task.lookup_candidates()
-
 
 @pipeline.stage
 def user_query(session, task):
@@ -1440,11 +1682,10 @@ def plugin_stage(session, func, task):
     task.reload()
 
 
-@pipeline.stage
+@pipeline.mutator_stage
 def manipulate_files(session, task):
     """A coroutine (pipeline stage) that performs necessary file
-    manipulations *after* items have been added to the library and
-    finalizes each task.
+    manipulations *after* items have been added to the library.
     """
     if not task.skip:
         if task.should_remove_duplicates:
@@ -1459,6 +1700,12 @@ def manipulate_files(session, task):
             session=session,
         )
 
+
+@pipeline.stage
+def finalize_tasks(session, task):
+    """A coroutine (pipeline stage) that finalizes each task once its
+    files have been handled.
+    """
     # Progress, cleanup, and event.
     task.finalize(session)
 
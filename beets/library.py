@@ -19,6 +19,7 @@ from __future__ import division, absolute_import, print_function
 
 import os
 import sys
+import threading
 import unicodedata
 import time
 import re
@@ -325,6 +326,43 @@ class WriteError(FileOperationError):
         return u'error writing ' + super(WriteError, self).text()
 
 
+# Statistics about writing tags.
+
+class WriteStats(object):
+    """Counts the files whose tags `Item.write` saved, with their total
+    size, and the files it left alone because their tags were already
+    up to date. It can be updated from several threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.saved = 0
+        self.saved_bytes = 0
+        self.unchanged = 0
+
+    def add(self, saved, size=0):
+        with self._lock:
+            if saved:
+                self.saved += 1
+                self.saved_bytes += size
+            else:
+                self.unchanged += 1
+
+
+write_stats = WriteStats()
+
+
+def log_write_stats():
+    """Log how many files had their tags written or were skipped.
+    """
+    if write_stats.saved or write_stats.unchanged:
+        log.debug(u'tags saved to {0} files ({1} bytes), {2} files '
+                  u'unchanged', write_stats.saved, write_stats.saved_bytes,
+                  write_stats.unchanged)
+
+
 # Item and Album model classes.
 
 @six.python_2_unicode_compatible
@@ -375,11 +413,11 @@ class FormattedItemMapping(dbcore.db.FormattedMapping):
     def __init__(self, item, for_path=False):
         super(FormattedItemMapping, self).__init__(item, for_path)
         self.album = item.get_album()
-        self.album_keys = []
+        self.album_keys = set()
         if self.album:
             for key in self.album.keys(True):
-                if key in Album.item_keys or key not in item._fields.keys():
-                    self.album_keys.append(key)
+                if key in Album.item_keys or key not in item._fields:
+                    self.album_keys.add(key)
         self.all_keys = set(self.model_keys).union(self.album_keys)
 
     def _get(self, key):
@@ -388,7 +426,7 @@ class FormattedItemMapping(dbcore.db.FormattedMapping):
         """
         if self.for_path and key in self.album_keys:
             return self._get_formatted(self.album, key)
-        elif key in self.model_keys:
+        elif key in self.model:
             return self._get_formatted(self.model, key)
         elif key in self.album_keys:
             return self._get_formatted(self.album, key)
@@ -493,6 +531,15 @@ class Item(LibModel):
     _search_fields = ('artist', 'title', 'comments',
                       'album', 'albumartist', 'genre')
 
+    _indices = {
+        # The items of an album.
+        'items_by_album_id': ('album_id',),
+        # Duplicate singletons when importing, and BPD's `find` and
+        # `list` by artist or album.
+        'items_by_artist_title': ('artist', 'title'),
+        'items_by_album': ('album',),
+    }
+
     _types = {
         'data_source': types.STRING,
     }
@@ -521,10 +568,11 @@ class Item(LibModel):
     _format_config_key = 'format_item'
 
     @classmethod
+    @plugins.cached
     def _getters(cls):
         getters = plugins.item_field_getters()
         getters['singleton'] = lambda i: i.album_id is None
-        getters['filesize'] = Item.try_filesize  # In bytes.
+        getters['filesize'] = lambda i: i.try_filesize()  # In bytes.
         return getters
 
     @classmethod
@@ -547,7 +595,7 @@ class Item(LibModel):
             elif isinstance(value, BLOB_TYPE):
                 value = bytes(value)
 
-        if key in MediaFile.fields():
+        if MediaFile.is_field(key):
             self.mtime = 0  # Reset mtime on dirty.
 
         super(Item, self).__setitem__(key, value)
@@ -571,12 +619,13 @@ class Item(LibModel):
 
     # Interaction with file metadata.
 
-    def read(self, read_path=None):
+    def read(self, read_path=None, fields=None):
         """Read the metadata from the associated file.
 
         If `read_path` is specified, read metadata from that file
         instead. Updates all the properties in `_media_fields`
-        from the media file.
+        from the media file, or only those that are also in `fields`
+        if it is given.
 
         Raises a `ReadError` if the file could not be read.
         """
@@ -589,7 +638,10 @@ class Item(LibModel):
         except UnreadableFileError as exc:
             raise ReadError(read_path, exc)
 
-        for key in self._media_fields:
+        keys = self._media_fields
+        if fields is not None:
+            keys = keys.intersection(fields)
+        for key in keys:
             value = getattr(mediafile, key)
             if isinstance(value, six.integer_types):
                 if value.bit_length() > 63:
@@ -602,11 +654,13 @@ class Item(LibModel):
 
         self.path = read_path
 
-    def write(self, path=None, tags=None):
+    def write(self, path=None, tags=None, force=False):
         """Write the item's metadata to a media file.
 
         All fields in `_media_fields` are written to disk according to
-        the values on this object.
+        the values on this object. Only the tags that differ from the
+        file's are changed, and the file is not saved at all if none
+        do, unless `force` is set.
 
         `path` is the path of the mediafile to write the data to. It
         defaults to the item's path.
@@ -616,6 +670,15 @@ class Item(LibModel):
 
         Can raise either a `ReadError` or a `WriteError`.
         """
+        path, item_tags = self.prepare_write(path, tags)
+        self.write_file(path, item_tags, force)
+        plugins.send('after_write', item=self, path=path)
+
+    def prepare_write(self, path=None, tags=None):
+        """Get the path and the tags that `write()` writes, with the same
+        arguments, and send the `write` event that lets plugins change
+        the tags. Return a `(path, tags)` pair for `write_file()`.
+        """
         if path is None:
             path = self.path
         else:
@@ -628,7 +691,15 @@ class Item(LibModel):
         if tags is not None:
             item_tags.update(tags)
         plugins.send('write', item=self, path=path, tags=item_tags)
+        return path, item_tags
+
+    def write_file(self, path, tags, force=False):
+        """Write the tags returned by `prepare_write()` to the file at
+        `path`. This is the part of `write()` that touches the file; it
+        sends no plugin events, so it can run in a worker thread.
 
+        Can raise either a `ReadError` or a `WriteError`.
+        """
         # Open the file.
         try:
             mediafile = MediaFile(syspath(path),
@@ -637,25 +708,30 @@ class Item(LibModel):
             raise ReadError(path, exc)
 
         # Write the tags to the file.
-        mediafile.update(item_tags)
+        mediafile.update(tags)
         try:
-            mediafile.save()
+            saved = mediafile.save(force)
         except UnreadableFileError as exc:
             raise WriteError(self.path, exc)
+        if saved:
+            write_stats.add(True, os.path.getsize(syspath(path)))
+        else:
+            log.debug(u'tags of {0} are up to date',
+                      util.displayable_path(path))
+            write_stats.add(False)
 
         # The file has a new mtime.
         if path == self.path:
             self.mtime = self.current_mtime()
-        plugins.send('after_write', item=self, path=path)
 
-    def try_write(self, path=None, tags=None):
+    def try_write(self, path=None, tags=None, force=False):
         """Calls `write()` but catches and logs `FileOperationError`
         exceptions.
 
         Returns `False` an exception was caught and `True` otherwise.
         """
         try:
-            self.write(path, tags)
+            self.write(path, tags, force)
             return True
         except FileOperationError as exc:
             log.error(u"{0}", exc)
@@ -818,29 +894,23 @@ class Item(LibModel):
         self._check_db()
         platform = platform or sys.platform
         basedir = basedir or self._db.directory
-        path_formats = path_formats or self._db.path_formats
+        path_formats = self._db.compiled_path_formats(type(self),
+                                                      path_formats)
 
         # Use a path format based on a query, falling back on the
         # default.
-        for query, path_format in path_formats:
-            if query == PF_KEY_DEFAULT:
-                continue
-            query, _ = parse_query_string(query, type(self))
-            if query.match(self):
+        for query, subpath_tmpl in path_formats:
+            if query is not None and query.match(self):
                 # The query matches the item! Use the corresponding path
                 # format.
                 break
         else:
             # No query matched; fall back to default.
-            for query, path_format in path_formats:
-                if query == PF_KEY_DEFAULT:
+            for query, subpath_tmpl in path_formats:
+                if query is None:
                     break
             else:
                 assert False, u"no default path format"
-        if isinstance(path_format, Template):
-            subpath_tmpl = path_format
-        else:
-            subpath_tmpl = Template(path_format)
 
         # Evaluate the selected template.
         subpath = self.evaluate_template(subpath_tmpl, True)
@@ -927,6 +997,11 @@ class Album(LibModel):
 
     _search_fields = ('album', 'albumartist', 'genre')
 
+    _indices = {
+        # Duplicate albums when importing.
+        'albums_by_albumartist_album': ('albumartist', 'album'),
+    }
+
     _types = {
         'path':        PathType(),
         'data_source': types.STRING,
@@ -974,6 +1049,7 @@ class Album(LibModel):
     _format_config_key = 'format_album'
 
     @classmethod
+    @plugins.cached
     def _getters(cls):
         # In addition to plugin-provided computed fields, also expose
         # the album's directory as `path`.
@@ -1162,19 +1238,28 @@ class Album(LibModel):
         :param fields: The fields to be stored. If not specified, all fields
         will be.
         """
-        # Get modified track fields.
+        with self._db.transaction():
+            items = self._propagate_item_keys()
+            super(Album, self).store(fields)
+            for item in items:
+                item.store()
+
+    def _propagate_item_keys(self):
+        """Copy the modified track-level fields of the album to its
+        items. Return the items that need to be stored, which is none
+        if no such field was modified.
+        """
         track_updates = {}
         for key in self.item_keys:
             if key in self._dirty:
                 track_updates[key] = self[key]
+        if not track_updates:
+            return []
 
-        with self._db.transaction():
-            super(Album, self).store(fields)
-            if track_updates:
-                for item in self.items():
-                    for key, value in track_updates.items():
-                        item[key] = value
-                    item.store()
+        items = list(self.items())
+        for item in items:
+            item.update(track_updates)
+        return items
 
     def try_sync(self, write, move):
         """Synchronize the album and its items with the database.
@@ -1261,13 +1346,25 @@ class Library(dbcore.Database):
     """
     _models = (Item, Album)
 
+    _item_stats_fields = {
+        'id':    types.PRIMARY_ID,
+        'mtime': types.INTEGER,
+        'size':  types.INTEGER,
+        'inode': types.INTEGER,
+    }
+    """The columns of the table of item file signatures (see
+    `item_stats`), which is kept apart from the items so that the
+    signatures are not fields.
+    """
+
     def __init__(self, path='library.blb',
                  directory='~/Music',
                  path_formats=((PF_KEY_DEFAULT,
                                '$artist/$album/$track $title'),),
                  replacements=None):
         timeout = beets.config['timeout'].as_number()
-        super(Library, self).__init__(path, timeout=timeout)
+        wal = beets.config['wal'].get(bool)
+        super(Library, self).__init__(path, timeout=timeout, wal=wal)
 
         self.directory = bytestring_path(normpath(directory))
         self.path_formats = path_formats
@@ -1275,11 +1372,57 @@ class Library(dbcore.Database):
 
         self._memotable = {}  # Used for template substitution performance.
 
+        self._make_table('item_stats', self._item_stats_fields)
+
     def _create_connection(self):
         conn = super(Library, self)._create_connection()
         conn.create_function('bytelower', 1, _sqlite_bytelower)
         return conn
 
+    # Path formats.
+
+    @property
+    def path_formats(self):
+        """The library's path formats: a list of (query, template)
+        pairs. The query is a query string or `PF_KEY_DEFAULT`; the
+        template is a `Template` or a string.
+        """
+        return self._path_formats
+
+    @path_formats.setter
+    def path_formats(self, path_formats):
+        self._path_formats = path_formats
+        self._compiled_path_formats = {}
+
+    def compiled_path_formats(self, model_cls, path_formats=None):
+        """Get path formats (by default, the library's) with their
+        queries parsed and their templates compiled for `model_cls`.
+
+        Return a list of (query, template) pairs, where the query is a
+        `Query` object, or None for the default format, and the template
+        is a `Template`. The result is computed once for each set of
+        path formats and reused until the library's path formats are
+        replaced.
+        """
+        path_formats = path_formats or self.path_formats
+        key = (model_cls,) + tuple(
+            (query, getattr(tmpl, 'original', tmpl))
+            for query, tmpl in path_formats
+        )
+        compiled = self._compiled_path_formats.get(key)
+        if compiled is None:
+            compiled = []
+            for query, tmpl in path_formats:
+                if query == PF_KEY_DEFAULT:
+                    query = None
+                else:
+                    query, _ = parse_query_string(query, model_cls)
+                if not isinstance(tmpl, Template):
+                    tmpl = Template(tmpl)
+                compiled.append((query, tmpl))
+            self._compiled_path_formats[key] = compiled
+        return compiled
+
     # Adding objects to the database.
 
     def add(self, obj):
@@ -1290,6 +1433,35 @@ class Library(dbcore.Database):
         self._memotable = {}
         return obj.id
 
+    def add_many(self, objs):
+        """Add several :class:`Item` or :class:`Album` objects to the
+        library database in one transaction. Return the objects' new
+        ids.
+        """
+        objs = list(objs)
+        super(Library, self).add_many(objs)
+        self._memotable = {}
+        for obj in objs:
+            plugins.send('database_change', lib=self, model=obj)
+        return [obj.id for obj in objs]
+
+    def store_many(self, objs, fields=None):
+        """Store several :class:`Item` or :class:`Album` objects in one
+        transaction. Like calling `store(fields)` on each object, the
+        modified track-level fields of albums are also stored on their
+        items.
+        """
+        objs = list(objs)
+        with self.transaction():
+            items = []
+            for obj in objs:
+                if isinstance(obj, Album):
+                    items += obj._propagate_item_keys()
+            super(Library, self).store_many(objs, fields)
+            super(Library, self).store_many(items)
+        for obj in objs + items:
+            plugins.send('database_change', lib=self, model=obj)
+
     def add_album(self, items):
         """Create a new album consisting of a list of items.
 
@@ -1310,18 +1482,19 @@ class Library(dbcore.Database):
             album.add(self)
             for item in items:
                 item.album_id = album.id
-                if item.id is None:
-                    item.add(self)
-                else:
-                    item.store()
+            self.add_many(item for item in items if item.id is None)
+            self.store_many(item for item in items if item.id is not None)
 
         return album
 
     # Querying.
 
-    def _fetch(self, model_cls, query, sort=None):
+    def _fetch(self, model_cls, query, sort=None, stream=False, cache=None,
+               limit=None, offset=0):
         """Parse a query and fetch. If a order specification is present
-        in the query string the `sort` argument is ignored.
+        in the query string the `sort` argument is ignored. See
+        `Database._fetch` for the `stream`, `cache`, `limit` and `offset`
+        arguments.
         """
         # Parse the query, if necessary.
         try:
@@ -1339,7 +1512,7 @@ class Library(dbcore.Database):
             sort = parsed_sort
 
         return super(Library, self)._fetch(
-            model_cls, query, sort
+            model_cls, query, sort, stream, cache, limit, offset
         )
 
     @staticmethod
@@ -1356,15 +1529,54 @@ class Library(dbcore.Database):
         return dbcore.sort_from_strings(
             Item, beets.config['sort_item'].as_str_seq())
 
-    def albums(self, query=None, sort=None):
+    def albums(self, query=None, sort=None, stream=False, cache=None,
+               limit=None, offset=0):
         """Get :class:`Album` objects matching the query.
+
+        With `stream`, the albums are read from the database as they are
+        consumed and, unless `cache` is set, not kept in memory. `limit`
+        and `offset` select a page of the results: at most `limit`
+        albums, skipping the first `offset`.
         """
-        return self._fetch(Album, query, sort or self.get_default_album_sort())
+        return self._fetch(Album, query, sort or self.get_default_album_sort(),
+                           stream, cache, limit, offset)
 
-    def items(self, query=None, sort=None):
+    def items(self, query=None, sort=None, stream=False, cache=None,
+              limit=None, offset=0):
         """Get :class:`Item` objects matching the query.
+
+        With `stream`, the items are read from the database as they are
+        consumed and, unless `cache` is set, not kept in memory. `limit`
+        and `offset` select a page of the results: at most `limit`
+        items, skipping the first `offset`.
         """
-        return self._fetch(Item, query, sort or self.get_default_item_sort())
+        return self._fetch(Item, query, sort or self.get_default_item_sort(),
+                           stream, cache, limit, offset)
+
+    # File signatures.
+
+    def item_stats(self):
+        """Get the signatures of the item files recorded by
+        `set_item_stats`, as a dictionary mapping item IDs to
+        `(mtime, size, inode)` tuples.
+        """
+        with self.transaction(read_only=True) as tx:
+            rows = tx.query('SELECT id, mtime, size, inode FROM item_stats')
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def set_item_stats(self, stats):
+        """Record the signatures of item files, given as `(item id,
+        mtime, size, inode)` tuples, and forget the ones of the items
+        that are no longer in the library. `beet update --scan` uses
+        them to find the files that changed or moved.
+        """
+        with self.transaction() as tx:
+            tx.mutate_many(
+                'INSERT OR REPLACE INTO item_stats (id, mtime, size, inode) '
+                'VALUES (?, ?, ?, ?)', stats
+            )
+            tx.mutate('DELETE FROM item_stats '
+                      'WHERE id NOT IN (SELECT id FROM items)')
 
     # Convenience accessors.
 
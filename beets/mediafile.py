@@ -1180,14 +1180,23 @@ class MediaField(object):
         """
         self.out_type = kwargs.get('out_type', six.text_type)
         self._styles = styles
+        # Maps a mutagen file class name to the styles that apply to it.
+        self._format_styles = {}
 
     def styles(self, mutagen_file):
-        """Yields the list of storage styles of this field that can
+        """Get the list of storage styles of this field that can
         handle the MediaFile's format.
+
+        The list is computed once per mutagen file class and then looked
+        up on each access.
         """
-        for style in self._styles:
-            if mutagen_file.__class__.__name__ in style.formats:
-                yield style
+        format = mutagen_file.__class__.__name__
+        try:
+            return self._format_styles[format]
+        except KeyError:
+            styles = [s for s in self._styles if format in s.formats]
+            self._format_styles[format] = styles
+            return styles
 
     def __get__(self, mediafile, owner=None):
         out = None
@@ -1207,6 +1216,22 @@ class MediaField(object):
         for style in self.styles(mediafile.mgfile):
             style.delete(mediafile.mgfile)
 
+    def _style_values(self, mediafile):
+        """Get the values stored for this field by each of its storage
+        styles for the file, which tell whether setting or deleting it
+        changes the file. Return None if the values cannot be compared.
+        """
+        return [style.get(mediafile.mgfile)
+                for style in self.styles(mediafile.mgfile)]
+
+    def _holds(self, values, value):
+        """Return whether the storage style `values` (see `_style_values`)
+        all read as `value`, so that setting it can be skipped. Missing
+        values count as empty ones.
+        """
+        return all(_safe_cast(self.out_type, v) == value
+                   if v is not None else not value for v in values)
+
     def _none_value(self):
         """Get an appropriate "null" value for this field's type. This
         is used internally when setting the field to None.
@@ -1238,6 +1263,15 @@ class ListMediaField(MediaField):
         for style in self.styles(mediafile.mgfile):
             style.set_list(mediafile.mgfile, values)
 
+    def _style_values(self, mediafile):
+        return [style.get_list(mediafile.mgfile)
+                for style in self.styles(mediafile.mgfile)]
+
+    def _holds(self, values, value):
+        value = list(value or [])
+        return all([_safe_cast(self.out_type, v) for v in style_values] ==
+                   value for style_values in values)
+
     def single_field(self):
         """Returns a ``MediaField`` descriptor that gets and sets the
         first item.
@@ -1291,6 +1325,17 @@ class DateField(MediaField):
         if hasattr(self, '_year_field'):
             self._year_field.__delete__(mediafile)
 
+    def _style_values(self, mediafile):
+        values = super(DateField, self)._style_values(mediafile)
+        if hasattr(self, '_year_field'):
+            values += self._year_field._style_values(mediafile)
+        return values
+
+    def _holds(self, values, value):
+        # The stored strings are not parsed for the comparison, so only
+        # a missing date is recognized.
+        return not value and all(v is None for v in values)
+
     def _get_date_tuple(self, mediafile):
         """Get a 3-item sequence representing the date consisting of a
         year, month, and day number. Each number is either an integer or
@@ -1372,6 +1417,12 @@ class DateItemField(MediaField):
     def __delete__(self, mediafile):
         self.__set__(mediafile, None)
 
+    def _style_values(self, mediafile):
+        return self.date_field._style_values(mediafile)
+
+    def _holds(self, values, value):
+        return self.date_field._holds(values, value)
+
 
 class CoverArtField(MediaField):
     """A descriptor that provides access to the *raw image data* for the
@@ -1409,6 +1460,11 @@ class CoverArtField(MediaField):
     def __delete__(self, mediafile):
         delattr(mediafile, 'images')
 
+    def _style_values(self, mediafile):
+        # Images are always written: that also moves legacy cover art
+        # tags to the current ones.
+        return None
+
 
 class ImageListField(ListMediaField):
     """Descriptor to access the list of images embedded in tags.
@@ -1431,10 +1487,49 @@ class ImageListField(ListMediaField):
             out_type=Image,
         )
 
+    # Decoding the images can be expensive (e.g., base64 in Vorbis
+    # comments), so it is deferred until the images are first accessed
+    # and done only once for each `MediaFile`; `art` shares the result.
+
+    def __get__(self, mediafile, owner=None):
+        images = mediafile.__dict__.get('_images')
+        if images is None:
+            images = super(ImageListField, self).__get__(mediafile, owner)
+            mediafile._images = images
+        # Hand out copies, which callers are free to modify.
+        return [Image(i.data, i.desc, i.type) for i in images]
+
+    def __set__(self, mediafile, values):
+        mediafile.__dict__.pop('_images', None)
+        super(ImageListField, self).__set__(mediafile, values)
+
+    def __delete__(self, mediafile):
+        mediafile.__dict__.pop('_images', None)
+        super(ImageListField, self).__delete__(mediafile)
+
+    def _style_values(self, mediafile):
+        return None
+
 
 # MediaFile is a collection of fields.
 
-class MediaFile(object):
+class _FieldsMeta(type):
+    """Metaclass for :class:`MediaFile` that drops the cached field
+    names whenever a :class:`MediaField` is set on or deleted from the
+    class, so that :meth:`MediaFile.fields` stays accurate.
+    """
+    def __setattr__(cls, name, value):
+        if isinstance(value, MediaField):
+            type.__setattr__(cls, '_field_names_cache', None)
+        type.__setattr__(cls, name, value)
+
+    def __delattr__(cls, name):
+        if isinstance(cls.__dict__.get(name), MediaField):
+            type.__setattr__(cls, '_field_names_cache', None)
+        type.__delattr__(cls, name)
+
+
+class MediaFile(six.with_metaclass(_FieldsMeta, object)):
     """Represents a multimedia file on disk and provides access to its
     metadata.
     """
@@ -1446,6 +1541,7 @@ class MediaFile(object):
         the older ID3v2.3 standard by specifying the `id3v23` option.
         """
         self.path = path
+        self._modified = False
 
         self.mgfile = mutagen_call('open', path, mutagen.File, path)
 
@@ -1490,10 +1586,75 @@ class MediaFile(object):
         # Set the ID3v2.3 flag only for MP3s.
         self.id3v23 = id3v23 and self.type == 'mp3'
 
-    def save(self):
+    @classmethod
+    def _field(cls, name):
+        """Get the `MediaField` called `name` on this class or one of its
+        bases, without invoking its getter, or None if there is none.
+        """
+        for klass in cls.__mro__:
+            if name in klass.__dict__:
+                field = klass.__dict__[name]
+                return field if isinstance(field, MediaField) else None
+        return None
+
+    def __setattr__(self, name, value):
+        # Note whether setting a field changes the file, so that saving
+        # can be skipped if nothing did. Setting a missing field to an
+        # empty value does not count as a change.
+        field = self._field(name)
+        if field is None or self._modified:
+            super(MediaFile, self).__setattr__(name, value)
+        else:
+            before = field._style_values(self)
+            if before is not None and field._holds(before, value):
+                # Every storage style already has the value.
+                return
+            super(MediaFile, self).__setattr__(name, value)
+            self._note_changes(field, before, not value)
+
+    def __delattr__(self, name):
+        field = self._field(name)
+        if field is None or self._modified:
+            super(MediaFile, self).__delattr__(name)
+        else:
+            before = field._style_values(self)
+            super(MediaFile, self).__delattr__(name)
+            self._note_changes(field, before)
+
+    def _note_changes(self, field, before, empty=False):
+        """Set the `_modified` flag if `field` no longer stores the values
+        `before` in each of its storage styles. If the field was set to
+        an `empty` value, the styles it was missing from are ignored.
+        """
+        if before is None:
+            self._modified = True
+            return
+        for old, new in zip(before, field._style_values(self)):
+            if new != old and not (empty and old in (None, [])):
+                self._modified = True
+                return
+
+    def _id3_outdated(self):
+        """Return whether saving converts the ID3 tag of an MP3 file to
+        another version: v2.3 with the `id3v23` option and v2.4 otherwise.
+        """
+        if self.type != 'mp3' or self.mgfile.tags is None:
+            return False
+        version = (2, 3) if self.id3v23 else (2, 4)
+        return self.mgfile.tags.version[:2] != version
+
+    def save(self, force=False):
         """Write the object's tags back to the file. May
         throw `UnreadableFileError`.
+
+        The file is only written if a field was changed since it was
+        opened or its ID3 tag needs to be converted, unless `force` is
+        set; changes made directly to `mgfile` are not noticed. Return
+        whether the file was written.
         """
+        if not (force or self._modified or self._id3_outdated()):
+            return False
+
         # Possibly save the tags to ID3v2.3.
         kwargs = {}
         if self.id3v23:
@@ -1505,12 +1666,15 @@ class MediaFile(object):
             kwargs['v2_version'] = 3
 
         mutagen_call('save', self.path, self.mgfile.save, **kwargs)
+        self._modified = False
+        return True
 
     def delete(self):
         """Remove the current metadata tag from the file. May
         throw `UnreadableFileError`.
         """
         mutagen_call('delete', self.path, self.mgfile.delete)
+        self.__dict__.pop('_images', None)
 
     # Convenient access to the set of available fields.
 
@@ -1520,14 +1684,35 @@ class MediaFile(object):
         metadata tags (i.e., those that are instances of
         :class:`MediaField`).
         """
-        for property, descriptor in cls.__dict__.items():
-            if isinstance(descriptor, MediaField):
-                if isinstance(property, bytes):
-                    # On Python 2, class field names are bytes. This method
-                    # produces text strings.
-                    yield property.decode('utf8', 'ignore')
-                else:
-                    yield property
+        for property in cls._field_names()[0]:
+            yield property
+
+    @classmethod
+    def _field_names(cls):
+        """Get a tuple and a frozenset of the names yielded by
+        :meth:`fields`. They are computed once per class and reset when
+        a field is added or removed.
+        """
+        names = cls.__dict__.get('_field_names_cache')
+        if names is None:
+            ordered = []
+            for property, descriptor in cls.__dict__.items():
+                if isinstance(descriptor, MediaField):
+                    if isinstance(property, bytes):
+                        # On Python 2, class field names are bytes. This
+                        # method produces text strings.
+                        property = property.decode('utf8', 'ignore')
+                    ordered.append(property)
+            names = (tuple(ordered), frozenset(ordered))
+            cls._field_names_cache = names
+        return names
+
+    @classmethod
+    def is_field(cls, name):
+        """Check whether `name` is one of the writable fields listed
+        by :meth:`fields`.
+        """
+        return name in cls._field_names()[1]
 
     @classmethod
     def _field_sort_name(cls, name):
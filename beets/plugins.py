@@ -205,6 +205,7 @@ class BeetsPlugin(object):
         if func not in cls._raw_listeners[event]:
             cls._raw_listeners[event].append(func)
             cls.listeners[event].append(wrapped_func)
+            invalidate_cache()
 
     template_funcs = None
     template_fields = None
@@ -220,6 +221,7 @@ class BeetsPlugin(object):
             if cls.template_funcs is None:
                 cls.template_funcs = {}
             cls.template_funcs[name] = func
+            invalidate_cache()
             return func
         return helper
 
@@ -234,12 +236,61 @@ class BeetsPlugin(object):
             if cls.template_fields is None:
                 cls.template_fields = {}
             cls.template_fields[name] = func
+            invalidate_cache()
             return func
         return helper
 
 
 _classes = set()
 
+# Values collected from all the plugins (such as the table of event
+# handlers) or derived from them, which are needed very often. They are
+# computed once and reused until the plugins change. The cache is only
+# valid for the `_classes` and `_instances` it was built from, so that
+# swapping those out (as the tests do) also invalidates it.
+_cache = {}
+_cache_owner = None
+
+
+def invalidate_cache():
+    """Discard the values collected from the plugins. This is needed
+    when a plugin changes what it provides after it has been loaded;
+    registering listeners and template functions or fields through the
+    `BeetsPlugin` API takes care of it automatically.
+    """
+    global _cache_owner
+    _cache.clear()
+    _cache_owner = None
+
+
+def cached(func):
+    """Decorator for functions whose result only depends on the loaded
+    plugins (and the arguments, which must be hashable): the result is
+    computed only once, until the cache is invalidated. The result is
+    shared, so it must not be modified.
+    """
+    @wraps(func)
+    def wrapper(*args):
+        global _cache_owner
+        if _cache_owner is not None and (
+                _cache_owner[0] is not _classes or
+                _cache_owner[1] != len(_classes) or
+                _cache_owner[2] is not _instances):
+            invalidate_cache()
+
+        key = (func,) + args
+        try:
+            return _cache[key]
+        except KeyError:
+            # Computing the value may instantiate plugins, which
+            # invalidates the cache: only record its owner afterwards.
+            value = func(*args)
+            if _cache_owner is None:
+                _cache_owner = (_classes, len(_classes), _instances)
+            _cache[key] = value
+            return value
+    return wrapper
+
 
 def load_plugins(names=()):
     """Imports the modules for a sequence of plugin names. Each name
@@ -263,6 +314,7 @@ def load_plugins(names=()):
                     if isinstance(obj, type) and issubclass(obj, BeetsPlugin) \
                             and obj != BeetsPlugin and obj not in _classes:
                         _classes.add(obj)
+                        invalidate_cache()
 
         except Exception:
             log.warning(
@@ -286,6 +338,7 @@ def find_plugins():
         # Only instantiate each plugin class once.
         if cls not in _instances:
             _instances[cls] = cls()
+            invalidate_cache()
         plugins.append(_instances[cls])
     return plugins
 
@@ -334,20 +387,65 @@ def track_distance(item, info):
     """
     from beets.autotag.hooks import Distance
     dist = Distance()
-    for plugin in find_plugins():
+    for plugin in track_distance_plugins():
         dist.update(plugin.track_distance(item, info))
     return dist
 
 
+def _overrides(plugin, name):
+    """Check whether `plugin` overrides the `BeetsPlugin` method called
+    `name`.
+    """
+    return six.get_unbound_function(getattr(type(plugin), name)) is not \
+        six.get_unbound_function(getattr(BeetsPlugin, name))
+
+
+@cached
+def track_distance_plugins():
+    """Get the plugins that contribute to the track distance, i.e., the
+    ones that override `BeetsPlugin.track_distance`.
+    """
+    return [plugin for plugin in find_plugins()
+            if _overrides(plugin, 'track_distance')]
+
+
 def album_distance(items, album_info, mapping):
     """Returns the album distance calculated by plugins."""
     from beets.autotag.hooks import Distance
     dist = Distance()
-    for plugin in find_plugins():
+    for plugin in album_distance_plugins():
         dist.update(plugin.album_distance(items, album_info, mapping))
     return dist
 
 
+@cached
+def album_distance_plugins():
+    """Get the plugins that contribute to the album distance, i.e., the
+    ones that override `BeetsPlugin.album_distance`.
+    """
+    return [plugin for plugin in find_plugins()
+            if _overrides(plugin, 'album_distance')]
+
+
+def lookup_plugins():
+    """Get the plugins that take part in looking up candidates: the
+    ones that override one of the `BeetsPlugin` methods used to find
+    and rank candidates, or that listen to the events sent for the
+    candidates found.
+    """
+    methods = ('candidates', 'item_candidates', 'album_for_id',
+               'track_for_id', 'album_distance', 'track_distance')
+    events = ('albuminfo_received', 'trackinfo_received')
+    found = []
+    for plugin in find_plugins():
+        overrides = [name for name in methods if _overrides(plugin, name)]
+        listens = [event for event in events
+                   if plugin.listeners and plugin.listeners.get(event)]
+        if overrides or listens:
+            found.append(plugin)
+    return found
+
+
 def candidates(items, artist, album, va_likely):
     """Gets MusicBrainz candidates for an album from each plugin.
     """
@@ -386,6 +484,11 @@ def template_funcs():
     """Get all the template functions declared by plugins as a
     dictionary.
     """
+    return dict(_template_funcs())
+
+
+@cached
+def _template_funcs():
     funcs = {}
     for plugin in find_plugins():
         if plugin.template_funcs:
@@ -407,6 +510,11 @@ def item_field_getters():
     """Get a dictionary mapping field names to unary functions that
     compute the field's value.
     """
+    return dict(_item_field_getters())
+
+
+@cached
+def _item_field_getters():
     funcs = {}
     for plugin in find_plugins():
         if plugin.template_fields:
@@ -417,6 +525,11 @@ def item_field_getters():
 def album_field_getters():
     """As above, for album fields.
     """
+    return dict(_album_field_getters())
+
+
+@cached
+def _album_field_getters():
     funcs = {}
     for plugin in find_plugins():
         if plugin.album_template_fields:
@@ -426,9 +539,11 @@ def album_field_getters():
 
 # Event dispatch.
 
+@cached
 def event_handlers():
     """Find all event handlers from plugins as a dictionary mapping
-    event names to sequences of callables.
+    event names to sequences of callables. The table is shared, so it
+    must not be modified.
     """
     all_handlers = defaultdict(list)
     for plugin in find_plugins():
@@ -448,7 +563,7 @@ def send(event, **arguments):
     """
     log.debug(u'Sending event: {0}', event)
     results = []
-    for handler in event_handlers()[event]:
+    for handler in event_handlers().get(event, ()):
         result = handler(**arguments)
         if result is not None:
             results.append(result)
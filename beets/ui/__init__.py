@@ -39,7 +39,7 @@ from beets import util
 from beets.util.functemplate import Template
 from beets import config
 from beets.util import confit, as_string
-from beets.autotag import mb
+from beets.autotag import hooks, mb
 from beets.dbcore import query as db_query
 from beets.dbcore import db
 import six
@@ -1241,6 +1241,9 @@ def _raw_main(args, lib=None):
 
     subcommand, suboptions, subargs = parser.parse_subcommand(subargs)
     subcommand.func(lib, suboptions, subargs)
+    mb.log_cache_stats()
+    hooks.log_cache_stats()
+    library.log_write_stats()
 
     plugins.send('cli_exit', lib=lib)
     if not test_lib:
@@ -21,6 +21,7 @@ from __future__ import division, absolute_import, print_function
 
 import os
 import re
+import json
 from platform import python_version
 from collections import namedtuple, Counter
 from itertools import chain
@@ -102,7 +103,7 @@ def fields_func(lib, opts, args):
     print_(u"Album fields:")
     _print_rows(library.Album.all_keys())
 
-    with lib.transaction() as tx:
+    with lib.transaction(read_only=True) as tx:
         # The SQL uses the DISTINCT to get unique values from the query
         unique_fields = 'SELECT DISTINCT key FROM (%s)'
 
@@ -910,10 +911,39 @@ def import_files(lib, paths, query):
     session = TerminalImportSession(lib, loghandler, paths, query)
     session.run()
 
+    # Report where the time went.
+    if config['import']['stats']:
+        show_pipeline_stats(session.pipeline_stats)
+    if config['import']['stats_file'].get() is not None:
+        statspath = syspath(config['import']['stats_file'].as_filename())
+        try:
+            with open(statspath, 'w') as f:
+                json.dump([s.as_dict() for s in session.pipeline_stats], f,
+                          indent=4)
+        except IOError:
+            raise ui.UserError(u"could not write statistics file: "
+                               u"{0}".format(displayable_path(statspath)))
+
     # Emit event.
     plugins.send('import', lib=lib, paths=paths)
 
 
+def show_pipeline_stats(stats):
+    """Print a table of the statistics for each stage of an import.
+    """
+    row = u'{0:<32} {1:>7} {2:>8} {3:>8} {4:>9} {5:>9} {6:>9} {7:>5}'
+    print_(row.format(u'stage', u'workers', u'received', u'sent', u'busy',
+                      u'wait in', u'wait out', u'queue'))
+    for stage in stats:
+        print_(row.format(
+            stage.name, stage.workers, stage.received, stage.sent,
+            u'{0:.2f}s'.format(stage.busy),
+            u'{0:.2f}s'.format(stage.wait_in),
+            u'{0:.2f}s'.format(stage.wait_out),
+            stage.queue_max,
+        ))
+
+
 def import_func(lib, opts, args):
     config['import'].set_args(opts)
 
@@ -1024,31 +1054,46 @@ import_cmd.parser.add_option(
     metavar='FIELD=VALUE',
     help=u'set the given fields to the supplied values'
 )
+import_cmd.parser.add_option(
+    u'--stats', dest='stats', action='store_true',
+    help=u'show the time spent in each stage of the import'
+)
+import_cmd.parser.add_option(
+    u'--stats-file', dest='stats_file', metavar='PATH',
+    help=u'write the statistics for each stage of the import as JSON'
+)
 import_cmd.func = import_func
 default_commands.append(import_cmd)
 
 
 # list: Query and show library contents.
 
-def list_items(lib, query, album, fmt=u''):
+def list_items(lib, query, album, fmt=u'', limit=None):
     """Print out items in lib matching query. If album, then search for
-    albums instead of single items.
+    albums instead of single items. If `limit` is given, print at most
+    that many objects.
     """
     if album:
-        for album in lib.albums(query):
+        for album in lib.albums(query, stream=True, limit=limit):
             ui.print_(format(album, fmt))
     else:
-        for item in lib.items(query):
+        for item in lib.items(query, stream=True, limit=limit):
             ui.print_(format(item, fmt))
 
 
 def list_func(lib, opts, args):
-    list_items(lib, decargs(args), opts.album)
+    if opts.limit is not None and opts.limit < 0:
+        raise ui.UserError(u'--limit must not be negative')
+    list_items(lib, decargs(args), opts.album, limit=opts.limit)
 
 
 list_cmd = ui.Subcommand(u'list', help=u'query the library', aliases=(u'ls',))
 list_cmd.parser.usage += u"\n" \
     u'Example: %prog -f \'$album: $title\' artist:beatles'
+list_cmd.parser.add_option(
+    u'--limit', type='int', dest='limit',
+    help=u'show at most LIMIT matches'
+)
 list_cmd.parser.add_all_common_options()
 list_cmd.func = list_func
 default_commands.append(list_cmd)
@@ -1056,25 +1101,261 @@ default_commands.append(list_cmd)
 
 # update: Update library contents according to on-disk tags.
 
-def update_items(lib, query, album, move, pretend, fields):
+def _read_changed(item, fields):
+    """Read the tags of an item whose file changed. Return `'read'` or
+    the `ReadError` raised when reading.
+    """
+    try:
+        item.read(fields=fields)
+    except library.ReadError as exc:
+        return exc
+    return 'read'
+
+
+def _check_and_read(item, fields):
+    """Look at an item's file and read its tags if it changed since the
+    last update. Return one of `'deleted'`, `'current'` and `'read'`, or
+    the `ReadError` raised when reading. Only touches the file, not the
+    database, so that it can run in a worker thread.
+    """
+    try:
+        st = os.stat(syspath(item.path))
+    except OSError:
+        return 'deleted'
+    if int(st.st_mtime) <= item.mtime:
+        return 'current'
+    return _read_changed(item, fields)
+
+
+# Extensions of the files that `update --scan` reports as new.
+MEDIA_EXTENSIONS = frozenset([
+    b'mp3', b'm4a', b'mp4', b'aac', b'alac', b'ogg', b'oga', b'opus',
+    b'flac', b'ape', b'wv', b'mpc', b'wma', b'asf', b'aif', b'aiff',
+    b'dsf',
+])
+
+
+def _scan_candidates(lib, query, album):
+    """Get the items matched by the query as `(id, path, mtime)` tuples,
+    in the default item order. When SQLite can evaluate the whole query,
+    the columns are read directly, without building `Item` objects.
+    Raises a UserError if no items match.
+    """
+    model_cls = library.Album if album else library.Item
+    if isinstance(query, six.string_types):
+        parsed, _ = library.parse_query_string(query, model_cls)
+    else:
+        parsed, _ = library.parse_query_parts(query, model_cls)
+    where, subvals, slow_query = parsed.plan(model_cls)
+    sort = lib.get_default_item_sort()
+    if slow_query or sort.is_slow():
+        items, _ = _do_query(lib, query, album)
+        return [(item.id, item.path, item.mtime) for item in items]
+
+    if album:
+        where = 'album_id IN (SELECT id FROM albums WHERE {0})'.format(where)
+    order_by = sort.order_clause()
+    sql = 'SELECT id, path, mtime FROM items WHERE {0} {1}'.format(
+        where, 'ORDER BY {0}'.format(order_by) if order_by else '',
+    )
+    with lib.transaction(read_only=True) as tx:
+        rows = tx.query(sql, subvals)
+    if not rows:
+        raise ui.UserError(u'No matching albums found.' if album
+                           else u'No matching items found.')
+    path_type = library.Item._fields['path']
+    return [(row[0], path_type.from_sql(row[1]), row[2]) for row in rows]
+
+
+class _StatScan(object):
+    """Find out which of the files of the matched items changed or
+    moved using only directory listings, without opening any file.
+
+    The directories of the matched items are listed once (the whole
+    library directory when all the items are matched), and the mtime
+    and size of each file are compared to the item's mtime and to the
+    file signature (see `Library.item_stats`) recorded for the item.
+    Files that no item points to are remembered by inode number to
+    find items whose file was moved, and are otherwise reported as new.
+    """
+    def __init__(self, lib, candidates, whole_library):
+        self.signatures = lib.item_stats()
+        self.new_signatures = []
+        self.moved = {}
+        self.stats = {}
+
+        ignore = config['ignore'].as_str_seq()
+        ignore_hidden = config['ignore_hidden'].get(bool)
+        paths = (path for _, path, _ in candidates)
+        if whole_library:
+            # The library directory is listed as a whole, along with
+            # the directories of the items outside of it.
+            prefix = os.path.join(lib.directory, b'')
+            paths = (path for path in paths if not path.startswith(prefix))
+            if os.path.isdir(syspath(lib.directory)):
+                self.stats.update(util.stat_walk(
+                    lib.directory, ignore=ignore,
+                    ignore_hidden=ignore_hidden, logger=log,
+                ))
+        for d in set(os.path.dirname(path) for path in paths):
+            self.stats.update(util.stat_walk(
+                d, recursive=False, ignore=ignore,
+                ignore_hidden=ignore_hidden,
+            ))
+
+        # Index the listed files that belong to no item in the library.
+        path_type = library.Item._fields['path']
+        with lib.transaction(read_only=True) as tx:
+            claimed = set(path_type.from_sql(row[0]) for row in
+                          tx.query('SELECT path FROM items'))
+        self.unclaimed = {}
+        for path, st in self.stats.items():
+            if path not in claimed:
+                self.unclaimed[st.st_ino] = path
+
+    def _stat(self, path):
+        if path in self.stats:
+            return self.stats[path]
+        try:
+            return os.stat(syspath(path))
+        except OSError:
+            return None
+
+    def check(self, item_id, path, mtime):
+        """Compare the file of an item to its mtime and signature.
+        Return a `(status, path)` pair: the status is `'current'`,
+        `'changed'` if the file must be read again or `'deleted'`, and
+        the path is the file's new path if it was moved, or None.
+        """
+        signature = self.signatures.get(item_id)
+        if signature is not None and signature[0] != mtime:
+            # The file was read or written since the signature was
+            # recorded.
+            signature = None
+
+        st = self._stat(path)
+        new_path = None
+        if st is None:
+            # Look for an unclaimed file with the same inode and size.
+            if signature is None:
+                return 'deleted', None
+            new_path = self.unclaimed.get(signature[2])
+            if new_path is None or \
+                    self.stats[new_path].st_size != signature[1]:
+                return 'deleted', None
+            del self.unclaimed[signature[2]]
+            st = self.stats[new_path]
+
+        if int(st.st_mtime) > mtime or \
+                (signature and signature[1] != st.st_size):
+            return 'changed', new_path
+        if signature != (mtime, st.st_size, st.st_ino):
+            self.new_signatures.append(
+                (item_id, mtime, st.st_size, st.st_ino)
+            )
+        return 'current', new_path
+
+    def new_files(self):
+        """Return the sorted paths of the listed media files that belong
+        to no item in the library.
+        """
+        return sorted(
+            path for path in self.unclaimed.values()
+            if os.path.splitext(path)[1][1:].lower() in MEDIA_EXTENSIONS
+        )
+
+
+def _scan_items(lib, query, album, fields, jobs):
+    """Find the matched items whose file changed, moved or disappeared
+    with a `_StatScan` and read the changed files in `jobs` threads.
+    Return the scan, the list of these items and an iterable of their
+    results: `'deleted'`, `'moved'` (when only the path changed),
+    `'read'` or a `ReadError`. Moved items get their new path, and
+    their old one is kept in the scan's `moved` dictionary.
+    """
+    candidates = _scan_candidates(lib, query, album)
+    scan = _StatScan(lib, candidates, not query)
+
+    found = []
+    for item_id, path, mtime in candidates:
+        status, new_path = scan.check(item_id, path, mtime)
+        if status == 'current' and new_path is None:
+            continue
+        item = lib.get_item(item_id)
+        if new_path is not None:
+            scan.moved[item_id] = item.path
+            item.path = new_path
+            if status == 'current':
+                status = 'moved'
+        found.append((item, status))
+
+    results = util.par_imap(
+        lambda job: _read_changed(job[0], fields) if job[1] == 'changed'
+        else job[1],
+        found, jobs
+    )
+    return scan, [item for item, _ in found], results
+
+
+def _record_signatures(lib, scan, updated_items):
+    """Store the file signatures of the items that the scan found
+    unchanged but without an up-to-date signature, and of the items
+    that were updated.
+    """
+    signatures = scan.new_signatures
+    for item in updated_items:
+        try:
+            st = os.stat(syspath(item.path))
+        except OSError:
+            continue
+        signatures.append((item.id, item.mtime, st.st_size, st.st_ino))
+    lib.set_item_stats(signatures)
+
+
+def _show_moved(item, old_path):
+    """Show that the file of an item was found at a new path.
+    """
+    ui.print_(format(item))
+    ui.print_(u'  path: {0} -> {1}'.format(
+        displayable_path(old_path),
+        ui.colorize('text_highlight', displayable_path(item.path))
+    ))
+
+
+def update_items(lib, query, album, move, pretend, fields, jobs=1,
+                 scan=False):
     """For all the items matched by the query, update the library to
     reflect the item's embedded tags.
     :param fields: The fields to be stored. If not specified, all fields will
     be.
+    :param jobs: The number of threads reading the files. Changes are
+    still shown and stored in the order of the items.
+    :param scan: Find the changed files from the listings of the items'
+    directories instead of checking each item separately. Moved files
+    are followed and files missing from the library are listed.
     """
     with lib.transaction():
-        if move and fields is not None and 'path' not in fields:
+        if (move or scan) and fields is not None and 'path' not in fields:
             # Special case: if an item needs to be moved, the path field has to
             # updated; otherwise the new path will not be reflected in the
             # database.
             fields.append('path')
-        items, _ = _do_query(lib, query, album)
+        if scan:
+            stat_scan, items, results = _scan_items(lib, query, album,
+                                                    fields, jobs)
+        else:
+            stat_scan = None
+            items, _ = _do_query(lib, query, album)
+            results = util.par_imap(
+                lambda item: _check_and_read(item, fields), items, jobs
+            )
 
         # Walk through the items and pick up their changes.
         affected_albums = set()
-        for item in items:
+        updated_items = []
+        for item, result in zip(items, results):
             # Item deleted?
-            if not os.path.exists(syspath(item.path)):
+            if result == 'deleted':
                 ui.print_(format(item))
                 ui.print_(ui.colorize('text_error', u'  deleted'))
                 if not pretend:
@@ -1083,17 +1364,22 @@ def update_items(lib, query, album, move, pretend, fields):
                 continue
 
             # Did the item change since last checked?
-            if item.current_mtime() <= item.mtime:
+            if result == 'current':
                 log.debug(u'skipping {0} because mtime is up to date ({1})',
                           displayable_path(item.path), item.mtime)
                 continue
 
-            # Read new data.
-            try:
-                item.read()
-            except library.ReadError as exc:
+            # Was the file only moved?
+            if result == 'moved':
+                _show_moved(item, stat_scan.moved[item.id])
+                if not pretend:
+                    updated_items.append(item)
+                continue
+
+            # Could the new data be read?
+            if isinstance(result, library.ReadError):
                 log.error(u'error reading {0}: {1}',
-                          displayable_path(item.path), exc)
+                          displayable_path(item.path), result)
                 continue
 
             # Special-case album artist when it matches track artist. (Hacky
@@ -1106,6 +1392,8 @@ def update_items(lib, query, album, move, pretend, fields):
                     item._dirty.discard(u'albumartist')
 
             # Check for and display changes.
+            if stat_scan and item.id in stat_scan.moved:
+                _show_moved(item, stat_scan.moved[item.id])
             changed = ui.show_model_changes(
                 item,
                 fields=fields or library.Item._media_fields)
@@ -1117,23 +1405,29 @@ def update_items(lib, query, album, move, pretend, fields):
                     if move and lib.directory in ancestry(item.path):
                         item.move(store=False)
 
-                    item.store(fields=fields)
                     affected_albums.add(item.album_id)
-                else:
-                    # The file's mtime was different, but there were no
-                    # changes to the metadata. Store the new mtime,
-                    # which is set in the call to read(), so we don't
-                    # check this again in the future.
-                    item.store(fields=fields)
+                # Even if there were no changes to the metadata, the
+                # file's mtime was different. Store the new mtime, which
+                # is set in the call to read(), so we don't check this
+                # again in the future.
+                updated_items.append(item)
+
+        # List the files that are not in the library.
+        if stat_scan:
+            for path in stat_scan.new_files():
+                ui.print_(displayable_path(path))
+                ui.print_(ui.colorize('text_warning', u'  not in library'))
 
         # Skip album changes while pretending.
         if pretend:
             return
+        lib.store_many(updated_items, fields=fields)
+        if stat_scan:
+            _record_signatures(lib, stat_scan, updated_items)
 
         # Modify affected albums to reflect changes in their items.
-        for album_id in affected_albums:
-            if album_id is None:  # Singletons.
-                continue
+        affected_albums.discard(None)  # Singletons.
+        for album_id in sorted(affected_albums):
             album = lib.get_album(album_id)
             if not album:  # Empty albums have already been removed.
                 log.debug(u'emptied album {0}', album_id)
@@ -1160,7 +1454,8 @@ def update_items(lib, query, album, move, pretend, fields):
 
 def update_func(lib, opts, args):
     update_items(lib, decargs(args), opts.album, ui.should_move(opts.move),
-                 opts.pretend, opts.fields)
+                 opts.pretend, opts.fields,
+                 opts.jobs or config['file_workers'].get(int), opts.scan)
 
 
 update_cmd = ui.Subcommand(
@@ -1184,6 +1479,14 @@ update_cmd.parser.add_option(
     u'-F', u'--field', default=None, action='append', dest='fields',
     help=u'list of fields to update'
 )
+update_cmd.parser.add_option(
+    u'-j', u'--jobs', type='int', default=None,
+    help=u'number of files to read at once'
+)
+update_cmd.parser.add_option(
+    u'-s', u'--scan', action='store_true',
+    help=u'find changed, moved and new files from directory listings'
+)
 update_cmd.func = update_func
 default_commands.append(update_cmd)
 
@@ -1377,8 +1680,11 @@ def modify_items(lib, mods, dels, query, write, move, album, confirm):
             lambda o: print_and_modify(o, mods, dels)
         )
 
-    # Apply changes to database and files
+    # Apply changes to database and files. The changes are stored
+    # together first, so synchronizing only needs to store the paths of
+    # moved files.
     with lib.transaction():
+        lib.store_many(changed)
         for obj in changed:
             obj.try_sync(write, move)
 
@@ -1546,37 +1852,78 @@ default_commands.append(move_cmd)
 
 # write: Write tags into files.
 
-def write_items(lib, query, pretend, force):
+def _read_clean_item(item):
+    """Get an Item object reflecting the "clean" (on-disk) state of
+    `item`, `None` if its file is missing, or the `ReadError` raised
+    when reading it. Can run in a worker thread.
+    """
+    if not os.path.exists(syspath(item.path)):
+        return None
+    try:
+        return library.Item.from_path(item.path)
+    except library.ReadError as exc:
+        return exc
+
+
+def _write_file(job, force):
+    """Write the tags prepared for an item (an `(item, path, tags)`
+    tuple) to its file. Return the `FileOperationError` raised when
+    writing, if any. Can run in a worker thread.
+    """
+    item, path, tags = job
+    try:
+        item.write_file(path, tags, force)
+    except library.FileOperationError as exc:
+        return exc
+
+
+def write_items(lib, query, pretend, force, jobs=1):
     """Write tag information from the database to the respective files
     in the filesystem.
+
+    `jobs` threads read and write the files. Changes are still shown
+    in the order of the items, and the new mtimes are stored in one
+    transaction at the end.
     """
     items, albums = _do_query(lib, query, False, False)
 
-    for item in items:
+    to_write = []
+    for item, clean_item in zip(items, util.par_imap(_read_clean_item,
+                                                     items, jobs)):
         # Item deleted?
-        if not os.path.exists(syspath(item.path)):
+        if clean_item is None:
             log.info(u'missing file: {0}', util.displayable_path(item.path))
             continue
 
-        # Get an Item object reflecting the "clean" (on-disk) state.
-        try:
-            clean_item = library.Item.from_path(item.path)
-        except library.ReadError as exc:
+        if isinstance(clean_item, library.ReadError):
             log.error(u'error reading {0}: {1}',
-                      displayable_path(item.path), exc)
+                      displayable_path(item.path), clean_item)
             continue
 
         # Check for and display changes.
         changed = ui.show_model_changes(item, clean_item,
                                         library.Item._media_tag_fields, force)
         if (changed or force) and not pretend:
-            # We use `try_sync` here to keep the mtime up to date in the
-            # database.
-            item.try_sync(True, False)
+            to_write.append(item)
+
+    # Plugins get the `write` and `after_write` events in this thread;
+    # only the files are written in the workers.
+    to_write = [(item,) + item.prepare_write() for item in to_write]
+    results = util.par_imap(lambda job: _write_file(job, force),
+                            to_write, jobs)
+    for (item, path, _), exc in zip(to_write, results):
+        if exc is None:
+            plugins.send('after_write', item=item, path=path)
+        else:
+            log.error(u'{0}', exc)
+
+    # Store the items to keep the mtimes up to date in the database.
+    lib.store_many([item for item, _, _ in to_write])
 
 
 def write_func(lib, opts, args):
-    write_items(lib, decargs(args), opts.pretend, opts.force)
+    write_items(lib, decargs(args), opts.pretend, opts.force,
+                opts.jobs or config['file_workers'].get(int))
 
 
 write_cmd = ui.Subcommand(u'write', help=u'write tag information to files')
@@ -1588,6 +1935,10 @@ write_cmd.parser.add_option(
     u'-f', u'--force', action='store_true',
     help=u"write tags even if the existing tags match the database"
 )
+write_cmd.parser.add_option(
+    u'-j', u'--jobs', type='int', default=None,
+    help=u'number of files to read and write at once'
+)
 write_cmd.func = write_func
 default_commands.append(write_cmd)
 
@@ -19,14 +19,16 @@ from __future__ import division, absolute_import, print_function
 import os
 import sys
 import errno
+import multiprocessing.pool
 import locale
 import re
 import shutil
 import fnmatch
-from collections import Counter
+from collections import Counter, OrderedDict
 import traceback
 import subprocess
 import platform
+import threading
 import shlex
 from beets.util import hidden
 import six
@@ -211,6 +213,83 @@ def sorted_walk(path, ignore=(), ignore_hidden=False, logger=None):
             yield res
 
 
+class _ListedEntry(object):
+    """A stand-in for `os.DirEntry`, for Pythons without `os.scandir`.
+    """
+    def __init__(self, dirpath, name):
+        self.name = name
+        self.path = os.path.join(dirpath, name)
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+def _scandir(path):
+    """Like `os.scandir`, which is used where it is available. It reads
+    the file types along with the names and, on Windows, the stat
+    results too.
+    """
+    scandir = getattr(os, 'scandir', None)
+    if scandir is not None:
+        return scandir(path)
+    return [_ListedEntry(path, name) for name in os.listdir(path)]
+
+
+def stat_walk(path, recursive=True, ignore=(), ignore_hidden=False,
+              logger=None):
+    """Find the files in the directory `path` and, if `recursive` is
+    set, its subdirectories, and yield `(path, stat)` pairs. Names
+    matching any glob pattern in `ignore` are skipped. If `logger` is
+    provided, warnings are logged there for directories that cannot be
+    listed. Files that disappear while walking are skipped. The files
+    come in no particular order.
+    """
+    path = bytestring_path(path)
+    # Match all the patterns at once instead of calling `fnmatch` for
+    # each pattern and file.
+    ignore_re = None
+    if ignore:
+        ignore_re = re.compile(b'|'.join(
+            bytestring_path(fnmatch.translate(as_string(pat)))
+            for pat in ignore
+        ))
+
+    dirs = [path]
+    while dirs:
+        cur = dirs.pop()
+        try:
+            entries = _scandir(syspath(cur))
+        except OSError as exc:
+            if logger:
+                logger.warning(u'could not list directory {0}: {1}'.format(
+                    displayable_path(cur), exc.strerror
+                ))
+            continue
+
+        for entry in entries:
+            base = bytestring_path(entry.name)
+            if ignore_re and ignore_re.match(base):
+                continue
+            # On POSIX, the entries of a bytes path are already joined
+            # to it.
+            child = entry.path
+            if not isinstance(child, bytes):
+                child = os.path.join(cur, base)
+            if ignore_hidden and hidden.is_hidden(child):
+                continue
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        dirs.append(child)
+                else:
+                    yield child, entry.stat()
+            except OSError:
+                continue
+
+
 def mkdirall(path):
     """Make all the enclosing directories of path (like mkdir -p on the
     parent).
@@ -220,8 +299,10 @@ def mkdirall(path):
             try:
                 os.mkdir(syspath(ancestor))
             except (OSError, IOError) as exc:
-                raise FilesystemError(exc, 'create', (ancestor,),
-                                      traceback.format_exc())
+                # Another thread may have just created the directory.
+                if not os.path.isdir(syspath(ancestor)):
+                    raise FilesystemError(exc, 'create', (ancestor,),
+                                          traceback.format_exc())
 
 
 def fnmatch_all(names, patterns):
@@ -763,6 +844,95 @@ def cpu_count():
         return 1
 
 
+def par_map(transform, items, workers):
+    """Apply `transform` to each element of `items` in a pool of up to
+    `workers` threads and return the list of results, in the order of
+    `items`. If a call raises an exception, it is re-raised here. With a
+    single worker or element, everything runs in the calling thread.
+    """
+    items = list(items)
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [transform(item) for item in items]
+
+    pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        return pool.map(transform, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def par_imap(transform, items, workers):
+    """Like `par_map`, but yield the results one at a time, still in
+    the order of `items`, as soon as each is ready.
+    """
+    items = list(items)
+    workers = min(workers, len(items))
+    if workers <= 1:
+        for item in items:
+            yield transform(item)
+        return
+
+    pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        for result in pool.imap(transform, items):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+class LRUCache(object):
+    """A bounded cache for the results of functions, which forgets the
+    least recently used result when it is full. It counts its hits and
+    misses and may be shared between threads.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def call(self, func, *args):
+        """Return `func(*args)`, computing it only if it is not cached.
+        The arguments must be hashable.
+        """
+        key = (func,) + args
+        with self._lock:
+            try:
+                value = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self._results[key] = value
+                self.hits += 1
+                return value
+
+        value = func(*args)
+        with self._lock:
+            self._results[key] = value
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Forget all results and reset the counters.
+        """
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """The fraction of the calls answered from the cache.
+        """
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+
 def convert_command_args(args):
     """Convert command arguments to bytestrings on Python 2 and
     surrogate-escaped strings on Python 3."""
@@ -29,14 +29,26 @@ When running a parallel pipeline, it is also possible to use
 multiple coroutines for the same pipeline stage; this lets you speed
 up a bottleneck stage by dividing its work among multiple threads.
 To do so, pass an iterable of coroutines to the Pipeline constructor
-in place of any single coroutine.
+in place of any single coroutine. The threads of such a stage emit
+their messages in whatever order they finish; wrap the coroutines with
+`ordered` to keep messages in the order the stage received them.
+
+CPU-bound stages can be run in worker processes instead: define them
+with `process_stage` and run the pipeline with `run_multiprocess`. The
+other stages keep running in threads of the current process.
+
+Each run records statistics for every stage (see `StageStats`) in the
+pipeline's `stats` list, which helps to find the bottleneck.
 """
 
 from __future__ import division, absolute_import, print_function
 
 from six.moves import queue
-from threading import Thread, Lock
+from threading import Thread, Lock, Condition
+import functools
+import multiprocessing
 import sys
+import time
 import six
 
 BUBBLE = '__PIPELINE_BUBBLE__'
@@ -95,6 +107,11 @@ class CountedQueue(queue.Queue):
         queue.Queue.__init__(self, maxsize)
         self.nthreads = 0
         self.poisoned = False
+        self.high_water = 0
+
+    def _put(self, item):
+        queue.Queue._put(self, item)
+        self.high_water = max(self.high_water, len(self.queue))
 
     def acquire(self):
         """Indicate that a thread will start putting into this queue.
@@ -164,11 +181,15 @@ def stage(func):
     [3, 4, 5]
     """
 
-    def coro(*args):
+    def gen(args):
         task = None
         while True:
             task = yield task
             task = func(*(args + (task,)))
+
+    @functools.wraps(func)
+    def coro(*args):
+        return _StageCoroutine(gen(args), func.__name__)
     return coro
 
 
@@ -187,14 +208,212 @@ def mutator_stage(func):
     [{'x': True}, {'a': False, 'x': True}]
     """
 
-    def coro(*args):
+    def gen(args):
         task = None
         while True:
             task = yield task
             func(*(args + (task,)))
+
+    @functools.wraps(func)
+    def coro(*args):
+        return _StageCoroutine(gen(args), func.__name__)
     return coro
 
 
+class _StageCoroutine(object):
+    """The coroutine of a `stage` or `mutator_stage`: the generator
+    running the stage function, named after that function (the name of
+    the generator itself is not, on Python 2).
+    """
+    def __init__(self, gen, name):
+        self.gen = gen
+        self.send = gen.send
+        self.__name__ = name
+
+    def __next__(self):
+        return next(self.gen)
+    next = __next__
+
+
+def process_stage(func):
+    """Decorate a function to become a simple stage that
+    `Pipeline.run_multiprocess` runs in worker processes. Otherwise, it
+    works just like a `stage`.
+
+    In a worker process, the function gets pickled copies of its
+    arguments and of the message, so it must be defined at the top
+    level of a module, must not rely on any state it changes outside
+    of the message, and must return the message to send to the next
+    stage (changes to the message are not seen by the other stages
+    otherwise). The arguments, the message and the return value must
+    all be picklable.
+    """
+    # The decorated function takes the place of `func` in its module,
+    # so it is what gets pickled (by name) to reach the workers.
+    @functools.wraps(func)
+    def coro(*args):
+        return _ProcessCoroutine(coro, args)
+    coro.func = func
+    return coro
+
+
+def _call_stage(stage, args):
+    """Call the function of the `process_stage` `stage`.
+    """
+    return stage.func(*args)
+
+
+class _ProcessCoroutine(object):
+    """The coroutine of a `process_stage`. It calls the stage function
+    in the current thread or, when a `pool` is given, in one of the
+    pool's worker processes.
+    """
+    def __init__(self, stage, args, pool=None):
+        self.stage = stage
+        self.args = args
+        self.pool = pool
+        self.__name__ = stage.__name__
+
+    def __next__(self):
+        # Priming the coroutine does nothing.
+        return None
+    next = __next__
+
+    def send(self, msg):
+        args = self.args + (msg,)
+        if self.pool is None:
+            return _call_stage(self.stage, args)
+        return self.pool.apply(_call_stage, (self.stage, args))
+
+
+class _Ordered(tuple):
+    """The coroutines of a pipeline stage whose messages must be
+    emitted in order. See `ordered`.
+    """
+    name = None
+
+
+def ordered(coros, name=None):
+    """Make several coroutines (e.g., instances of the same coroutine
+    function) run a single pipeline stage in parallel while keeping the
+    order of its messages: the messages produced for each input are
+    sent to the next stage after the ones for all earlier inputs. This
+    only applies to stages other than the first and last.
+
+    `name` is used for the stage in the pipeline's statistics instead of
+    the name of the first coroutine.
+    """
+    stage = _Ordered(coros)
+    stage.name = name
+    return stage
+
+
+class StageStats(object):
+    """Statistics for one pipeline stage, summed over the threads
+    running it:
+
+    - `received` and `sent`: the number of messages that the stage got
+      and passed on to the next stage.
+    - `busy`: the seconds spent in the stage's coroutines.
+    - `wait_in` and `wait_out`: the seconds spent blocked on the input
+      and output queues, i.e., waiting for the previous stage or for
+      the next stage to catch up.
+    - `queue_max`: the largest number of messages waiting in the
+      stage's input queue at once.
+
+    The waiting times and the queue size are only recorded when the
+    pipeline runs in parallel.
+    """
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.received = 0
+        self.sent = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.queue_max = 0
+        self._lock = Lock()
+
+    def add(self, received=0, sent=0, busy=0.0, wait_in=0.0, wait_out=0.0):
+        """Add the counts and times of one thread of the stage.
+        """
+        with self._lock:
+            self.received += received
+            self.sent += sent
+            self.busy += busy
+            self.wait_in += wait_in
+            self.wait_out += wait_out
+
+    def as_dict(self):
+        """Get the statistics as a dictionary, e.g., for JSON output.
+        """
+        return {
+            'name': self.name,
+            'workers': self.workers,
+            'received': self.received,
+            'sent': self.sent,
+            'busy': self.busy,
+            'wait_in': self.wait_in,
+            'wait_out': self.wait_out,
+            'queue_max': self.queue_max,
+        }
+
+
+def _stage_name(stage):
+    """Get a name for a pipeline stage (a sequence of coroutines).
+    """
+    name = getattr(stage, 'name', None)
+    if name:
+        return name
+    return getattr(stage[0], '__name__', type(stage[0]).__name__)
+
+
+class _Sequencer(object):
+    """Hand out tickets to the threads of an ordered stage as they get
+    messages from the stage's input queue, and let them emit their
+    output in ticket order.
+    """
+    def __init__(self):
+        self.get_lock = Lock()
+        self.turn = Condition()
+        self.next_ticket = 0
+        self.next_turn = 0
+        self.aborted = False
+
+    def get(self, in_queue):
+        """Get a message from `in_queue` along with its ticket.
+        """
+        with self.get_lock:
+            msg = in_queue.get()
+            ticket = self.next_ticket
+            self.next_ticket += 1
+        return msg, ticket
+
+    def wait(self, ticket):
+        """Block until the message with `ticket` may be emitted. Return
+        False if the pipeline is aborted instead.
+        """
+        with self.turn:
+            while self.next_turn != ticket and not self.aborted:
+                self.turn.wait()
+            return not self.aborted
+
+    def done(self):
+        """Let the message with the next ticket be emitted.
+        """
+        with self.turn:
+            self.next_turn += 1
+            self.turn.notify_all()
+
+    def abort(self):
+        """Wake up all the threads waiting for their turn.
+        """
+        with self.turn:
+            self.aborted = True
+            self.turn.notify_all()
+
+
 def _allmsgs(obj):
     """Returns a list of all the messages encapsulated in obj. If obj
     is a MultiMessage, returns its enclosed messages. If obj is BUBBLE,
@@ -210,13 +429,44 @@ def _allmsgs(obj):
 
 class PipelineThread(Thread):
     """Abstract base class for pipeline-stage threads."""
-    def __init__(self, all_threads):
+    def __init__(self, all_threads, stats=None):
         super(PipelineThread, self).__init__()
         self.abort_lock = Lock()
         self.abort_flag = False
         self.all_threads = all_threads
         self.exc_info = None
 
+        # This thread's share of the stage statistics, added to `stats`
+        # when the thread is done.
+        self.stats = stats or StageStats(None)
+        self.received = 0
+        self.sent = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+
+    def get(self):
+        """Get a message from the input queue.
+        """
+        start = time.time()
+        msg = self.in_queue.get()
+        self.wait_in += time.time() - start
+        return msg
+
+    def put(self, msg):
+        """Put a message into the output queue.
+        """
+        start = time.time()
+        self.out_queue.put(msg)
+        self.wait_out += time.time() - start
+        self.sent += 1
+
+    def add_stats(self):
+        """Add this thread's counts and times to the stage statistics.
+        """
+        self.stats.add(self.received, self.sent, self.busy,
+                       self.wait_in, self.wait_out)
+
     def abort(self):
         """Shut down the thread at the next chance possible.
         """
@@ -228,6 +478,8 @@ class PipelineThread(Thread):
                 _invalidate_queue(self.in_queue, POISON)
             if hasattr(self, 'out_queue'):
                 _invalidate_queue(self.out_queue, POISON)
+            if getattr(self, 'sequencer', None):
+                self.sequencer.abort()
 
     def abort_all(self, exc_info):
         """Abort all other threads in the system for an exception.
@@ -241,8 +493,8 @@ class FirstPipelineThread(PipelineThread):
     """The thread running the first stage in a parallel pipeline setup.
     The coroutine should just be a generator.
     """
-    def __init__(self, coro, out_queue, all_threads):
-        super(FirstPipelineThread, self).__init__(all_threads)
+    def __init__(self, coro, out_queue, all_threads, stats=None):
+        super(FirstPipelineThread, self).__init__(all_threads, stats)
         self.coro = coro
         self.out_queue = out_queue
         self.out_queue.acquire()
@@ -258,22 +510,28 @@ class FirstPipelineThread(PipelineThread):
                         return
 
                 # Get the value from the generator.
+                start = time.time()
                 try:
                     msg = next(self.coro)
                 except StopIteration:
                     break
+                finally:
+                    self.busy += time.time() - start
 
                 # Send messages to the next stage.
                 for msg in _allmsgs(msg):
                     with self.abort_lock:
                         if self.abort_flag:
                             return
-                    self.out_queue.put(msg)
+                    self.put(msg)
 
         except BaseException:
             self.abort_all(sys.exc_info())
             return
 
+        finally:
+            self.add_stats()
+
         # Generator finished; shut down the pipeline.
         self.out_queue.release()
 
@@ -282,12 +540,14 @@ class MiddlePipelineThread(PipelineThread):
     """A thread running any stage in the pipeline except the first or
     last.
     """
-    def __init__(self, coro, in_queue, out_queue, all_threads):
-        super(MiddlePipelineThread, self).__init__(all_threads)
+    def __init__(self, coro, in_queue, out_queue, all_threads,
+                 sequencer=None, stats=None):
+        super(MiddlePipelineThread, self).__init__(all_threads, stats)
         self.coro = coro
         self.in_queue = in_queue
         self.out_queue = out_queue
         self.out_queue.acquire()
+        self.sequencer = sequencer
 
     def run(self):
         try:
@@ -300,7 +560,12 @@ class MiddlePipelineThread(PipelineThread):
                         return
 
                 # Get the message from the previous stage.
-                msg = self.in_queue.get()
+                start = time.time()
+                if self.sequencer:
+                    msg, ticket = self.sequencer.get(self.in_queue)
+                else:
+                    msg = self.in_queue.get()
+                self.wait_in += time.time() - start
                 if msg is POISON:
                     break
 
@@ -309,19 +574,35 @@ class MiddlePipelineThread(PipelineThread):
                         return
 
                 # Invoke the current stage.
+                self.received += 1
+                start = time.time()
                 out = self.coro.send(msg)
+                self.busy += time.time() - start
+
+                # In an ordered stage, wait until the messages for all
+                # earlier inputs have been sent.
+                start = time.time()
+                if self.sequencer and not self.sequencer.wait(ticket):
+                    return
+                self.wait_out += time.time() - start
 
                 # Send messages to next stage.
                 for msg in _allmsgs(out):
                     with self.abort_lock:
                         if self.abort_flag:
                             return
-                    self.out_queue.put(msg)
+                    self.put(msg)
+
+                if self.sequencer:
+                    self.sequencer.done()
 
         except BaseException:
             self.abort_all(sys.exc_info())
             return
 
+        finally:
+            self.add_stats()
+
         # Pipeline is shutting down normally.
         self.out_queue.release()
 
@@ -330,8 +611,8 @@ class LastPipelineThread(PipelineThread):
     """A thread running the last stage in a pipeline. The coroutine
     should yield nothing.
     """
-    def __init__(self, coro, in_queue, all_threads):
-        super(LastPipelineThread, self).__init__(all_threads)
+    def __init__(self, coro, in_queue, all_threads, stats=None):
+        super(LastPipelineThread, self).__init__(all_threads, stats)
         self.coro = coro
         self.in_queue = in_queue
 
@@ -346,7 +627,7 @@ class LastPipelineThread(PipelineThread):
                         return
 
                 # Get the message from the previous stage.
-                msg = self.in_queue.get()
+                msg = self.get()
                 if msg is POISON:
                     break
 
@@ -355,12 +636,18 @@ class LastPipelineThread(PipelineThread):
                         return
 
                 # Send to consumer.
+                self.received += 1
+                start = time.time()
                 self.coro.send(msg)
+                self.busy += time.time() - start
 
         except BaseException:
             self.abort_all(sys.exc_info())
             return
 
+        finally:
+            self.add_stats()
+
 
 class Pipeline(object):
     """Represents a staged pattern of work. Each stage in the pipeline
@@ -380,6 +667,13 @@ class Pipeline(object):
             else:
                 # Default to one thread per stage.
                 self.stages.append((stage,))
+        self.stats = self._new_stats()
+
+    def _new_stats(self, parallel=True):
+        """Make a list of empty `StageStats`, one for each stage.
+        """
+        return [StageStats(_stage_name(stage), len(stage) if parallel else 1)
+                for stage in self.stages]
 
     def run_sequential(self):
         """Run the pipeline sequentially in the current thread. The
@@ -396,22 +690,30 @@ class Pipeline(object):
         queue_count = len(self.stages) - 1
         queues = [CountedQueue(queue_size) for i in range(queue_count)]
         threads = []
+        self.stats = stats = self._new_stats()
 
         # Set up first stage.
         for coro in self.stages[0]:
-            threads.append(FirstPipelineThread(coro, queues[0], threads))
+            threads.append(FirstPipelineThread(coro, queues[0], threads,
+                                               stats[0]))
 
         # Middle stages.
         for i in range(1, queue_count):
+            if isinstance(self.stages[i], _Ordered) and \
+               len(self.stages[i]) > 1:
+                sequencer = _Sequencer()
+            else:
+                sequencer = None
             for coro in self.stages[i]:
                 threads.append(MiddlePipelineThread(
-                    coro, queues[i - 1], queues[i], threads
+                    coro, queues[i - 1], queues[i], threads, sequencer,
+                    stats[i]
                 ))
 
         # Last stage.
         for coro in self.stages[-1]:
             threads.append(
-                LastPipelineThread(coro, queues[-1], threads)
+                LastPipelineThread(coro, queues[-1], threads, stats[-1])
             )
 
         # Start threads.
@@ -438,12 +740,48 @@ class Pipeline(object):
             for thread in threads[:-1]:
                 thread.join()
 
+            for stage_stats, q in zip(stats[1:], queues):
+                stage_stats.queue_max = q.high_water
+
         for thread in threads:
             exc_info = thread.exc_info
             if exc_info:
                 # Make the exception appear as it was raised originally.
                 six.reraise(exc_info[0], exc_info[1], exc_info[2])
 
+    def run_multiprocess(self, queue_size=DEFAULT_QUEUE_SIZE,
+                         processes=None, initializer=None, initargs=()):
+        """Run the pipeline in parallel like `run_parallel`, but run
+        the stages made with `process_stage` in a pool of `processes`
+        worker processes (by default, one per CPU). Each of these stages
+        keeps the order of its messages. All other stages run in threads
+        of the current process.
+
+        If `initializer` is given, each worker process calls
+        `initializer(*initargs)` when it starts.
+        """
+        processes = processes or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes, initializer, initargs)
+        try:
+            stages = [self.stages[0]]
+            for stage in self.stages[1:]:
+                if all(isinstance(c, _ProcessCoroutine) for c in stage):
+                    # One thread per worker process hands the stage's
+                    # messages to the pool.
+                    stage = ordered([
+                        _ProcessCoroutine(stage[0].stage, stage[0].args, pool)
+                        for _ in range(processes)
+                    ])
+                stages.append(stage)
+            pl = Pipeline(stages)
+            try:
+                pl.run_parallel(queue_size)
+            finally:
+                self.stats = pl.stats
+        finally:
+            pool.terminate()
+            pool.join()
+
     def pull(self):
         """Yield elements from the end of the pipeline. Runs the stages
         sequentially until the last yields some messages. Each of the messages
@@ -452,27 +790,40 @@ class Pipeline(object):
         yield any messages. Only the first coroutine in each stage is used
         """
         coros = [stage[0] for stage in self.stages]
+        self.stats = stats = self._new_stats(parallel=False)
 
         # "Prime" the coroutines.
         for coro in coros[1:]:
             next(coro)
 
         # Begin the pipeline.
-        for out in coros[0]:
+        first = iter(coros[0])
+        while True:
+            start = time.time()
+            try:
+                out = next(first)
+            except StopIteration:
+                break
+            finally:
+                stats[0].busy += time.time() - start
             msgs = _allmsgs(out)
-            for coro in coros[1:]:
+            stats[0].sent += len(msgs)
+            for coro, stage_stats in zip(coros[1:], stats[1:]):
                 next_msgs = []
                 for msg in msgs:
+                    start = time.time()
                     out = coro.send(msg)
+                    stage_stats.busy += time.time() - start
                     next_msgs.extend(_allmsgs(out))
+                stage_stats.received += len(msgs)
+                if stage_stats is not stats[-1]:
+                    stage_stats.sent += len(next_msgs)
                 msgs = next_msgs
             for msg in msgs:
                 yield msg
 
 # Smoke test.
 if __name__ == '__main__':
-    import time
-
     # Test a normally-terminating pipeline both in sequence and
     # in parallel.
     def produce():
@@ -23,10 +23,25 @@ from beets import ui
 from beets import vfs
 from beets import library
 from beets.util.functemplate import Template
+from beets import autotag
+from beets.autotag import hooks
 from beets.autotag import match
+from beets.autotag import mb
 from beets import plugins
 from beets import importer
+from beets import dbcore
+from beets import config
+from beets import mediafile
+from beets import util
+from beets.util import pipeline
+from beets.ui import commands
+import contextlib
 import cProfile
+import os
+import shutil
+import tempfile
+import threading
+import time
 import timeit
 
 
@@ -84,6 +99,670 @@ def match_benchmark(lib, prof, query=None, album_id=None):
         print('match duration:', interval)
 
 
+def assign_benchmark(prof, num_tracks, num_candidates):
+    """Time the track assignment of a synthetic album of `num_tracks`
+    items against `num_candidates` releases, and report the number of
+    item/track pairs compared per second.
+    """
+    items = _synthetic_albums(1, num_tracks)[0]
+    candidates = list(_local_match_album(num_candidates)(
+        u'artist', u'album 0', num_tracks))
+    pairs = sum(len(items) * len(info.tracks) for info in candidates)
+
+    def _costs_per_pair():
+        for info in candidates:
+            [[match.track_distance(item, track).distance
+              for track in info.tracks] for item in items]
+
+    def _costs():
+        for info in candidates:
+            match.assignment_costs(items, info.tracks)
+
+    def _assign():
+        for info in candidates:
+            match.assign_items(items, info.tracks)
+
+    if prof:
+        cProfile.runctx('_assign()', {}, {'_assign': _assign},
+                        'assign.prof')
+    else:
+        for desc, func in (('track_distance per pair', _costs_per_pair),
+                           ('cost matrix', _costs),
+                           ('assignment', _assign)):
+            interval = timeit.timeit(func, number=1)
+            print('{0}: {1:.3f}s, {2} pairs per second'.format(
+                desc, interval, int(pairs / interval)))
+
+
+def _va_compilation(num_tracks, num_candidates):
+    """Create the items of a various-artists compilation and candidate
+    releases for it, which differ in a few titles and artists.
+    """
+    items = [library.Item(
+        title=u'Song Number {0} (Radio Edit)'.format(i),
+        artist=u'Artist {0} feat. Guest {1}'.format(i, i % 7),
+        albumartist=u'Various Artists', album=u'Compilation',
+        track=i + 1, length=200.0 + i, comp=True,
+    ) for i in range(num_tracks)]
+    candidates = []
+    for c in range(num_candidates):
+        tracks = [autotag.TrackInfo(
+            u'Song Number {0}'.format(i + (c if i % 10 == 0 else 0)),
+            u'track {0}'.format(i),
+            artist=u'The Artist {0}'.format(i), length=201.0 + i,
+            index=i + 1,
+        ) for i in range(num_tracks)]
+        candidates.append(autotag.AlbumInfo(
+            u'Compilation', u'album {0}'.format(c), u'Various Artists',
+            u'artist', tracks, va=True))
+    return items, candidates
+
+
+def string_dist_benchmark(prof, num_tracks, num_candidates):
+    """Time matching a large various-artists compilation against a few
+    candidates, without the string distance caches, with empty ones and
+    with the ones the first matches filled, and report the hit rates.
+    """
+    items, candidates = _va_compilation(num_tracks, num_candidates)
+    caches = (hooks.normalize_cache, hooks.string_dist_cache)
+
+    def _match():
+        for info in candidates:
+            mapping, _, _ = match.assign_items(items, info.tracks)
+            match.distance(items, info, mapping)
+
+    if prof:
+        cProfile.runctx('_match()', {}, {'_match': _match},
+                        'string_dist.prof')
+        return
+
+    sizes = [cache.size for cache in caches]
+    try:
+        for desc, size, clear in (('uncached', 0, True),
+                                  ('cold cache', None, True),
+                                  ('warm cache', None, False)):
+            for cache, cache_size in zip(caches, sizes):
+                cache.size = cache_size if size is None else size
+                if clear:
+                    cache.clear()
+            interval = timeit.timeit(_match, number=1)
+            print(u'{0}: {1:.3f}s, normalization hit rate {2:.0%}, '
+                  u'distance hit rate {3:.0%}'.format(
+                      desc, interval, caches[0].hit_rate,
+                      caches[1].hit_rate))
+    finally:
+        for cache, cache_size in zip(caches, sizes):
+            cache.size = cache_size
+
+
+@contextlib.contextmanager
+def _count_statements():
+    """Count the SQL statements issued through dbcore transactions
+    while the context is active. Yields a one-element list holding the
+    count.
+    """
+    count = [0]
+    query, mutate = dbcore.db.Transaction.query, dbcore.db.Transaction.mutate
+    mutate_many = dbcore.db.Transaction.mutate_many
+
+    def counted(func):
+        def wrapper(self, *args, **kwargs):
+            count[0] += 1
+            return func(self, *args, **kwargs)
+        return wrapper
+
+    dbcore.db.Transaction.query = counted(query)
+    dbcore.db.Transaction.mutate = counted(mutate)
+    dbcore.db.Transaction.mutate_many = counted(mutate_many)
+    try:
+        yield count
+    finally:
+        dbcore.db.Transaction.query = query
+        dbcore.db.Transaction.mutate = mutate
+        dbcore.db.Transaction.mutate_many = mutate_many
+
+
+def _synthetic_library(num_items, num_flex, path=':memory:'):
+    """Create a library (by default, in memory) containing `num_items`
+    items, each with `num_flex` flexible attributes.
+    """
+    lib = library.Library(path)
+    with lib.transaction():
+        for i in range(num_items):
+            item = library.Item(
+                title=u'title {0}'.format(i),
+                artist=u'artist {0}'.format(i % 100),
+                album=u'album {0}'.format(i % 1000),
+                track=i % 20 + 1,
+                path=u'/music/{0}.mp3'.format(i).encode('utf-8'),
+            )
+            for j in range(num_flex):
+                item[u'flex{0}'.format(j)] = u'value {0}'.format(j)
+            lib.add(item)
+    return lib
+
+
+def fetch_benchmark(prof, num_items, num_flex, stream=False):
+    print('Building a library with {0} items...'.format(num_items))
+    lib = _synthetic_library(num_items, num_flex)
+
+    def _fetch_items():
+        for item in lib.items(stream=stream):
+            pass
+
+    def _fetch_first():
+        lib.items(stream=stream).get()
+
+    if prof:
+        cProfile.runctx('_fetch_items()', {}, {'_fetch_items': _fetch_items},
+                        'fetch.prof')
+    else:
+        interval = timeit.timeit(_fetch_first, number=1)
+        print('first item:', interval)
+        with _count_statements() as count:
+            interval = timeit.timeit(_fetch_items, number=1)
+        print('fetch duration:', interval)
+        print('SQL statements:', count[0])
+
+
+def format_benchmark(prof, num_items, num_flex):
+    print('Building a library with {0} items...'.format(num_items))
+    lib = _synthetic_library(num_items, num_flex)
+    items = list(lib.items())
+    template = Template(config['format_item'].as_str())
+
+    def _format_items():
+        for item in items:
+            item.evaluate_template(template)
+
+    def _format_all_fields():
+        # Computed fields are skipped: `filesize` would hit the disk.
+        for item in items:
+            formatted = item.formatted()
+            for key in item.keys():
+                formatted[key]
+
+    if prof:
+        cProfile.runctx('_format_items()', {},
+                        {'_format_items': _format_items}, 'format.prof')
+    else:
+        for desc, func in (('format_item template', _format_items),
+                           ('all stored fields', _format_all_fields)):
+            interval = timeit.timeit(func, number=1)
+            print('{0}: {1:.3f}s, {2} items per second'.format(
+                desc, interval, int(num_items / interval)))
+
+
+def destination_benchmark(prof, num_items, num_formats):
+    print('Building a library with {0} items...'.format(num_items))
+    lib = _synthetic_library(num_items, 0)
+    lib.directory = b'/music'
+
+    # Conditional formats that do not match the items (so they are all
+    # tried), followed by the default format.
+    path_formats = [
+        (u'artist:nobody{0}'.format(i), Template(u'$artist/$title'))
+        for i in range(num_formats)
+    ]
+    path_formats.append((library.PF_KEY_DEFAULT,
+                         Template(u'$albumartist/$album/$track $title')))
+    lib.path_formats = path_formats
+    items = list(lib.items())
+
+    def _destinations():
+        for item in items:
+            item.destination()
+
+    def _destinations_uncached():
+        for item in items:
+            lib.path_formats = path_formats  # Discard the parsed formats.
+            item.destination()
+
+    if prof:
+        cProfile.runctx('_destinations()', {},
+                        {'_destinations': _destinations}, 'dest.prof')
+    else:
+        for desc, func in (('cached path formats', _destinations),
+                           ('parsed for every item', _destinations_uncached)):
+            interval = timeit.timeit(func, number=1)
+            print('{0}: {1:.3f}s, {2} destinations per second'.format(
+                desc, interval, int(num_items / interval)))
+
+
+def store_benchmark(prof, num_items, num_flex):
+    def _make_items():
+        items = []
+        for i in range(num_items):
+            item = library.Item(
+                title=u'title {0}'.format(i),
+                path=u'/music/{0}.mp3'.format(i).encode('utf-8'),
+            )
+            for j in range(num_flex):
+                item[u'flex{0}'.format(j)] = u'value {0}'.format(j)
+            items.append(item)
+        return items
+
+    def _modify(items):
+        for item in items:
+            item.title += u' (modified)'
+            for j in range(num_flex):
+                item[u'flex{0}'.format(j)] += u' (modified)'
+
+    def _add_each(lib, items):
+        with lib.transaction():
+            for item in items:
+                lib.add(item)
+
+    def _store_each(lib, items):
+        with lib.transaction():
+            for item in items:
+                item.store()
+
+    def _add_many(lib, items):
+        lib.add_many(items)
+
+    def _store_many(lib, items):
+        lib.store_many(items)
+
+    if prof:
+        lib = library.Library(':memory:')
+        items = _make_items()
+        cProfile.runctx('lib.add_many(items)', {},
+                        {'lib': lib, 'items': items}, 'add.prof')
+        return
+
+    for desc, add, store in (('one at a time', _add_each, _store_each),
+                             ('batched', _add_many, _store_many)):
+        lib = library.Library(':memory:')
+        items = _make_items()
+        for op, func in (('add', add), ('store', store)):
+            if op == 'store':
+                _modify(items)
+            with _count_statements() as count:
+                interval = timeit.timeit(lambda: func(lib, items), number=1)
+            print('{0} {1}: {2:.1f}us and {3:.3f} statements per item'.format(
+                op, desc, interval / num_items * 1e6, count[0] / num_items))
+
+
+def concurrency_benchmark(num_items, num_readers, duration, query):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for wal in (False, True):
+            config['wal'] = wal
+            print('Building a library with {0} items...'.format(num_items))
+            lib = _synthetic_library(
+                num_items, 0,
+                os.path.join(tmpdir, 'wal.db' if wal else 'nowal.db'),
+            )
+            reads, writes = _run_concurrently(lib, num_readers, duration,
+                                              query)
+            print('{0}: {1:.1f} queries and {2:.1f} albums added per '
+                  'second'.format('WAL' if wal else 'global lock',
+                                  reads / duration, writes / duration))
+    finally:
+        config['wal'] = False
+        shutil.rmtree(tmpdir)
+
+
+def _run_concurrently(lib, num_readers, duration, query):
+    """Run `num_readers` threads querying `lib` while another thread
+    adds albums, like an importer, for `duration` seconds. Return the
+    numbers of queries and albums completed.
+    """
+    stop = threading.Event()
+    reads = [0] * num_readers
+    writes = [0]
+
+    def _read(index):
+        while not stop.is_set():
+            list(lib.items(query))
+            reads[index] += 1
+
+    def _write():
+        while not stop.is_set():
+            lib.add_album([
+                library.Item(
+                    title=u'new title {0}'.format(i),
+                    album=u'new album {0}'.format(writes[0]),
+                    path=u'/new/{0}/{1}.mp3'.format(writes[0], i)
+                    .encode('utf-8'),
+                ) for i in range(10)
+            ])
+            writes[0] += 1
+
+    threads = [threading.Thread(target=_read, args=(i,))
+               for i in range(num_readers)]
+    threads.append(threading.Thread(target=_write))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads), writes[0]
+
+
+def read_benchmark(lib, prof, source, num_files, workers, processes):
+    tmpdir = util.bytestring_path(tempfile.mkdtemp())
+    try:
+        # A tree of albums with ten tagged copies of the source file.
+        print('Building a tree of {0} files...'.format(num_files))
+        ext = os.path.splitext(source)[1]
+        for i in range(num_files):
+            album_dir = os.path.join(
+                tmpdir, util.bytestring_path('album {0}'.format(i // 10))
+            )
+            if not os.path.isdir(album_dir):
+                os.mkdir(album_dir)
+            path = os.path.join(
+                album_dir, util.bytestring_path('{0}'.format(i % 10)) + ext
+            )
+            shutil.copyfile(source, path)
+            mf = mediafile.MediaFile(path)
+            mf.update({
+                'title': u'title {0}'.format(i),
+                'album': u'album {0}'.format(i // 10),
+                'track': i % 10 + 1,
+            })
+            mf.save()
+
+        session = importer.ImportSession(lib, None, [tmpdir], None)
+        session.set_config(config['import'])
+        config['import']['read_processes'] = processes
+
+        def _read_tasks():
+            factory = importer.ImportTaskFactory(tmpdir, session)
+            for task in factory.tasks():
+                pass
+
+        config['import']['read_workers'] = workers
+        if prof:
+            cProfile.runctx('_read_tasks()', {},
+                            {'_read_tasks': _read_tasks}, 'read.prof')
+        else:
+            for num_workers in (1, workers):
+                config['import']['read_workers'] = num_workers
+                interval = timeit.timeit(_read_tasks, number=1)
+                print('{0} reader(s): {1:.3f}s, {2} files per second'.format(
+                    num_workers, interval, int(num_files / interval)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def scan_benchmark(prof, num_files):
+    tmpdir = util.bytestring_path(tempfile.mkdtemp())
+    try:
+        # A library of albums with ten placeholder files each. The files
+        # are never opened since none of them changes.
+        print('Building a library of {0} files...'.format(num_files))
+        lib = library.Library(os.path.join(tmpdir, b'library.db'),
+                              os.path.join(tmpdir, b'music'))
+        os.mkdir(lib.directory)
+        items = []
+        for i in range(num_files):
+            album_dir = os.path.join(
+                lib.directory,
+                util.bytestring_path('album {0}'.format(i // 10))
+            )
+            if not os.path.isdir(album_dir):
+                os.mkdir(album_dir)
+            path = os.path.join(
+                album_dir, util.bytestring_path('{0}.mp3'.format(i % 10))
+            )
+            with open(path, 'wb') as f:
+                f.write(b'\0' * (i % 100 + 1))
+            item = library.Item(title=u'title {0}'.format(i), path=path)
+            item.mtime = item.current_mtime()
+            items.append(item)
+        lib.add_many(items)
+
+        def _update(scan):
+            commands.update_items(lib, [], False, False, False, None,
+                                  scan=scan)
+
+        # The first scan records the file signatures.
+        _update(True)
+        if prof:
+            cProfile.runctx('_update(True)', {}, {'_update': _update},
+                            'scan.prof')
+            return
+
+        for desc, scan in (('one file at a time', False),
+                           ('directory scan', True)):
+            interval = timeit.timeit(lambda: _update(scan), number=1)
+            print('{0}: {1:.3f}s, {2} files per second'.format(
+                desc, interval, int(num_files / interval)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def tags_benchmark(prof, sources, repeat, num_images, image_size, fields):
+    """Tag a copy of each source file with synthetic metadata and
+    `num_images` images and time reading every field `Item.read` reads
+    from it, from an open file and including opening it. Then time
+    reading only `fields`, and measure the time and memory taken by
+    decoding the images for `art` and `images`.
+    """
+    tmpdir = util.bytestring_path(tempfile.mkdtemp())
+    all_fields = sorted(library.Item._media_fields)
+    # A PNG signature, so the data is recognized as an image, followed
+    # by filler that varies between images.
+    images = [mediafile.Image(
+        b'\x89PNG\r\n\x1a\n' + bytes(bytearray(
+            (i + j) % 256 for j in range(image_size))),
+        desc=u'image {0}'.format(i), type=i % 20,
+    ) for i in range(num_images)]
+    try:
+        mediafiles = []
+        for i, source in enumerate(sources):
+            path = os.path.join(tmpdir, util.bytestring_path(
+                '{0}{1}'.format(i, os.path.splitext(source)[1])))
+            shutil.copyfile(source, path)
+            mf = mediafile.MediaFile(path)
+            mf.update({
+                'title': u'title', 'artist': u'artist', 'album': u'album',
+                'albumartist': u'album artist', 'genre': u'genre',
+                'composer': u'composer', 'comments': u'comments',
+                'track': 2, 'tracktotal': 10, 'disc': 1, 'disctotal': 1,
+                'year': 2001, 'month': 2, 'day': 3, 'bpm': 120,
+                'mb_trackid': u'7d4a1b2e-0000-4000-8000-000000000000',
+                'mb_albumid': u'9e873859-0000-4000-8000-000000000000',
+                'images': images,
+            })
+            mf.save()
+            mediafiles.append(mediafile.MediaFile(path))
+
+        def _read_fields(mf):
+            for _ in range(repeat):
+                for field in all_fields:
+                    getattr(mf, field)
+
+        def _read_items(path, fields=None):
+            for _ in range(repeat):
+                library.Item().read(path, fields)
+
+        def _read_images(path):
+            mf = mediafile.MediaFile(path)
+            if mf.art is not None:
+                return len(mf.images)
+
+        if prof:
+            cProfile.runctx('for mf in mfs: _read_fields(mf)', {},
+                            {'mfs': mediafiles, '_read_fields': _read_fields},
+                            'tags.prof')
+            return
+
+        for mf in mediafiles:
+            interval = timeit.timeit(lambda: _read_fields(mf), number=1)
+            opened = timeit.timeit(lambda: _read_items(mf.path), number=1)
+            subset = timeit.timeit(lambda: _read_items(mf.path, fields),
+                                   number=1)
+            print(u'{0} ({1}): {2} fields per second; Item.read: {3} files '
+                  u'per second, {4} reading only {5}'.format(
+                      mf.type, type(mf.mgfile).__name__,
+                      int(len(all_fields) * repeat / interval),
+                      int(repeat / opened), int(repeat / subset),
+                      u', '.join(fields)))
+            if not num_images:
+                continue
+            with _peak_memory() as peak:
+                interval = timeit.timeit(lambda: _read_images(mf.path),
+                                         number=1)
+            print(u'  opening and reading art and {0} images: {1:.1f}ms, '
+                  u'{2} peak'.format(num_images, interval * 1e3,
+                                     u'{0:.1f}MB'.format(peak[0] / 1e6)
+                                     if peak else u'unknown'))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+@contextlib.contextmanager
+def _peak_memory():
+    """Measure the peak memory allocated in the block with
+    `tracemalloc`, which is not available on Python 2. The result is
+    put in the yielded list.
+    """
+    peak = []
+    try:
+        import tracemalloc
+    except ImportError:
+        yield peak
+        return
+    tracemalloc.start()
+    try:
+        yield peak
+        peak.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+
+def _synthetic_albums(num_albums, num_tracks):
+    """Create lists of items, not associated with a library, that look
+    like freshly read albums.
+    """
+    albums = []
+    for i in range(num_albums):
+        albums.append([library.Item(
+            title=u'title {0} {1}'.format(i, j),
+            artist=u'artist {0}'.format(i % 50),
+            album=u'album {0}'.format(i),
+            track=j + 1,
+            length=180.0 + j,
+            path=util.bytestring_path('/tmp/album {0}/{1}.mp3'.format(i, j)),
+        ) for j in range(num_tracks)])
+    return albums
+
+
+def _local_match_album(num_candidates):
+    """Make a stand-in for `mb.match_album` that answers without the
+    network with `num_candidates` slightly different releases.
+    """
+    def match_album(artist, album, tracks):
+        for c in range(num_candidates):
+            track_infos = [autotag.TrackInfo(
+                u'title {0} {1}'.format(album[6:], j + c % 2),
+                u'track {0}'.format(j), artist=artist,
+                length=180.0 + j + c, index=j + 1,
+            ) for j in range(tracks + c % 3)]
+            yield autotag.AlbumInfo(album, u'album {0}'.format(c), artist,
+                                    u'artist', track_infos)
+    return match_album
+
+
+def lookup_benchmark(lib, num_albums, num_tracks, num_candidates, workers):
+    def _consume(count):
+        while True:
+            yield
+            count[0] += 1
+
+    def _lookup(mode):
+        session = importer.ImportSession(lib, None, [], None)
+        session.set_config(config['import'])
+        tasks = [importer.ImportTask(None, [album[0].path], album)
+                 for album in _synthetic_albums(num_albums, num_tracks)]
+        if mode == 'threads':
+            find = pipeline.ordered([importer.find_candidates()
+                                     for _ in range(workers)])
+        else:
+            find = importer.find_candidates()
+        count = [0]
+        pl = pipeline.Pipeline([iter(tasks), importer.begin_lookup(session),
+                                find, importer.end_lookup(session),
+                                _consume(count)])
+        if mode == 'sequential':
+            pl.run_sequential()
+        elif mode == 'threads':
+            pl.run_parallel()
+        else:
+            pl.run_multiprocess(processes=workers)
+        assert count[0] == num_albums
+
+    match_album = mb.match_album
+    mb.match_album = _local_match_album(num_candidates)
+    try:
+        for mode in ('sequential', 'threads', 'processes'):
+            interval = timeit.timeit(lambda: _lookup(mode), number=1)
+            print('{0}: {1:.3f}s, {2:.1f} albums per second'.format(
+                mode, interval, num_albums / interval))
+    finally:
+        mb.match_album = match_album
+
+
+def _synthetic_plugin(index):
+    """Create a plugin class that listens to a few events, including
+    `bench_event`, with a handler that does nothing.
+    """
+    def __init__(self):
+        BeetsPlugin.__init__(self, 'bench{0}'.format(index))
+        for event in ('bench_event', 'write', 'after_write'):
+            self.register_listener(event, self.handler)
+
+    def handler(self, **kwargs):
+        pass
+
+    return type('BenchPlugin{0}'.format(index), (BeetsPlugin,), {
+        '__init__': __init__,
+        'handler': handler,
+    })
+
+
+def send_benchmark(prof, num_plugins, num_events):
+    classes = set(_synthetic_plugin(i) for i in range(num_plugins))
+    plugins._classes.update(classes)
+    plugins.find_plugins()
+
+    def _send_events():
+        for i in range(num_events):
+            plugins.send('bench_event', index=i)
+
+    def _lookup_handlers():
+        for i in range(num_events):
+            plugins.event_handlers().get('bench_event', ())
+
+    def _lookup_handlers_uncached():
+        for i in range(num_events):
+            plugins.invalidate_cache()
+            plugins.event_handlers().get('bench_event', ())
+
+    try:
+        if prof:
+            cProfile.runctx('_send_events()', {},
+                            {'_send_events': _send_events}, 'send.prof')
+        else:
+            for desc, func in (('handler lookup', _lookup_handlers),
+                               ('handler lookup (rebuilt)',
+                                _lookup_handlers_uncached),
+                               ('dispatch', _send_events)):
+                interval = timeit.timeit(func, number=1)
+                print('{0}: {1:.2f} us per event'.format(
+                    desc, interval / num_events * 1e6))
+    finally:
+        plugins._classes.difference_update(classes)
+        for cls in classes:
+            plugins._instances.pop(cls, None)
+        plugins.invalidate_cache()
+
+
 class BenchmarkPlugin(BeetsPlugin):
     """A plugin for performing some simple performance benchmarks.
     """
@@ -103,7 +782,212 @@ class BenchmarkPlugin(BeetsPlugin):
                                           help='performance profiling')
         match_bench_cmd.parser.add_option('-i', '--id', default=None,
                                           help='album ID to match against')
-        match_bench_cmd.func = lambda lib, opts, args: \
-            match_benchmark(lib, opts.profile, ui.decargs(args), opts.id)
+        match_bench_cmd.parser.add_option('-t', '--tracks', type='int',
+                                          default=None,
+                                          help='time the track assignment '
+                                          'for a synthetic album of this '
+                                          'many tracks instead')
+        match_bench_cmd.parser.add_option('-c', '--candidates', type='int',
+                                          default=5,
+                                          help='candidates for the '
+                                          'synthetic album')
+
+        def match_func(lib, opts, args):
+            if opts.tracks:
+                assign_benchmark(opts.profile, opts.tracks, opts.candidates)
+            else:
+                match_benchmark(lib, opts.profile, ui.decargs(args), opts.id)
+        match_bench_cmd.func = match_func
+
+        string_dist_bench_cmd = ui.Subcommand(
+            'bench_string_dist',
+            help='benchmark for string distances on a VA compilation')
+        string_dist_bench_cmd.parser.add_option(
+            '-p', '--profile', action='store_true', default=False,
+            help='performance profiling')
+        string_dist_bench_cmd.parser.add_option(
+            '-t', '--tracks', type='int', default=200,
+            help='tracks on the compilation')
+        string_dist_bench_cmd.parser.add_option(
+            '-c', '--candidates', type='int', default=5,
+            help='candidate releases')
+        string_dist_bench_cmd.func = lambda lib, opts, args: \
+            string_dist_benchmark(opts.profile, opts.tracks, opts.candidates)
+
+        tags_bench_cmd = ui.Subcommand(
+            'bench_tags',
+            help='benchmark for reading every tag field from files')
+        tags_bench_cmd.parser.usage += u' SOURCE_FILE...'
+        tags_bench_cmd.parser.add_option(
+            '-p', '--profile', action='store_true', default=False,
+            help='performance profiling')
+        tags_bench_cmd.parser.add_option(
+            '-n', '--repeat', type='int', default=200,
+            help='number of times to read each file')
+        tags_bench_cmd.parser.add_option(
+            '-i', '--images', type='int', default=0,
+            help='number of images to embed in each file')
+        tags_bench_cmd.parser.add_option(
+            '-s', '--image-size', type='int', default=500000,
+            help='size of each image in bytes')
+        tags_bench_cmd.parser.add_option(
+            '-f', '--fields', default='title,artist,album',
+            help='comma-separated fields to read in the partial reads')
+
+        def tags_bench_func(lib, opts, args):
+            if not args:
+                raise ui.UserError(u'at least one source file is required')
+            tags_benchmark(opts.profile, [util.normpath(a) for a in args],
+                           opts.repeat, opts.images, opts.image_size,
+                           opts.fields.split(','))
+        tags_bench_cmd.func = tags_bench_func
+
+        fetch_bench_cmd = ui.Subcommand('bench_fetch',
+                                        help='benchmark for item queries')
+        fetch_bench_cmd.parser.add_option('-p', '--profile',
+                                          action='store_true', default=False,
+                                          help='performance profiling')
+        fetch_bench_cmd.parser.add_option('-n', '--items', type='int',
+                                          default=10000,
+                                          help='number of synthetic items')
+        fetch_bench_cmd.parser.add_option('-f', '--flex', type='int',
+                                          default=5,
+                                          help='flexible attributes per item')
+        fetch_bench_cmd.parser.add_option('-s', '--stream',
+                                          action='store_true', default=False,
+                                          help='stream the query results')
+        fetch_bench_cmd.func = lambda lib, opts, args: \
+            fetch_benchmark(opts.profile, opts.items, opts.flex, opts.stream)
+
+        send_bench_cmd = ui.Subcommand('bench_send',
+                                       help='benchmark for plugin events')
+        send_bench_cmd.parser.add_option('-p', '--profile',
+                                         action='store_true', default=False,
+                                         help='performance profiling')
+        send_bench_cmd.parser.add_option('-n', '--plugins', type='int',
+                                         default=30,
+                                         help='number of listening plugins')
+        send_bench_cmd.parser.add_option('-e', '--events', type='int',
+                                         default=10000,
+                                         help='number of events to send')
+        send_bench_cmd.func = lambda lib, opts, args: \
+            send_benchmark(opts.profile, opts.plugins, opts.events)
+
+        format_bench_cmd = ui.Subcommand('bench_format',
+                                         help='benchmark for item formatting')
+        format_bench_cmd.parser.add_option('-p', '--profile',
+                                           action='store_true', default=False,
+                                           help='performance profiling')
+        format_bench_cmd.parser.add_option('-n', '--items', type='int',
+                                           default=10000,
+                                           help='number of synthetic items')
+        format_bench_cmd.parser.add_option('-f', '--flex', type='int',
+                                           default=5,
+                                           help='flexible attributes per item')
+        format_bench_cmd.func = lambda lib, opts, args: \
+            format_benchmark(opts.profile, opts.items, opts.flex)
+
+        dest_bench_cmd = ui.Subcommand('bench_dest',
+                                       help='benchmark for item destinations')
+        dest_bench_cmd.parser.add_option('-p', '--profile',
+                                         action='store_true', default=False,
+                                         help='performance profiling')
+        dest_bench_cmd.parser.add_option('-n', '--items', type='int',
+                                         default=10000,
+                                         help='number of synthetic items')
+        dest_bench_cmd.parser.add_option('-q', '--formats', type='int',
+                                         default=10,
+                                         help='number of conditional formats')
+        dest_bench_cmd.func = lambda lib, opts, args: \
+            destination_benchmark(opts.profile, opts.items, opts.formats)
+
+        store_bench_cmd = ui.Subcommand('bench_store',
+                                        help='benchmark for adding and '
+                                             'storing items')
+        store_bench_cmd.parser.add_option('-p', '--profile',
+                                          action='store_true', default=False,
+                                          help='performance profiling')
+        store_bench_cmd.parser.add_option('-n', '--items', type='int',
+                                          default=10000,
+                                          help='number of synthetic items')
+        store_bench_cmd.parser.add_option('-f', '--flex', type='int',
+                                          default=5,
+                                          help='flexible attributes per item')
+        store_bench_cmd.func = lambda lib, opts, args: \
+            store_benchmark(opts.profile, opts.items, opts.flex)
+
+        concurrency_bench_cmd = ui.Subcommand(
+            'bench_concurrency',
+            help='benchmark for concurrent queries during writes')
+        concurrency_bench_cmd.parser.add_option(
+            '-n', '--items', type='int', default=10000,
+            help='number of synthetic items')
+        concurrency_bench_cmd.parser.add_option(
+            '-r', '--readers', type='int', default=4,
+            help='number of querying threads')
+        concurrency_bench_cmd.parser.add_option(
+            '-d', '--duration', type='float', default=5.0,
+            help='seconds to run each configuration')
+        concurrency_bench_cmd.func = lambda lib, opts, args: \
+            concurrency_benchmark(opts.items, opts.readers, opts.duration,
+                                  ui.decargs(args) or u'artist:1')
+
+        read_bench_cmd = ui.Subcommand(
+            'bench_read', help='benchmark for reading files to import')
+        read_bench_cmd.parser.usage += u' SOURCE_FILE'
+        read_bench_cmd.parser.add_option(
+            '-p', '--profile', action='store_true', default=False,
+            help='performance profiling')
+        read_bench_cmd.parser.add_option(
+            '-n', '--files', type='int', default=2000,
+            help='number of files to create from SOURCE_FILE')
+        read_bench_cmd.parser.add_option(
+            '-w', '--workers', type='int', default=8,
+            help='number of readers to compare with a single one')
+        read_bench_cmd.parser.add_option(
+            '-P', '--processes', action='store_true', default=False,
+            help='read in processes instead of threads')
+
+        def read_bench_func(lib, opts, args):
+            if len(args) != 1:
+                raise ui.UserError(u'a single source file is required')
+            read_benchmark(lib, opts.profile,
+                           util.normpath(args[0]), opts.files,
+                           opts.workers, opts.processes)
+        read_bench_cmd.func = read_bench_func
+
+        scan_bench_cmd = ui.Subcommand(
+            'bench_scan', help='benchmark for finding changed files')
+        scan_bench_cmd.parser.add_option(
+            '-p', '--profile', action='store_true', default=False,
+            help='performance profiling')
+        scan_bench_cmd.parser.add_option(
+            '-n', '--files', type='int', default=20000,
+            help='number of files in the library')
+        scan_bench_cmd.func = lambda lib, opts, args: \
+            scan_benchmark(opts.profile, opts.files)
+
+        lookup_bench_cmd = ui.Subcommand(
+            'bench_lookup',
+            help='benchmark for looking up candidates in threads or processes')
+        lookup_bench_cmd.parser.add_option(
+            '-n', '--albums', type='int', default=200,
+            help='number of synthetic albums')
+        lookup_bench_cmd.parser.add_option(
+            '-t', '--tracks', type='int', default=12,
+            help='number of tracks per album')
+        lookup_bench_cmd.parser.add_option(
+            '-c', '--candidates', type='int', default=5,
+            help='number of candidates found for each album')
+        lookup_bench_cmd.parser.add_option(
+            '-w', '--workers', type='int', default=4,
+            help='number of threads or processes')
+        lookup_bench_cmd.func = lambda lib, opts, args: \
+            lookup_benchmark(lib, opts.albums, opts.tracks, opts.candidates,
+                             opts.workers)
 
-        return [aunique_bench_cmd, match_bench_cmd]
+        return [aunique_bench_cmd, match_bench_cmd, fetch_bench_cmd,
+                send_bench_cmd, format_bench_cmd, dest_bench_cmd,
+                store_bench_cmd, concurrency_bench_cmd, read_bench_cmd,
+                lookup_bench_cmd, string_dist_bench_cmd, tags_bench_cmd,
+                scan_bench_cmd]
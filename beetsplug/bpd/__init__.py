@@ -949,7 +949,7 @@ class Server(BaseServer):
 
     def cmd_stats(self, conn):
         """Sends some statistics about the library."""
-        with self.lib.transaction() as tx:
+        with self.lib.transaction(read_only=True) as tx:
             statement = 'SELECT COUNT(DISTINCT artist), ' \
                         'COUNT(DISTINCT album), ' \
                         'COUNT(id), ' \
@@ -1056,7 +1056,7 @@ class Server(BaseServer):
         statement = 'SELECT DISTINCT ' + show_key + \
                     ' FROM items WHERE ' + clause + \
                     ' ORDER BY ' + show_key
-        with self.lib.transaction() as tx:
+        with self.lib.transaction(read_only=True) as tx:
             rows = tx.query(statement, subvals)
 
         for row in rows:
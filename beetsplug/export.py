@@ -20,6 +20,8 @@ from __future__ import division, absolute_import, print_function
 import sys
 import json
 import codecs
+import functools
+import six
 
 from datetime import datetime, date
 from beets.plugins import BeetsPlugin
@@ -94,25 +96,28 @@ class ExportPlugin(BeetsPlugin):
             }
         )
 
-        items = []
-        data_collector = library_data if opts.library else tag_data
-
         included_keys = []
         for keys in opts.included_keys:
             included_keys.extend(keys.split(','))
         key_filter = make_key_filter(included_keys)
 
-        for data_emitter in data_collector(lib, ui.decargs(args)):
-            try:
-                data, item = data_emitter()
-            except (mediafile.UnreadableFileError, IOError) as ex:
-                self._log.error(u'cannot read file: {0}', ex)
-                continue
+        if opts.library:
+            data_collector = library_data
+        else:
+            data_collector = functools.partial(tag_data,
+                                               key_filter=key_filter)
+
+        def items():
+            for data_emitter in data_collector(lib, ui.decargs(args)):
+                try:
+                    data, item = data_emitter()
+                except (mediafile.UnreadableFileError, IOError) as ex:
+                    self._log.error(u'cannot read file: {0}', ex)
+                    continue
 
-            data = key_filter(data)
-            items += [data]
+                yield key_filter(data)
 
-        export_format.export(items, **format_options)
+        export_format.export(items(), **format_options)
 
 
 class ExportFormat(object):
@@ -131,14 +136,44 @@ class ExportFormat(object):
         raise NotImplementedError()
 
 
-class JsonPrintFormat(ExportFormat):
+class JsonFormat(ExportFormat):
+    """Base class for the JSON formats"""
+
+    def dump(self, data, f, **kwargs):
+        """Write the entries of the iterable `data` to `f` as a JSON
+        array, one entry at a time, so the whole array never needs to
+        be held in memory. The output is the same as `json.dump`'s.
+        """
+        encoder = ExportEncoder(**kwargs)
+        indent = encoder.indent
+        if indent is not None:
+            if not isinstance(indent, six.string_types):
+                indent = u' ' * indent
+            newline = u'\n' + indent
+        else:
+            newline = u''
+
+        f.write(u'[')
+        first = True
+        for entry in data:
+            if not first:
+                f.write(encoder.item_separator)
+            first = False
+            text = encoder.encode(entry)
+            f.write(newline + text.replace(u'\n', newline))
+        if not first and indent is not None:
+            f.write(u'\n')
+        f.write(u']')
+
+
+class JsonPrintFormat(JsonFormat):
     """Outputs to the console"""
 
     def export(self, data, **kwargs):
-        json.dump(data, sys.stdout, cls=ExportEncoder, **kwargs)
+        self.dump(data, sys.stdout, **kwargs)
 
 
-class JsonFileFormat(ExportFormat):
+class JsonFileFormat(JsonFormat):
     """Saves in a json file"""
 
     def __init__(self, file_path, file_mode=u'w', encoding=u'utf-8'):
@@ -148,4 +183,4 @@ class JsonFileFormat(ExportFormat):
 
     def export(self, data, **kwargs):
         with codecs.open(self.path, self.mode, self.encoding) as f:
-            json.dump(data, f, cls=ExportEncoder, **kwargs)
+            self.dump(data, f, **kwargs)
@@ -18,6 +18,7 @@
 
 from __future__ import division, absolute_import, print_function
 
+import functools
 import os
 import re
 
@@ -28,38 +29,50 @@ from beets.library import Item
 from beets.util import displayable_path, normpath, syspath
 
 
-def tag_data(lib, args):
+def tag_data(lib, args, key_filter=None):
+    """Yield emitters for the tags of the files named by `args` or
+    matching the queries among them. If given, `key_filter` (see
+    `make_key_filter`) selects the tags to read.
+    """
     query = []
     for arg in args:
         path = normpath(arg)
         if os.path.isfile(syspath(path)):
-            yield tag_data_emitter(path)
+            yield tag_data_emitter(path, key_filter)
         else:
             query.append(arg)
 
     if query:
-        for item in lib.items(query):
-            yield tag_data_emitter(item.path)
+        for item in lib.items(query, stream=True):
+            yield tag_data_emitter(item.path, key_filter)
 
 
-def tag_data_emitter(path):
+def tag_data_emitter(path, key_filter=None):
     def emitter():
-        fields = list(mediafile.MediaFile.readable_fields())
-        fields.remove('images')
+        fields = dict.fromkeys(mediafile.MediaFile.readable_fields())
+        del fields['images']
+        if key_filter:
+            # Only read the tags that will be shown.
+            fields = key_filter(fields)
         mf = mediafile.MediaFile(syspath(path))
         tags = {}
         for field in fields:
-            tags[field] = getattr(mf, field)
-        tags['art'] = mf.art is not None
-        # create a temporary Item to take advantage of __format__
-        item = Item.from_path(syspath(path))
+            if field == 'art':
+                tags[field] = mf.art is not None
+            else:
+                tags[field] = getattr(mf, field)
+        # create a temporary Item from the tags to take advantage of
+        # __format__, without reading the file again
+        item = Item(path=path)
+        item.update(dict((key, value) for key, value in tags.items()
+                         if key in Item._media_fields))
 
         return tags, item
     return emitter
 
 
 def library_data(lib, args):
-    for item in lib.items(args):
+    for item in lib.items(args, stream=True):
         yield library_data_emitter(item)
 
 
@@ -176,16 +189,20 @@ class InfoPlugin(BeetsPlugin):
         dictionary and only prints that. If two files have different values
         for the same tag, the value is set to '[various]'
         """
-        if opts.library:
-            data_collector = library_data
-        else:
-            data_collector = tag_data
-
         included_keys = []
         for keys in opts.included_keys:
             included_keys.extend(keys.split(','))
         key_filter = make_key_filter(included_keys)
 
+        if opts.library:
+            data_collector = library_data
+        elif opts.format:
+            # The format can use any field, not just the included ones.
+            data_collector = tag_data
+        else:
+            data_collector = functools.partial(tag_data,
+                                               key_filter=key_filter)
+
         first = True
         summary = {}
         for data_emitter in data_collector(lib, ui.decargs(args)):
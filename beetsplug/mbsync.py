@@ -23,17 +23,20 @@ from beets.autotag import hooks
 from collections import defaultdict
 
 
-def apply_item_changes(lib, item, move, pretend, write):
-    """Store, move and write the item according to the arguments.
+def apply_item_changes(lib, item, move, pretend, write, store=True):
+    """Store, move and write the item according to the arguments. If
+    `store` is false, the item is not stored and the caller must store
+    it.
     """
     if not pretend:
         # Move the item if it's in the library.
         if move and lib.directory in util.ancestry(item.path):
-            item.move(with_album=False)
+            item.move(with_album=False, store=False)
 
         if write:
             item.try_write()
-        item.store()
+        if store:
+            item.store()
 
 
 class MBSyncPlugin(BeetsPlugin):
@@ -144,18 +147,20 @@ class MBSyncPlugin(BeetsPlugin):
             self._log.debug(u'applying changes to {}', album_formatted)
             with lib.transaction():
                 autotag.apply_metadata(album_info, mapping)
-                changed = False
+                changed_items = []
                 for item in items:
-                    item_changed = ui.show_model_changes(item)
-                    changed |= item_changed
-                    if item_changed:
-                        apply_item_changes(lib, item, move, pretend, write)
+                    if ui.show_model_changes(item):
+                        changed_items.append(item)
+                        apply_item_changes(lib, item, move, pretend, write,
+                                           store=False)
 
-                if not changed:
+                if not changed_items:
                     # No change to any item.
                     continue
 
                 if not pretend:
+                    lib.store_many(changed_items)
+
                     # Update album structure to reflect an item in it.
                     for key in library.Album.item_keys:
                         a[key] = items[0][key]
@@ -73,6 +73,28 @@ def _take(iter, num):
     return out
 
 
+def _sample(iter, num):
+    """Return a list of `num` values chosen uniformly at random from
+    `iter` (or all of them, if there are fewer), in random order.
+
+    The values are consumed in a single pass and only the current
+    sample is kept in memory (reservoir sampling), so `iter` can be a
+    stream of arbitrary length.
+    """
+    out = []
+    if num <= 0:
+        return out
+    for i, val in enumerate(iter):
+        if i < num:
+            out.append(val)
+        else:
+            j = random.randint(0, i)
+            if j < num:
+                out[j] = val
+    random.shuffle(out)
+    return out
+
+
 def _take_time(iter, secs, album):
     """Return a list containing the first values in `iter`, which should
     be Item or Album objects, that add up to the given amount of time in
@@ -115,16 +137,27 @@ def random_objs(objs, album, number=1, time=None, equal_chance=False):
 def random_func(lib, opts, args):
     """Select some random items or albums and print the results.
     """
-    # Fetch all the objects matching the query into a list.
     query = decargs(args)
-    if opts.album:
-        objs = list(lib.albums(query))
+    if opts.time or opts.equal_chance:
+        # Fetch all the objects matching the query into a list.
+        if opts.album:
+            objs = list(lib.albums(query))
+        else:
+            objs = list(lib.items(query))
+
+        # Print a random subset.
+        objs = random_objs(objs, opts.album, opts.number, opts.time,
+                           opts.equal_chance)
+
     else:
-        objs = list(lib.items(query))
+        # Sample a fixed number of objects while streaming the matches
+        # from the database, without keeping all of them in memory.
+        if opts.album:
+            objs = lib.albums(query, stream=True)
+        else:
+            objs = lib.items(query, stream=True)
+        objs = _sample(objs, opts.number)
 
-    # Print a random subset.
-    objs = random_objs(objs, opts.album, opts.number, opts.time,
-                       opts.equal_chance)
     for obj in objs:
         print_(format(obj))
 
@@ -90,6 +90,28 @@ def is_expand():
     return flask.request.args.get('expand') is not None
 
 
+def page_args():
+    """Returns the `limit` and `offset` of the page of results requested
+    with the current request's query string. Without them, all the
+    results are returned.
+    """
+    limit = flask.request.args.get('limit', type=int)
+    offset = flask.request.args.get('offset', 0, type=int)
+    if (limit is not None and limit < 0) or offset < 0:
+        flask.abort(400)
+    return limit, offset
+
+
+def stream_results():
+    """Whether to stream the results of list requests from a live
+    cursor. The cursor stays open while the response is sent, so this
+    is only done in WAL mode: otherwise, its read lock would keep
+    writers out of the database until a (possibly slow) client has
+    read everything.
+    """
+    return g.lib.wal
+
+
 def resource(name):
     """Decorates a function to handle RESTful HTTP requests for a resource.
     """
@@ -148,7 +170,7 @@ def _get_unique_table_field_values(model, field, sort_field):
     """ retrieve all unique values belonging to a key from a model """
     if field not in model.all_keys() or sort_field not in model.all_keys():
         raise KeyError
-    with g.lib.transaction() as tx:
+    with g.lib.transaction(read_only=True) as tx:
         rows = tx.query('SELECT DISTINCT "{0}" FROM "{1}" ORDER BY "{2}"'
                         .format(field, model._table, sort_field))
     return [row[0] for row in rows]
@@ -211,7 +233,8 @@ def get_item(id):
 @app.route('/item/query/')
 @resource_list('items')
 def all_items():
-    return g.lib.items()
+    limit, offset = page_args()
+    return g.lib.items(stream=stream_results(), limit=limit, offset=offset)
 
 
 @app.route('/item/<int:item_id>/file')
@@ -237,7 +260,9 @@ def item_file(item_id):
 @app.route('/item/query/<query:queries>')
 @resource_query('items')
 def item_query(queries):
-    return g.lib.items(queries)
+    limit, offset = page_args()
+    return g.lib.items(queries, stream=stream_results(), limit=limit,
+                       offset=offset)
 
 
 @app.route('/item/path/<everything:path>')
@@ -273,13 +298,16 @@ def get_album(id):
 @app.route('/album/query/')
 @resource_list('albums')
 def all_albums():
-    return g.lib.albums()
+    limit, offset = page_args()
+    return g.lib.albums(stream=stream_results(), limit=limit, offset=offset)
 
 
 @app.route('/album/query/<query:queries>')
 @resource_query('albums')
 def album_query(queries):
-    return g.lib.albums(queries)
+    limit, offset = page_args()
+    return g.lib.albums(queries, stream=stream_results(), limit=limit,
+                        offset=offset)
 
 
 @app.route('/album/<int:album_id>/art')
@@ -306,7 +334,7 @@ def album_unique_field_values(key):
 
 @app.route('/artist/')
 def all_artists():
-    with g.lib.transaction() as tx:
+    with g.lib.transaction(read_only=True) as tx:
         rows = tx.query("SELECT DISTINCT albumartist FROM albums")
     all_artists = [row[0] for row in rows]
     return flask.jsonify(artist_names=all_artists)
@@ -316,7 +344,7 @@ def all_artists():
 
 @app.route('/stats')
 def stats():
-    with g.lib.transaction() as tx:
+    with g.lib.transaction(read_only=True) as tx:
         item_rows = tx.query("SELECT COUNT(*) FROM items")
         album_rows = tx.query("SELECT COUNT(*) FROM albums")
     return flask.jsonify({
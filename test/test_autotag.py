@@ -19,16 +19,24 @@ from __future__ import division, absolute_import, print_function
 
 import re
 import copy
+import threading
+import time
 import unittest
+from mock import patch
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.request import urlopen
 
 from test import _common
+from test.helper import capture_log
 from beets import autotag
-from beets.autotag import match
-from beets.autotag.hooks import Distance, string_dist
+from beets.autotag import hooks, match
+from beets.autotag.hooks import Distance, string_dist, string_dist_matrix
 from beets.library import Item
 from beets.util import plurality
 from beets.autotag import AlbumInfo, TrackInfo
 from beets import config
+from beets import plugins
 
 
 class PluralityTest(_common.TestCase):
@@ -615,6 +623,117 @@ class AssignmentTest(unittest.TestCase):
             self.assertEqual(items.index(item), trackinfo.index(info))
 
 
+class AssignmentCostsTest(_common.TestCase):
+    def setUp(self):
+        super(AssignmentCostsTest, self).setUp()
+        self.items = [
+            Item(title=u'One (Live)', track=1, length=180.0, mb_trackid=u''),
+            Item(title=u'Two, The', track=2, length=200.0,
+                 mb_trackid=u'id2'),
+            Item(title=u'', track=0, length=0.0, mb_trackid=u''),
+        ]
+        self.tracks = [
+            TrackInfo(u'One', u'id1', length=181.5, index=1, medium_index=1),
+            TrackInfo(u'The Two', u'id2', length=260.0, index=2),
+            TrackInfo(u'Three', None, index=None, medium_index=3),
+            TrackInfo(u'Four & Five', None, length=None, index=4),
+        ]
+
+    def per_pair(self):
+        return [[match.track_distance(item, track).distance
+                 for track in self.tracks] for item in self.items]
+
+    def test_costs_equal_track_distance(self):
+        self.assertEqual(match.assignment_costs(self.items, self.tracks),
+                         self.per_pair())
+
+    def test_costs_equal_track_distance_without_numpy(self):
+        with patch('beets.autotag.match.numpy', None):
+            costs = match.assignment_costs(self.items, self.tracks)
+        self.assertEqual(costs, self.per_pair())
+
+    def test_costs_include_plugin_distance(self):
+        class DistancePlugin(plugins.BeetsPlugin):
+            def track_distance(self, item, info):
+                dist = Distance()
+                dist.add_expr('track_id', info.track_id is None)
+                return dist
+
+        self.addCleanup(setattr, plugins, '_classes', plugins._classes)
+        self.addCleanup(setattr, plugins, '_instances', plugins._instances)
+        plugins._classes = set([DistancePlugin])
+        plugins._instances = {}
+
+        costs = match.assignment_costs(self.items, self.tracks)
+        self.assertEqual(costs, self.per_pair())
+        self.assertNotEqual(costs[0][0], costs[0][2])
+
+    def test_empty(self):
+        self.assertEqual(match.assignment_costs([], self.tracks), [])
+        self.assertEqual(match.assignment_costs(self.items, []),
+                         [[], [], []])
+
+
+class BoundedCandidatesTest(_common.TestCase):
+    def setUp(self):
+        super(BoundedCandidatesTest, self).setUp()
+        self.items = [Item(title=u'song {0}'.format(i), artist=u'artist',
+                           album=u'album', track=i + 1, length=200.0 + i)
+                      for i in range(4)]
+
+        def info(album_id, album, num_tracks, titles=u'song {0}'):
+            tracks = [TrackInfo(titles.format(i), None, length=200.0 + i,
+                                index=i + 1) for i in range(num_tracks)]
+            return AlbumInfo(album, album_id, u'artist', None, tracks)
+        self.infos = [
+            info(u'hopeless', u'other', 12),
+            info(u'worse', u'albums', 4, u'other {0}'),
+            info(u'best', u'album', 4),
+            info(u'good', u'album', 3),
+            info(u'best', u'other', 4),
+        ]
+        patcher = patch('beets.autotag.hooks.album_candidates',
+                        side_effect=lambda *args: iter(self.infos))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tag(self, limit):
+        config['match']['max_candidates'] = limit
+        with patch('beets.autotag.match.assign_items',
+                   wraps=match.assign_items) as assign:
+            _, _, proposal = match.tag_album(self.items)
+        return proposal, [call[0][1] for call in assign.call_args_list]
+
+    def test_bound_below_distance(self):
+        for info in self.infos:
+            mapping, _, _ = match.assign_items(self.items, info.tracks)
+            self.assertLessEqual(match.distance_bound(self.items, info),
+                                 match.distance(self.items, info, mapping))
+
+    def test_best_candidates_kept(self):
+        full, _ = self.tag(0)
+        bounded, assigned = self.tag(2)
+        self.assertEqual(bounded.candidates, full.candidates[:2])
+        self.assertEqual(bounded.recommendation, full.recommendation)
+        self.assertEqual(
+            [c.info.album_id for c in bounded.candidates], [u'best', u'good'])
+        self.assertEqual(bounded.candidates[0].info, self.infos[2])
+
+        # The hopeless candidate was never assigned.
+        self.assertNotIn(self.infos[0].tracks, assigned)
+        self.assertEqual(len(assigned), 3)
+
+    def test_recommendation_uses_second_candidate(self):
+        full, _ = self.tag(0)
+        bounded, _ = self.tag(1)
+        self.assertEqual(bounded.candidates, full.candidates[:1])
+        self.assertEqual(bounded.recommendation, full.recommendation)
+
+    def test_unbounded_evaluates_all(self):
+        _, assigned = self.tag(0)
+        self.assertEqual(len(assigned), 4)
+
+
 class ApplyTestUtil(object):
     def _apply(self, info=None, per_disc_numbering=False):
         info = info or self.info
@@ -934,6 +1053,151 @@ class StringDistanceTest(unittest.TestCase):
         dist = string_dist(u'\xe9\xe1\xf1', u'ean')
         self.assertEqual(dist, 0.0)
 
+    def test_distance_cached(self):
+        hooks.string_dist_cache.clear()
+        hooks.normalize_cache.clear()
+        dist = string_dist(u'My Song (Live)', u'The Song')
+        misses = hooks.normalize_cache.misses
+        self.assertEqual(string_dist(u'My Song (Live)', u'The Song'), dist)
+        self.assertEqual(hooks.string_dist_cache.hits, 1)
+        self.assertEqual(hooks.string_dist_cache.misses, 1)
+
+        # Comparing one of the strings to another string reuses its
+        # normalized forms.
+        string_dist(u'My Song (Live)', u'Other Song')
+        self.assertGreater(hooks.normalize_cache.hits, 0)
+        self.assertLess(hooks.normalize_cache.misses, 2 * misses)
+
+    def test_matrix_equals_string_dist(self):
+        strs1 = [u'The Song', u'Song (Live)', u'Song', None]
+        strs2 = [u'Song, The', u'Song & Dance', None, u'Song']
+        self.assertEqual(
+            string_dist_matrix(strs1, strs2),
+            [[string_dist(s1, s2) for s2 in strs2] for s1 in strs1],
+        )
+
+
+class _RendezvousHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answer a request only once the other requests the server expects
+    have arrived too, or after the server's `timeout`. The body says
+    whether all of them met.
+    """
+    def do_GET(self):  # noqa
+        server = self.server
+        deadline = time.time() + server.wait
+        with server.cond:
+            server.arrived += 1
+            server.cond.notify_all()
+            while server.arrived < server.expected and time.time() < deadline:
+                server.cond.wait(deadline - time.time())
+            met = server.arrived >= server.expected
+        body = (u'together' if met else u'alone').encode('utf-8')
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _RendezvousServer(socketserver.ThreadingMixIn,
+                        BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _SourcePlugin(plugins.BeetsPlugin):
+    """A metadata source that searches the local HTTP stand-in."""
+    url = None
+
+    def __init__(self):
+        super(_SourcePlugin, self).__init__(type(self).__name__.lower())
+
+    def _fetch(self):
+        return urlopen(self.url + self.name).read().decode('utf-8')
+
+    def candidates(self, items, artist, album, va_likely):
+        return [AlbumInfo(self.name, None, self._fetch(), None, [])]
+
+    def item_candidates(self, item, artist, title):
+        return [TrackInfo(self.name, None, artist=self._fetch())]
+
+
+class CandidateSearchTest(_common.TestCase):
+    def setUp(self):
+        super(CandidateSearchTest, self).setUp()
+        self.server = _RendezvousServer(('127.0.0.1', 0), _RendezvousHandler)
+        self.server.cond = threading.Condition()
+        self.server.arrived = 0
+        self.server.expected = 3
+        self.server.wait = 10
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.05,))
+        thread.daemon = True
+        thread.start()
+
+        url = 'http://127.0.0.1:{0}/'.format(self.server.server_address[1])
+        self.addCleanup(setattr, plugins, '_classes', plugins._classes)
+        self.addCleanup(setattr, plugins, '_instances', plugins._instances)
+        plugins._classes = set(
+            type(str('Source' + name), (_SourcePlugin,), {'url': url})
+            for name in ('a', 'b', 'c')
+        )
+        plugins._instances = {}
+        self.sources = [p.name for p in plugins.find_plugins()]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(CandidateSearchTest, self).tearDown()
+
+    def test_sources_searched_concurrently(self):
+        config['match']['search_workers'] = 3
+        candidates = list(autotag.hooks.album_candidates([], None, None,
+                                                         False))
+        self.assertEqual([c.album for c in candidates], self.sources)
+        self.assertEqual([c.artist for c in candidates], [u'together'] * 3)
+
+    def test_item_sources_searched_concurrently(self):
+        config['match']['search_workers'] = 3
+        candidates = list(autotag.hooks.item_candidates(Item(), None, None))
+        self.assertEqual([c.title for c in candidates], self.sources)
+        self.assertEqual([c.artist for c in candidates], [u'together'] * 3)
+
+    def test_sources_searched_in_turn_by_default(self):
+        self.server.wait = 0.1
+        candidates = list(autotag.hooks.item_candidates(Item(), None, None))
+        self.assertEqual([c.title for c in candidates], self.sources)
+        self.assertEqual([c.artist for c in candidates],
+                         [u'alone', u'alone', u'together'])
+
+    def test_single_worker_searches_in_turn(self):
+        config['match']['search_workers'] = 1
+        self.server.wait = 0.1
+        candidates = list(autotag.hooks.album_candidates([], None, None,
+                                                         False))
+        self.assertEqual([c.album for c in candidates], self.sources)
+        self.assertEqual([c.artist for c in candidates],
+                         [u'alone', u'alone', u'together'])
+
+    def test_musicbrainz_error_logged(self):
+        error = autotag.mb.MusicBrainzAPIError(
+            Exception(), u'release search', {}, None)
+        self.server.expected = 0
+        with patch('beets.autotag.mb.match_album', side_effect=error):
+            with capture_log() as logs:
+                candidates = list(autotag.hooks.album_candidates(
+                    [], u'artist', u'album', True))
+        self.assertEqual([c.album for c in candidates], self.sources)
+        self.assertEqual(len([l for l in logs if u'release search' in l]), 2)
+
+    def test_plugin_errors_not_swallowed(self):
+        error = autotag.mb.MusicBrainzAPIError(
+            Exception(), u'release search', {}, None)
+        self.server.expected = 0
+        with patch.object(_SourcePlugin, 'candidates', side_effect=error):
+            with self.assertRaises(autotag.mb.MusicBrainzAPIError):
+                list(autotag.hooks.album_candidates([], None, None, False))
+
 
 class EnumTest(_common.TestCase):
     """
@@ -20,12 +20,13 @@ from __future__ import division, absolute_import, print_function
 import os
 import shutil
 import sqlite3
+import threading
 import unittest
 from six import assertRaisesRegex
 
 from test import _common
 from beets import dbcore
-from tempfile import mkstemp
+from tempfile import mkstemp, mkdtemp
 import six
 
 
@@ -119,6 +120,25 @@ class TestDatabaseTwoModels(dbcore.Database):
     pass
 
 
+class IndexedTestModel(TestModel1):
+    _table = 'indexed'
+    _flex_table = 'indexedflex'
+    _fields = {
+        'id': dbcore.types.PRIMARY_ID,
+        'field_one': dbcore.types.INTEGER,
+        'field_two': dbcore.types.STRING,
+    }
+    _indices = {
+        'indexed_by_one_two': ('field_one', 'field_two'),
+        'indexed_by_lower_two': ('LOWER(field_two)',),
+    }
+
+
+class TestDatabaseIndexed(dbcore.Database):
+    _models = (IndexedTestModel,)
+    pass
+
+
 class TestModelWithGetters(dbcore.Model):
 
     @classmethod
@@ -218,6 +238,29 @@ class ModelTest(unittest.TestCase):
         row = self.db._connection().execute('select * from test').fetchone()
         self.assertEqual(row['field_one'], 123)
 
+    def test_add_many_models(self):
+        models = [TestModel1(field_one=i, foo=u'bar') for i in range(3)]
+        self.db.add_many(models)
+        for i, model in enumerate(models):
+            other_model = self.db._get(TestModel1, model.id)
+            self.assertEqual(other_model.field_one, i)
+            self.assertEqual(other_model.foo, u'bar')
+
+    def test_store_many_models(self):
+        models = [TestModel1(foo=u'bar') for _ in range(3)]
+        self.db.add_many(models)
+        models[0].field_one = 123
+        models[1].baz = u'qux'
+        del models[2].foo
+        self.db.store_many(models)
+
+        stored = [self.db._get(TestModel1, m.id) for m in models]
+        self.assertEqual(stored[0].field_one, 123)
+        self.assertEqual(stored[1].baz, u'qux')
+        self.assertNotIn('foo', stored[2])
+        for model in models:
+            self.assertFalse(model._dirty)
+
     def test_retrieve_by_id(self):
         model = TestModel1()
         model.add(self.db)
@@ -334,6 +377,131 @@ class ModelTest(unittest.TestCase):
             dbcore.Model._parse(None, 42)
 
 
+class WALTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.db = TestDatabase1(os.path.join(self.tmpdir, 'db'), wal=True)
+
+    def tearDown(self):
+        self.db._connection().close()
+        shutil.rmtree(self.tmpdir)
+
+    def _read_in_thread(self):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(len(self.db._fetch(TestModel1)))
+        )
+        thread.start()
+        thread.join(5)
+        return results
+
+    def test_journal_mode_is_wal(self):
+        mode = self.db._connection().execute('PRAGMA journal_mode')
+        self.assertEqual(mode.fetchone()[0], 'wal')
+
+    def test_read_during_write_transaction(self):
+        with self.db.transaction():
+            TestModel1().add(self.db)
+            # The uncommitted row is not visible to the reader, which
+            # does not wait for the transaction to end.
+            self.assertEqual(self._read_in_thread(), [0])
+        self.assertEqual(self._read_in_thread(), [1])
+
+    def test_read_only_transaction_does_not_lock(self):
+        with self.db.transaction(read_only=True):
+            self.db._fetch(TestModel1)
+            self.assertFalse(self.db._db_lock.locked())
+            with self.db.transaction():
+                self.assertTrue(self.db._db_lock.locked())
+                TestModel1().add(self.db)
+            self.assertTrue(self.db._db_lock.locked())
+        self.assertFalse(self.db._db_lock.locked())
+
+    def test_transaction_locks_before_reading(self):
+        model = TestModel1()
+        model.field_one = 0
+        model.add(self.db)
+        read = threading.Event()
+
+        def increment(wait):
+            with self.db.transaction():
+                obj = self.db._get(TestModel1, model.id)
+                if wait:
+                    read.set()
+                    # Give the other thread a chance to write.
+                    threading.Event().wait(0.2)
+                obj.field_one += 1
+                obj.store()
+
+        thread = threading.Thread(target=increment, args=(True,))
+        thread.start()
+        read.wait(5)
+        increment(False)
+        thread.join(5)
+        self.assertEqual(self.db._get(TestModel1, model.id).field_one, 2)
+
+    def test_write_while_streaming(self):
+        for i in range(3):
+            TestModel1().add(self.db)
+        results = self.db._fetch(TestModel1, stream=True)
+        results._page_size = 1
+        for obj in results:
+            # Another connection commits after the stream started.
+            thread = threading.Thread(target=TestModel1().add,
+                                      args=(self.db,))
+            thread.start()
+            thread.join(5)
+            obj.field_one = 1
+            obj.store()
+        self.assertEqual(len(self.db._fetch(TestModel1)), 6)
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.db = TestDatabaseIndexed(':memory:')
+
+    def tearDown(self):
+        self.db._connection().close()
+
+    def query_plan(self, where):
+        with self.db.transaction() as tx:
+            rows = tx.query('EXPLAIN QUERY PLAN SELECT * FROM indexed '
+                            'WHERE ' + where, ('x',))
+        return u' '.join(row[-1] for row in rows)
+
+    def test_indices_created(self):
+        with self.db.transaction() as tx:
+            rows = tx.query('PRAGMA index_list(indexed)')
+        self.assertEqual(set(row[1] for row in rows),
+                         set(['indexed_by_one_two', 'indexed_by_lower_two']))
+
+    def test_lookup_uses_index(self):
+        self.assertIn('indexed_by_one_two',
+                      self.query_plan('field_one = 1 AND field_two = ?'))
+
+    def test_case_folded_lookup_uses_expression_index(self):
+        self.assertIn('indexed_by_lower_two',
+                      self.query_plan('LOWER(field_two) = ?'))
+
+    def test_indices_added_to_existing_database(self):
+        tmpdir = mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'db')
+            db = TestDatabaseIndexed(path)
+            with db.transaction() as tx:
+                tx.script('DROP INDEX indexed_by_one_two;'
+                          'DROP INDEX indexed_by_lower_two;')
+            db._connection().close()
+
+            db = TestDatabaseIndexed(path)
+            with db.transaction() as tx:
+                rows = tx.query('PRAGMA index_list(indexed)')
+            self.assertEqual(len(rows), 2)
+            db._connection().close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
 class FormatTest(unittest.TestCase):
     def test_format_fixed_field(self):
         model = TestModel1()
@@ -527,8 +695,10 @@ class SortFromStringsTest(unittest.TestCase):
 
     def test_flex_field_sort(self):
         s = self.sfs(['flex_field+'])
-        self.assertIsInstance(s, dbcore.query.SlowFieldSort)
-        self.assertEqual(s, dbcore.query.SlowFieldSort('flex_field'))
+        self.assertIsInstance(s, dbcore.query.FlexFieldSort)
+        self.assertEqual(s, dbcore.query.FlexFieldSort(TestModel1,
+                                                       'flex_field'))
+        self.assertFalse(s.is_slow())
 
     def test_special_sort(self):
         s = self.sfs(['some_sort+'])
@@ -585,6 +755,14 @@ class ParseSortedQueryTest(unittest.TestCase):
         self.assertEqual(len(q.subqueries), 1)
 
 
+class SlowQuery(dbcore.query.Query):
+    """A query that matches everything but can only be evaluated in
+    Python.
+    """
+    def match(self, obj):
+        return True
+
+
 class ResultsIteratorTest(unittest.TestCase):
     def setUp(self):
         self.db = TestDatabase1(':memory:')
@@ -656,6 +834,116 @@ class ResultsIteratorTest(unittest.TestCase):
         self.assertIsNone(self.db._fetch(
             TestModel1, dbcore.query.FalseQuery()).get())
 
+    def test_iterate_several_pages(self):
+        objs = self.db._fetch(TestModel1)
+        objs._page_size = 1
+        self.assertEqual([o.foo for o in objs], ['baz', 'bar'])
+
+    @unittest.skipUnless(hasattr(sqlite3.Connection, 'set_trace_callback'),
+                         'statement tracing not available')
+    def test_flex_attributes_fetched_per_page(self):
+        queries = []
+        self.db._connection().set_trace_callback(
+            lambda q: queries.append(q))
+        list(self.db._fetch(TestModel1))
+        self.db._connection().set_trace_callback(None)
+        flex_queries = [q for q in queries if 'testflex' in q]
+        self.assertEqual(len(flex_queries), 1)
+
+    def test_stream_iterate_twice(self):
+        objs = self.db._fetch(TestModel1, stream=True)
+        self.assertEqual([o.foo for o in objs], ['baz', 'bar'])
+        self.assertEqual([o.foo for o in objs], ['baz', 'bar'])
+
+    def test_stream_does_not_cache(self):
+        objs = self.db._fetch(TestModel1, stream=True)
+        first = list(objs)
+        second = list(objs)
+        self.assertIsNot(first[0], second[0])
+
+    def test_stream_cache_opt_in(self):
+        objs = self.db._fetch(TestModel1, stream=True, cache=True)
+        first = list(objs)
+        second = list(objs)
+        self.assertIs(first[0], second[0])
+
+    def test_stream_concurrent_iterators(self):
+        results = self.db._fetch(TestModel1, stream=True)
+        it1 = iter(results)
+        it2 = iter(results)
+        next(it1)
+        list(it2)
+        self.assertEqual(len(list(it1)), 1)
+
+    def test_stream_length(self):
+        objs = self.db._fetch(TestModel1, stream=True)
+        self.assertEqual(len(objs), 2)
+
+    def test_stream_length_follows_table(self):
+        objs = self.db._fetch(TestModel1, stream=True)
+        self.assertEqual(len(objs), 2)
+        TestModel1().add(self.db)
+        self.assertEqual(len(objs), 3)
+        self.assertEqual(len(list(objs)), 3)
+
+    def test_stream_slow_query(self):
+        q = dbcore.query.SubstringQuery('foo', 'baz', False)
+        objs = self.db._fetch(TestModel1, q, stream=True)
+        self.assertEqual([o.foo for o in objs], ['baz'])
+        self.assertEqual(len(objs), 1)
+
+    def test_stream_subscript(self):
+        objs = self.db._fetch(TestModel1, stream=True)
+        self.assertEqual(objs[1].foo, 'bar')
+
+    def test_stream_store_while_iterating(self):
+        for obj in self.db._fetch(TestModel1, stream=True):
+            obj.field_one = 4
+            obj.store()
+        self.assertEqual(
+            [o.field_one for o in self.db._fetch(TestModel1)], [4, 4])
+
+    def test_limit(self):
+        objs = self.db._fetch(TestModel1, limit=1)
+        self.assertEqual([o.foo for o in objs], ['baz'])
+        self.assertEqual(len(objs), 1)
+
+    def test_offset(self):
+        objs = self.db._fetch(TestModel1, offset=1)
+        self.assertEqual([o.foo for o in objs], ['bar'])
+
+    def test_limit_and_offset(self):
+        model = TestModel1()
+        model['foo'] = 'qux'
+        model.add(self.db)
+        objs = self.db._fetch(TestModel1, limit=1, offset=1)
+        self.assertEqual([o.foo for o in objs], ['bar'])
+        self.assertEqual(objs[0].foo, 'bar')
+        with self.assertRaises(IndexError):
+            objs[1]
+
+    def test_limit_pushed_down_to_sql(self):
+        objs = self.db._fetch(TestModel1, limit=1)
+        self.assertEqual(objs._row_count, 1)
+        self.assertIsNone(objs.limit)
+
+    def test_limit_slow_query(self):
+        q = SlowQuery()
+        objs = self.db._fetch(TestModel1, q, limit=1, offset=1)
+        self.assertEqual([o.foo for o in objs], ['bar'])
+        self.assertEqual(len(objs), 1)
+
+    def test_limit_slow_sort(self):
+        s = dbcore.query.SlowFieldSort('foo')
+        objs = self.db._fetch(TestModel1, sort=s, limit=1)
+        self.assertEqual([o.foo for o in objs], ['bar'])
+        self.assertEqual(len(objs), 1)
+
+    def test_stream_limit(self):
+        objs = self.db._fetch(TestModel1, stream=True, limit=1, offset=1)
+        self.assertEqual([o.foo for o in objs], ['bar'])
+        self.assertEqual(len(objs), 1)
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromName(__name__)
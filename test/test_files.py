@@ -22,6 +22,7 @@ import os
 import stat
 from os.path import join
 import unittest
+from mock import patch
 
 from test import _common
 from test._common import item, touch
@@ -644,6 +645,25 @@ class MkDirAllTest(_common.TestCase):
             os.path.join(self.temp_dir, b'foo', b'bar', b'baz', b'qux.mp3')
         ))
 
+    def test_parent_created_concurrently(self):
+        path = os.path.join(self.temp_dir, b'foo', b'qux.mp3')
+        os.mkdir(os.path.join(self.temp_dir, b'foo'))
+
+        # Pretend that each directory is created by someone else right
+        # after it is found missing.
+        isdir = os.path.isdir
+        checked = set()
+
+        def racy_isdir(p):
+            if p in checked:
+                return isdir(p)
+            checked.add(p)
+            return False
+
+        with patch('os.path.isdir', racy_isdir):
+            util.mkdirall(path)
+        self.assertTrue(os.path.isdir(os.path.join(self.temp_dir, b'foo')))
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromName(__name__)
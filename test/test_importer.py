@@ -18,11 +18,14 @@ from __future__ import division, absolute_import, print_function
 """Tests for the general importer functionality.
 """
 import os
+import multiprocessing
+import pickle
 import re
 import shutil
 import unicodedata
 import sys
 import stat
+import six
 from six import StringIO
 from tempfile import mkstemp
 from zipfile import ZipFile
@@ -41,6 +44,7 @@ from beets.autotag import AlbumInfo, TrackInfo, AlbumMatch
 from beets import config
 from beets import logging
 from beets import util
+from beets.util import pipeline
 
 
 class AutotagStub(object):
@@ -1439,6 +1443,183 @@ class IncrementalImportTest(unittest.TestCase, TestHelper):
         self.assertEqual(len(self.lib.albums()), 1)
 
 
+class ReadWorkersImportTest(unittest.TestCase, TestHelper):
+    """Import with files read by a pool of threads.
+    """
+
+    def setUp(self):
+        self.setup_beets()
+        self.config['import']['read_workers'] = 3
+
+    def tearDown(self):
+        self.teardown_beets()
+
+    def test_albums_keep_order(self):
+        importer = self.create_importer(item_count=3, album_count=8)
+        importer.run()
+        albums = self.lib.albums(u'id+')
+        self.assertEqual([a.album for a in albums],
+                         [u'album {0}'.format(i) for i in range(8)])
+        for album in albums:
+            self.assertEqual([i.title for i in album.items()],
+                             [u'track 0', u'track 1', u'track 2'])
+
+    def test_singletons_keep_order(self):
+        self.config['import']['singletons'] = True
+        importer = self.create_importer(item_count=3, album_count=2)
+        importer.run()
+        self.assertEqual([i.title for i in self.lib.items(u'id+')],
+                         [u'track {0}'.format(i % 3) for i in range(6)])
+
+    def test_incremental_skips_imported_directory(self):
+        self.config['import']['incremental'] = True
+        self.create_importer(album_count=2).run()
+        self.create_importer(album_count=1).run()
+        self.assertEqual(len(self.lib.albums()), 3)
+
+    def test_skipped_reads_are_dropped(self):
+        session = self.create_importer(item_count=1, album_count=8)
+        session.set_config(self.config['import'])
+        factory = importer.ImportTaskFactory(session.paths[0], session)
+        pending = []
+
+        def skip_album(paths, dirs=None):
+            pending.append(len(factory._reads))
+
+        with patch.object(factory, 'album', skip_album):
+            list(factory.tasks())
+        self.assertEqual(len(pending), 8)
+        self.assertLessEqual(max(pending), factory.prefetch_dirs + 1)
+
+    def test_read_timeout(self):
+        session = self.create_importer()
+        factory = importer.ImportTaskFactory(session.paths[0], session)
+        result = Mock()
+        result.get.side_effect = multiprocessing.TimeoutError
+        factory._reads[b'path'] = result
+        with capture_log() as logs:
+            self.assertIsNone(factory.read_item(b'path'))
+        result.get.assert_called_once_with(factory.read_timeout)
+        self.assertIn(u'timed out reading path', logs[0])
+        self.assertEqual(factory._reads, {})
+
+    @unittest.skipIf(six.PY2, u'processes need Python 3')
+    def test_processes_keep_order(self):
+        self.config['import']['read_processes'] = True
+        importer = self.create_importer(item_count=2, album_count=3)
+        importer.run()
+        self.assertEqual([i.title for i in self.lib.items(u'id+')],
+                         [u'track 0', u'track 1'] * 3)
+
+
+class StageWorkersImportTest(unittest.TestCase, TestHelper):
+    """Threaded import with several workers for the file stage.
+    """
+
+    def setUp(self):
+        self.setup_beets(disk=True)
+        self.config['threaded'] = True
+        self.config['import']['workers']['files'] = 3
+
+    def tearDown(self):
+        self.teardown_beets()
+
+    def test_albums_keep_order(self):
+        importer = self.create_importer(item_count=2, album_count=8)
+        importer.run()
+        self.assertEqual([a.album for a in self.lib.albums(u'id+')],
+                         [u'album {0}'.format(i) for i in range(8)])
+        self.assertEqual(len(self.lib.items()), 16)
+
+    def test_pipeline_stats(self):
+        importer = self.create_importer(album_count=3)
+        importer.run()
+        stats = dict((s.name, s) for s in importer.pipeline_stats)
+        # Three albums and the sentinel for the end of the directory.
+        self.assertEqual(stats['read_tasks'].sent, 4)
+        self.assertEqual(stats['manipulate_files'].workers, 3)
+        self.assertEqual(stats['manipulate_files'].received, 4)
+
+    def test_incremental_history_saved(self):
+        self.config['import']['incremental'] = True
+        self.create_importer(album_count=4).run()
+        self.create_importer(album_count=1).run()
+        self.assertEqual(len(self.lib.albums()), 5)
+
+
+class LookupProcessesImportTest(unittest.TestCase, TestHelper):
+    """Threaded import looking up candidates in worker processes.
+    """
+
+    def setUp(self):
+        self.setup_beets(disk=True)
+        self.config['threaded'] = True
+        self.config['import']['lookup_processes'] = True
+        self.config['import']['workers']['lookup'] = 2
+        self.matcher = AutotagStub().install()
+
+    def tearDown(self):
+        self.teardown_beets()
+        self.matcher.restore()
+
+    def test_albums_matched_in_order(self):
+        importer = self.create_importer(item_count=2, album_count=6)
+        self.config['import']['autotag'] = True
+        importer.run()
+        self.assertEqual([a.album for a in self.lib.albums(u'id+')],
+                         [u'album {0}'.format(i) for i in range(6)])
+        self.assertEqual(sorted(i.title for i in self.lib.items()),
+                         sorted([u'Applied Title 1', u'Applied Title 2'] * 6))
+
+    @patch('beets.plugins.send')
+    def test_tasks_keep_identity(self, plugins_send):
+        started = []
+        chosen = []
+
+        def record(event, task=None, **kwargs):
+            if event == 'import_task_start':
+                started.append(task)
+            elif event == 'import_task_choice':
+                chosen.append(task)
+                self.assertTrue(set(task.match.mapping) <= set(task.items))
+        plugins_send.side_effect = record
+
+        importer = self.create_importer(item_count=2, album_count=4)
+        self.config['import']['autotag'] = True
+        importer.run()
+        self.assertEqual(len(chosen), 4)
+        self.assertEqual(list(map(id, chosen)), list(map(id, started)))
+        self.assertEqual(importer._lookup_tasks, {})
+
+    def test_lookup_plugins_keep_lookup_in_threads(self):
+        importer = self.create_importer(item_count=2, album_count=2)
+        self.config['import']['autotag'] = True
+        plugin = Mock()
+        plugin.name = u'chroma'
+        with patch('beets.plugins.lookup_plugins', return_value=[plugin]), \
+                patch.object(pipeline.Pipeline, 'run_multiprocess') as run, \
+                capture_log() as logs:
+            importer.run()
+        self.assertFalse(run.called)
+        self.assertIn(u'because of plugins: chroma', u'\n'.join(logs))
+        self.assertEqual(len(self.lib.albums()), 2)
+
+    def test_task_pickles_with_candidates(self):
+        items = [self.add_item_fixture(), self.add_item_fixture()]
+        task = importer.ImportTask(None, [b'path'], items)
+        task.search_ids = []
+        task.lookup_candidates()
+
+        copy = pickle.loads(pickle.dumps(task))
+        self.assertEqual(len(copy.candidates), len(task.candidates))
+        self.assertEqual(copy.rec, task.rec)
+        mapping = copy.candidates[0].mapping
+        self.assertEqual(set(mapping), set(copy.items))
+        self.assertEqual([i.title for i in copy.items],
+                         [i.title for i in items])
+        self.assertIsNone(copy.items[0]._db)
+
+
 def _mkmp3(path):
     shutil.copyfile(os.path.join(_common.RSRC, b'min.mp3'), path)
 
@@ -1722,6 +1903,7 @@ class ImportPretendTest(_common.TestCase, ImportHelper):
         self.io.install()
 
     def tearDown(self):
+        self.io.restore()
         self.teardown_beets()
         self.matcher.restore()
 
@@ -16,10 +16,12 @@
 from __future__ import division, absolute_import, print_function
 
 import unittest
+from mock import patch
 from test.helper import TestHelper
 
 from beets.mediafile import MediaFile
 from beets.util import displayable_path
+from beetsplug import info
 
 
 class InfoTest(unittest.TestCase, TestHelper):
@@ -103,6 +105,41 @@ class InfoTest(unittest.TestCase, TestHelper):
         self.assertNotIn(u'title:', out)
         self.assertIn(u'album: xxxx', out)
 
+    def test_tag_data_reads_only_included_tags(self):
+        path = self.create_mediafile_fixture()
+        opened = []
+        read = []
+        init = MediaFile.__init__
+        getattribute = MediaFile.__getattribute__
+
+        def record_init(mf, *args, **kwargs):
+            opened.append(args[0])
+            init(mf, *args, **kwargs)
+
+        def record(mf, name):
+            read.append(name)
+            return getattribute(mf, name)
+
+        emitter = info.tag_data_emitter(
+            path, info.make_key_filter(['album', 'art']))
+        with patch.object(MediaFile, '__init__', record_init), \
+                patch.object(MediaFile, '__getattribute__', record):
+            data, item = emitter()
+        self.assertEqual(data, {'album': u'the album', 'art': False})
+        self.assertEqual(len(opened), 1)
+        self.assertIn('album', read)
+        self.assertNotIn('title', read)
+        self.assertNotIn('composer', read)
+        self.assertEqual(item.album, u'the album')
+        self.remove_mediafile_fixtures()
+
+    def test_custom_format_with_included_keys(self):
+        path = self.create_mediafile_fixture()
+        out = self.run_with_output('info', '--include-keys', 'album',
+                                   '--format', '$album: $title', path)
+        self.assertEqual(u'the album: full\n', out)
+        self.remove_mediafile_fixtures()
+
     def test_custom_format(self):
         self.add_item_fixtures()
         out = self.run_with_output('info', '--library', '--format',
@@ -26,6 +26,7 @@ import unicodedata
 import sys
 import time
 import unittest
+from mock import patch
 
 from test import _common
 from test._common import item
@@ -81,6 +82,12 @@ class StoreTest(_common.LibTestCase):
         self.i.store()
         self.assertTrue('composer' not in self.i._dirty)
 
+    def test_store_many_album_updates_items(self):
+        album = self.lib.add_album([self.i])
+        album.genre = u'beatboxing'
+        self.lib.store_many([album])
+        self.assertEqual(self.lib.get_item(self.i.id).genre, u'beatboxing')
+
 
 class AddTest(_common.TestCase):
     def setUp(self):
@@ -95,6 +102,14 @@ class AddTest(_common.TestCase):
             'where composer="the composer"').fetchone()['grouping']
         self.assertEqual(new_grouping, self.i.grouping)
 
+    def test_library_add_many_inserts_rows(self):
+        items = [item(), item()]
+        ids = self.lib.add_many(items)
+        self.assertEqual(ids, [i.id for i in items])
+        self.assertEqual(len(self.lib.items()), 2)
+        self.assertEqual(self.lib.get_item(ids[1]).grouping,
+                         self.i.grouping)
+
     def test_library_add_path_inserts_row(self):
         i = beets.library.Item.from_path(
             os.path.join(_common.RSRC, b'full.mp3')
@@ -284,6 +299,25 @@ class DestinationTest(_common.TestCase):
         ]
         self.assertEqual(i.destination(), np('one/three'))
 
+    def test_path_formats_parsed_once(self):
+        self.lib.path_formats = [
+            (u'default', u'two'),
+            (u'comp:true', u'three'),
+        ]
+        parse = beets.library.parse_query_string
+        with patch('beets.library.parse_query_string',
+                   side_effect=parse) as mock_parse:
+            self.i.destination()
+            self.i.destination()
+        self.assertEqual(mock_parse.call_count, 1)
+
+    def test_path_formats_replaced(self):
+        self.lib.directory = b'one'
+        self.lib.path_formats = [(u'default', u'two')]
+        self.assertEqual(self.i.destination(), np('one/two'))
+        self.lib.path_formats = [(u'default', u'three')]
+        self.assertEqual(self.i.destination(), np('one/three'))
+
     def test_comp_path(self):
         self.i.comp = True
         self.lib.add_album([self.i])
@@ -775,6 +809,8 @@ class PluginDestinationTest(_common.TestCase):
         plugins.item_field_getters = self.old_field_getters
 
     def _assert_dest(self, dest):
+        # The fields provided by the mocked plugins have changed.
+        plugins.invalidate_cache()
         with _common.platform_posix():
             the_dest = self.i.destination()
         self.assertEqual(the_dest, b'/base/' + dest)
@@ -1119,6 +1155,7 @@ class WriteTest(unittest.TestCase, TestHelper):
         item = self.add_item_fixture()
         path = syspath(item.path)
         os.chmod(path, stat.S_IRUSR)
+        item.title = u'new title'
 
         try:
             self.assertRaises(beets.library.WriteError, item.write)
@@ -1148,9 +1185,26 @@ class WriteTest(unittest.TestCase, TestHelper):
         self.assertNotEqual(item.artist, 'new artist')
         self.assertEqual(MediaFile(syspath(item.path)).artist, 'new artist')
 
+    def test_write_unchanged_tags_skips_save(self):
+        item = self.add_item_fixture()
+        item.write()
+        os.utime(syspath(item.path), (1000000000, 1000000000))
+        beets.library.write_stats.clear()
+
+        item.write()
+        self.assertEqual(os.path.getmtime(syspath(item.path)), 1000000000)
+        self.assertEqual(beets.library.write_stats.unchanged, 1)
+        self.assertEqual(beets.library.write_stats.saved, 0)
+
+        item.write(force=True)
+        self.assertNotEqual(os.path.getmtime(syspath(item.path)), 1000000000)
+        self.assertEqual(beets.library.write_stats.saved, 1)
+        self.assertEqual(beets.library.write_stats.saved_bytes,
+                         os.path.getsize(syspath(item.path)))
+
     def test_write_date_field(self):
         # Since `date` is not a MediaField, this should do nothing.
-        item = self.add_item_fixture()
+        item = self.add_item_fixture(year=2000)
         clean_year = item.year
         item.date = u'foo'
         item.write()
@@ -1172,6 +1226,14 @@ class ItemReadTest(unittest.TestCase):
         with self.assertRaises(beets.library.ReadError):
             item.read('/thisfiledoesnotexist')
 
+    def test_read_only_given_fields(self):
+        path = os.path.join(_common.RSRC, b'full.mp3')
+        item = beets.library.Item(title=u'old title', album=u'old album')
+        item.read(path, fields=['album', 'not_a_field'])
+        self.assertEqual(item.album, u'the album')
+        self.assertEqual(item.title, u'old title')
+        self.assertEqual(item.path, path)
+
 
 class FilesizeTest(unittest.TestCase, TestHelper):
     def setUp(self):
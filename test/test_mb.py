@@ -21,6 +21,7 @@ from test import _common
 from beets.autotag import mb
 from beets import config
 
+import os
 import unittest
 import mock
 
@@ -420,6 +421,14 @@ class ArtistFlatteningTest(_common.TestCase):
 
 
 class MBLibraryTest(unittest.TestCase):
+    def tearDown(self):
+        mb.configure()
+
+    def test_rate_limit_shared_by_processes(self):
+        with mock.patch('musicbrainzngs.set_rate_limit') as p:
+            mb.configure(3)
+        p.assert_called_once_with(3.0, 1)
+
     def test_match_track(self):
         with mock.patch('musicbrainzngs.search_recordings') as p:
             p.return_value = {
@@ -492,6 +501,82 @@ class MBLibraryTest(unittest.TestCase):
             self.assertEqual(ail, [])
 
 
+class ResponseCacheTest(_common.TestCase):
+    mbid = 'd2a6f856-b553-40a0-ac54-a321e8e2da99'
+
+    def setUp(self):
+        super(ResponseCacheTest, self).setUp()
+        config['musicbrainz']['cache'] = True
+        config['musicbrainz']['cache_path'] = \
+            os.path.join(self.temp_dir, b'mbcache.db').decode('utf-8')
+        mb.configure()
+
+    def tearDown(self):
+        mb.configure()
+        super(ResponseCacheTest, self).tearDown()
+
+    def _release(self, title=u'hi'):
+        return {'release': {
+            'title': title,
+            'id': self.mbid,
+            'medium-list': [],
+            'artist-credit': [{'artist': {'name': u'x', 'id': u'y'}}],
+            'release-group': {'id': u'z'},
+        }}
+
+    def test_release_fetched_once(self):
+        with mock.patch('musicbrainzngs.get_release_by_id') as gp:
+            gp.return_value = self._release()
+            self.assertEqual(mb.album_for_id(self.mbid).album, u'hi')
+            self.assertEqual(mb.album_for_id(self.mbid).album, u'hi')
+        self.assertEqual(gp.call_count, 1)
+        self.assertEqual(mb.response_cache().hits, 1)
+        self.assertEqual(mb.response_cache().misses, 1)
+
+    def test_cache_persists(self):
+        with mock.patch('musicbrainzngs.get_release_by_id') as gp:
+            gp.return_value = self._release()
+            mb.album_for_id(self.mbid)
+            mb.configure()
+            mb.album_for_id(self.mbid)
+        self.assertEqual(gp.call_count, 1)
+
+    def test_stale_response_fetched_again(self):
+        config['musicbrainz']['cache_ttl'] = 0
+        with mock.patch('musicbrainzngs.get_release_by_id') as gp:
+            gp.return_value = self._release()
+            mb.album_for_id(self.mbid)
+            gp.return_value = self._release(u'new')
+            self.assertEqual(mb.album_for_id(self.mbid).album, u'new')
+        self.assertEqual(gp.call_count, 2)
+
+    def test_offline_uses_stale_response(self):
+        config['musicbrainz']['cache_ttl'] = 0
+        with mock.patch('musicbrainzngs.get_release_by_id') as gp:
+            gp.return_value = self._release()
+            mb.album_for_id(self.mbid)
+            config['musicbrainz']['offline'] = True
+            self.assertEqual(mb.album_for_id(self.mbid).album, u'hi')
+        self.assertEqual(gp.call_count, 1)
+
+    def test_offline_miss_returns_none(self):
+        config['musicbrainz']['offline'] = True
+        with mock.patch('musicbrainzngs.get_recording_by_id') as gp:
+            self.assertIsNone(mb.track_for_id(self.mbid))
+        self.assertFalse(gp.called)
+
+    def test_size_bounded(self):
+        cache = mb.response_cache()
+        cache.size = 2
+        with mock.patch('time.time', side_effect=[1.0, 2.0, 3.0]):
+            for mbid in ('a', 'b', 'c'):
+                cache.put(u'release', mbid, [], {'id': mbid})
+        cache._prune()
+        self.assertIsNone(cache.get(u'release', 'a', [], stale=True))
+        self.assertEqual(cache.get(u'release', 'c', [], stale=True),
+                         {'id': u'c'})
+
+
 def suite():
     return unittest.TestLoader().loadTestsFromName(__name__)
 
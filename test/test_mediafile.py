@@ -21,13 +21,16 @@ from __future__ import division, absolute_import, print_function
 import os
 import shutil
 import datetime
+import mutagen.id3
 import time
 import unittest
+from mock import patch
 from six import assertCountEqual
 
 from test import _common
-from beets.mediafile import MediaFile, Image, \
-    ImageType, CoverArtField, UnreadableFileError
+from beets.mediafile import MediaFile, MediaField, Image, \
+    MP3DescStorageStyle, StorageStyle, ImageType, CoverArtField, \
+    UnreadableFileError
 
 
 class ArtTestMixin(object):
@@ -208,7 +211,6 @@ class LazySaveTestMixin(object):
     """Mediafile should only write changes when tags have changed
     """
 
-    @unittest.skip(u'not yet implemented')
     def test_unmodified(self):
         mediafile = self._mediafile_fixture('full')
         mtime = self._set_past_mtime(mediafile.path)
@@ -217,7 +219,6 @@ class LazySaveTestMixin(object):
         mediafile.save()
         self.assertEqual(os.stat(mediafile.path).st_mtime, mtime)
 
-    @unittest.skip(u'not yet implemented')
     def test_same_tag_value(self):
         mediafile = self._mediafile_fixture('full')
         mtime = self._set_past_mtime(mediafile.path)
@@ -236,7 +237,6 @@ class LazySaveTestMixin(object):
         mediafile.save()
         self.assertEqual(os.stat(mediafile.path).st_mtime, mtime)
 
-    @unittest.skip(u'not yet implemented')
     def test_tag_value_change(self):
         mediafile = self._mediafile_fixture('full')
         mtime = self._set_past_mtime(mediafile.path)
@@ -256,6 +256,21 @@ class LazySaveTestMixin(object):
         mediafile.save()
         self.assertNotEqual(os.stat(mediafile.path).st_mtime, mtime)
 
+    def test_update_deleted_empty_tag(self):
+        mediafile = self._mediafile_fixture('empty')
+        mtime = self._set_past_mtime(mediafile.path)
+
+        mediafile.update({'title': None, 'genres': None})
+        self.assertFalse(mediafile.save())
+        self.assertEqual(os.stat(mediafile.path).st_mtime, mtime)
+
+    def test_force_save(self):
+        mediafile = self._mediafile_fixture('full')
+        mtime = self._set_past_mtime(mediafile.path)
+
+        self.assertTrue(mediafile.save(force=True))
+        self.assertNotEqual(os.stat(mediafile.path).st_mtime, mtime)
+
     def _set_past_mtime(self, path):
         mtime = round(time.time() - 10000)
         os.utime(path, (mtime, mtime))
@@ -296,7 +311,7 @@ class GenreListTestMixin(object):
         assertCountEqual(self, mediafile.genres, [u'the genre', u'another'])
 
 
-class ReadWriteTestBase(ArtTestMixin, GenreListTestMixin,
+class ReadWriteTestBase(ArtTestMixin, GenreListTestMixin, LazySaveTestMixin,
                         _common.TempDirMixin):
     """Test writing and reading tags. Subclasses must set ``extension``
     and ``audio_properties``.
@@ -734,6 +749,26 @@ class MP3Test(ReadWriteTestBase, PartialTestMixin,
         mediafile = self._mediafile_fixture('image_unknown_type')
         self.assertEqual(mediafile.images[0].type, ImageType.other)
 
+    def test_unchanged_file_converted_to_id3v23(self):
+        path = self._mediafile_fixture('full').path
+        self.assertEqual(MediaFile(path).mgfile.tags.version[:2], (2, 4))
+
+        self.assertTrue(MediaFile(path, id3v23=True).save())
+        self.assertEqual(MediaFile(path).mgfile.tags.version[:2], (2, 3))
+        self.assertFalse(MediaFile(path, id3v23=True).save())
+
+    def test_delete_zero_track(self):
+        mediafile = self._mediafile_fixture('empty')
+        mediafile.mgfile['TRCK'] = mutagen.id3.TRCK(encoding=3, text=[u'0'])
+        mediafile.save(force=True)
+        self.assertEqual(MediaFile(mediafile.path).mgfile['TRCK'].text,
+                         [u'0'])
+
+        mediafile = MediaFile(mediafile.path)
+        del mediafile.track
+        self.assertTrue(mediafile.save())
+        self.assertNotIn('TRCK', MediaFile(mediafile.path).mgfile)
+
 
 class MP4Test(ReadWriteTestBase, PartialTestMixin,
               ImageStructureTestMixin, unittest.TestCase):
@@ -865,6 +900,29 @@ class FlacTest(ReadWriteTestBase, PartialTestMixin,
         'channels': 1,
     }
 
+    def test_same_value_written_to_missing_style(self):
+        mediafile = self._mediafile_fixture('empty')
+        mediafile.mgfile['LABEL'] = [u'the label']
+        mediafile.save(force=True)
+
+        mediafile = MediaFile(mediafile.path)
+        self.assertEqual(mediafile.label, u'the label')
+        mediafile.label = u'the label'
+        self.assertTrue(mediafile.save())
+        self.assertEqual(MediaFile(mediafile.path).mgfile['PUBLISHER'],
+                         [u'the label'])
+
+    def test_delete_empty_tag(self):
+        mediafile = self._mediafile_fixture('empty')
+        mediafile.mgfile['TITLE'] = [u'']
+        mediafile.save(force=True)
+        mediafile = MediaFile(mediafile.path)
+        self.assertEqual(mediafile.title, u'')
+
+        del mediafile.title
+        self.assertTrue(mediafile.save())
+        self.assertIsNone(MediaFile(mediafile.path).title)
+
 
 class ApeTest(ReadWriteTestBase, ExtendedImageStructureTestMixin,
               unittest.TestCase):
@@ -962,6 +1020,45 @@ class MediaFieldTest(unittest.TestCase):
         for field in MediaFile.fields():
             self.assertIn(field, readable)
 
+    def test_styles_resolved_per_format(self):
+        mp3 = MediaFile(os.path.join(_common.RSRC, b'full.mp3'))
+        flac = MediaFile(os.path.join(_common.RSRC, b'full.flac'))
+        field = MediaFile.__dict__['title']
+        styles = field.styles(mp3.mgfile)
+        self.assertIs(field.styles(mp3.mgfile), styles)
+        self.assertEqual(styles, [s for s in field._styles
+                                  if 'MP3' in s.formats])
+        self.assertNotEqual(field.styles(flac.mgfile), styles)
+
+    def test_images_decoded_once(self):
+        mediafile = MediaFile(os.path.join(_common.RSRC, b'image.mp3'))
+        style, = MediaFile.__dict__['images'].styles(mediafile.mgfile)
+        with patch.object(style, 'get_list', wraps=style.get_list) as get:
+            self.assertIsNotNone(mediafile.art)
+            images = mediafile.images
+            images.pop()
+            self.assertEqual(len(mediafile.images), 2)
+            self.assertEqual(get.call_count, 1)
+
+            mediafile.images = images
+            self.assertEqual(len(mediafile.images), 1)
+            self.assertEqual(get.call_count, 2)
+
+    def test_is_field_follows_added_and_removed_fields(self):
+        self.assertTrue(MediaFile.is_field('title'))
+        self.assertFalse(MediaFile.is_field('customtag'))
+        MediaFile.add_field('customtag', MediaField(
+            MP3DescStorageStyle(u'customtag'),
+            StorageStyle(u'customtag'),
+        ))
+        try:
+            self.assertTrue(MediaFile.is_field('customtag'))
+            self.assertIn('customtag', MediaFile.fields())
+        finally:
+            delattr(MediaFile, 'customtag')
+        self.assertFalse(MediaFile.is_field('customtag'))
+        self.assertNotIn('customtag', MediaFile.fields())
+
 
 def suite():
     return unittest.TestLoader().loadTestsFromName(__name__)
@@ -17,7 +17,9 @@
 """
 from __future__ import division, absolute_import, print_function
 
+import os
 import six
+import time
 import unittest
 
 from beets.util import pipeline
@@ -119,6 +121,153 @@ class ParallelStageTest(unittest.TestCase):
         self.assertEqual(list(pl.pull()), [0, 2, 4, 6, 8])
 
 
+def _uneven_work():
+    # Take longer for even numbers so that messages overtake each other
+    # in a parallel stage.
+    i = None
+    while True:
+        i = yield i
+        time.sleep(0.01 if i % 2 == 0 else 0)
+        i *= 2
+
+
+class OrderedParallelStageTest(unittest.TestCase):
+    def test_run_parallel(self):
+        l = []
+        pl = pipeline.Pipeline((
+            _produce(20),
+            pipeline.ordered([_uneven_work() for _ in range(4)]),
+            _consume(l),
+        ))
+        pl.run_parallel(1)
+        self.assertEqual(l, [i * 2 for i in range(20)])
+
+    def test_run_sequential(self):
+        l = []
+        pl = pipeline.Pipeline((
+            _produce(), pipeline.ordered([_work(), _work()]), _consume(l)
+        ))
+        pl.run_sequential()
+        self.assertEqual(l, [0, 2, 4, 6, 8])
+
+    def test_bubble(self):
+        l = []
+        pl = pipeline.Pipeline((
+            _produce(),
+            pipeline.ordered([_bub_work(), _bub_work()]),
+            _consume(l),
+        ))
+        pl.run_parallel()
+        self.assertEqual(l, [0, 2, 4, 8])
+
+    def test_exception(self):
+        pl = pipeline.Pipeline((
+            _produce(100),
+            pipeline.ordered([_exc_work(), _exc_work()]),
+            _consume([]),
+        ))
+        self.assertRaises(TestException, pl.run_parallel, 1)
+
+
+@pipeline.process_stage
+def _process_work(factor, num):
+    if num == 3:
+        raise TestException()
+    return num * factor
+
+
+@pipeline.process_stage
+def _process_bub_work(num):
+    if num == 3:
+        return pipeline.BUBBLE
+    return num, os.getpid()
+
+
+_worker_value = None
+
+
+def _init_worker(value):
+    global _worker_value
+    _worker_value = value
+
+
+@pipeline.process_stage
+def _process_worker_value(num):
+    return num, _worker_value
+
+
+class ProcessStageTest(unittest.TestCase):
+    def test_run_sequential(self):
+        l = []
+        pl = pipeline.Pipeline((_produce(3), _process_work(2), _consume(l)))
+        pl.run_sequential()
+        self.assertEqual(l, [0, 2, 4])
+
+    def test_run_multiprocess(self):
+        l = []
+        pl = pipeline.Pipeline((
+            _produce(20), _process_bub_work(), _consume(l)
+        ))
+        pl.run_multiprocess(processes=2)
+        self.assertEqual([num for num, _ in l],
+                         [i for i in range(20) if i != 3])
+        self.assertNotIn(os.getpid(), [pid for _, pid in l])
+
+    def test_initializer(self):
+        l = []
+        pl = pipeline.Pipeline((
+            _produce(4), _process_worker_value(), _consume(l)
+        ))
+        pl.run_multiprocess(processes=2, initializer=_init_worker,
+                            initargs=(u'ready',))
+        self.assertEqual(l, [(i, u'ready') for i in range(4)])
+        self.assertIsNone(_worker_value)
+
+    def test_exception(self):
+        pl = pipeline.Pipeline((_produce(), _process_work(2), _consume([])))
+        self.assertRaises(TestException, pl.run_multiprocess, 1, 2)
+
+
+class StatsTest(unittest.TestCase):
+    def test_run_parallel(self):
+        pl = pipeline.Pipeline((
+            _produce(10),
+            pipeline.ordered([_uneven_work(), _uneven_work()], u'double'),
+            _consume([]),
+        ))
+        pl.run_parallel(2)
+        self.assertEqual([s.name for s in pl.stats],
+                         [u'_produce', u'double', u'_consume'])
+        self.assertEqual([s.workers for s in pl.stats], [1, 2, 1])
+        self.assertEqual([s.received for s in pl.stats], [0, 10, 10])
+        self.assertEqual([s.sent for s in pl.stats], [10, 10, 0])
+        self.assertGreater(pl.stats[1].busy, 0)
+        self.assertTrue(1 <= pl.stats[1].queue_max <= 2)
+
+    def test_run_sequential(self):
+        pl = pipeline.Pipeline((_produce(), _bub_work(), _consume([])))
+        pl.run_sequential()
+        self.assertEqual([s.received for s in pl.stats], [0, 5, 4])
+        self.assertEqual([s.sent for s in pl.stats], [5, 4, 0])
+        self.assertEqual(pl.stats[1].as_dict()['name'], u'_bub_work')
+
+    def test_decorated_stage_names(self):
+        @pipeline.stage
+        def add(n, i):
+            return i + n
+
+        @pipeline.mutator_stage
+        def collect(l, i):
+            l.append(i)
+
+        l = []
+        pl = pipeline.Pipeline([iter([1, 2]), add(2), collect(l)])
+        pl.run_sequential()
+        self.assertEqual(l, [3, 4])
+        self.assertEqual([s.name for s in pl.stats[1:]],
+                         [u'add', u'collect'])
+
+
 class ExceptionTest(unittest.TestCase):
     def setUp(self):
         self.l = []
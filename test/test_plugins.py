@@ -24,6 +24,7 @@ import unittest
 from beets.importer import SingletonImportTask, SentinelImportTask, \
     ArchiveImportTask, action
 from beets import plugins, config, ui
+from beets.autotag.hooks import Distance
 from beets.library import Item
 from beets.dbcore import types
 from beets.mediafile import MediaFile
@@ -92,6 +93,34 @@ class ItemTypesTest(unittest.TestCase, TestHelper):
         self.assertNotIn(u'aaa', out)
 
 
+class ItemFieldGettersTest(unittest.TestCase, TestHelper):
+
+    def setUp(self):
+        self.setup_plugin_loader()
+
+    def tearDown(self):
+        self.teardown_plugin_loader()
+        self.teardown_beets()
+
+    def test_getters_cached(self):
+        self.assertIs(Item._getters(), Item._getters())
+
+    def test_getters_invalidated(self):
+        class FieldPlugin(plugins.BeetsPlugin):
+            pass
+
+        item = Item()
+        self.assertNotIn('foo', Item._getters())
+
+        self.register_plugin(FieldPlugin)
+        plugin = plugins.find_plugins()[0]
+        self.assertNotIn('foo', Item._getters())
+
+        plugin.template_fields['foo'] = lambda item: u'bar'
+        plugins.invalidate_cache()
+        self.assertEqual(item.foo, u'bar')
+
+
 class ItemWriteTest(unittest.TestCase, TestHelper):
 
     def setUp(self):
@@ -276,6 +305,63 @@ class EventsTest(unittest.TestCase, ImportHelper, TestHelper):
         ])
 
 
+class LookupPluginsTest(unittest.TestCase, TestHelper):
+    def setUp(self):
+        self.setup_plugin_loader()
+
+    def tearDown(self):
+        self.teardown_plugin_loader()
+        self.teardown_beets()
+
+    def test_plugins_taking_part_in_lookup(self):
+        class PlainPlugin(plugins.BeetsPlugin):
+            def __init__(self):
+                super(PlainPlugin, self).__init__()
+                self.register_listener('import_task_start', self.start)
+
+            def start(self):
+                pass
+
+        class SourcePlugin(plugins.BeetsPlugin):
+            def candidates(self, items, artist, album, va_likely):
+                return ()
+
+        class ListeningPlugin(plugins.BeetsPlugin):
+            def __init__(self):
+                super(ListeningPlugin, self).__init__()
+                self.register_listener('albuminfo_received', self.received)
+
+            def received(self, info):
+                pass
+
+        for plugin_class in (PlainPlugin, SourcePlugin, ListeningPlugin):
+            self.register_plugin(plugin_class)
+        self.assertEqual(
+            sorted(type(p).__name__ for p in plugins.lookup_plugins()),
+            ['ListeningPlugin', 'SourcePlugin'])
+
+    def test_distance_plugins(self):
+        class PlainPlugin(plugins.BeetsPlugin):
+            pass
+
+        class TrackPlugin(plugins.BeetsPlugin):
+            def track_distance(self, item, info):
+                return Distance()
+
+        class AlbumPlugin(plugins.BeetsPlugin):
+            def album_distance(self, items, album_info, mapping):
+                return Distance()
+
+        for plugin_class in (PlainPlugin, TrackPlugin, AlbumPlugin):
+            self.register_plugin(plugin_class)
+        self.assertEqual(
+            [type(p).__name__ for p in plugins.track_distance_plugins()],
+            ['TrackPlugin'])
+        self.assertEqual(
+            [type(p).__name__ for p in plugins.album_distance_plugins()],
+            ['AlbumPlugin'])
+
+
 class HelpersTest(unittest.TestCase):
 
     def test_sanitize_choices(self):
@@ -343,6 +429,34 @@ class ListenersTest(unittest.TestCase, TestHelper):
         d.foo.assert_called_once_with(var=u"tagada")
         d.bar.assert_has_calls([])
 
+    def test_handler_table_cached(self):
+        calls = []
+
+        class DummyPlugin(plugins.BeetsPlugin):
+            def __init__(self):
+                super(DummyPlugin, self).__init__()
+                self.register_listener('event_foo', self.foo)
+
+            def foo(self):
+                calls.append('foo')
+
+        self.register_plugin(DummyPlugin)
+        plugins.send('event_foo')
+        d = plugins.find_plugins()[0]
+        self.assertEqual(calls, ['foo'])
+
+        with patch('beets.plugins.find_plugins') as mock_find_plugins:
+            plugins.send('event_foo')
+            self.assertFalse(mock_find_plugins.called)
+        self.assertEqual(calls, ['foo', 'foo'])
+
+        # Registering a listener invalidates the table.
+        def bar():
+            calls.append('bar')
+        d.register_listener('event_foo', bar)
+        plugins.send('event_foo')
+        self.assertEqual(calls, ['foo', 'foo', 'foo', 'bar'])
+
     @patch('beets.plugins.find_plugins')
     def test_listener_params(self, mock_find_plugins):
         test = self
@@ -773,6 +773,89 @@ class NoneQueryTest(unittest.TestCase, TestHelper):
         self.assertInResult(item, matched)
 
 
+class SubstringPrefixQuery(dbcore.query.StringFieldQuery):
+    """A plugin-style query type with no SQL implementation of its own.
+    """
+    @classmethod
+    def string_match(cls, pattern, value):
+        return value.startswith(pattern)
+
+
+class QueryPlanTest(DummyDataTestCase):
+    def setUp(self):
+        super(QueryPlanTest, self).setUp()
+        item = self.lib.items(u'title:foo').get()
+        item.flex = u'flex value'
+        item.store()
+        item = self.lib.items(u'title:qux').get()
+        item.flex = u'other'
+        item.store()
+
+    def plan(self, q):
+        return q.plan(Item)
+
+    def test_flex_query_runs_in_sql(self):
+        q = dbcore.query.SubstringQuery(u'flex', u'value', False)
+        clause, subvals, slow = self.plan(q)
+        self.assertIsNotNone(clause)
+        self.assertIsNone(slow)
+        self.assert_items_matched(self.lib.items(q), [u'foo bar'])
+
+    def test_flex_query_empty_pattern_matches_missing(self):
+        q = dbcore.query.SubstringQuery(u'flex', u'', False)
+        self.assert_items_matched_all(self.lib.items(q))
+
+    def test_negated_flex_query_matches_missing(self):
+        q = dbcore.query.NotQuery(
+            dbcore.query.MatchQuery(u'flex', u'other', False)
+        )
+        self.assert_items_matched(self.lib.items(q),
+                                  [u'foo bar', u'beets 4 eva'])
+
+    def test_flex_regexp_runs_in_sql(self):
+        q = dbcore.query.RegexpQuery(u'flex', u'^o', False)
+        self.assertIsNone(self.plan(q)[2])
+        self.assert_items_matched(self.lib.items(q), [u'baz qux'])
+
+    def test_regexp_runs_in_sql(self):
+        q = dbcore.query.RegexpQuery(u'title', u'^b')
+        self.assertIsNone(self.plan(q)[2])
+        self.assert_items_matched(self.lib.items(q),
+                                  [u'baz qux', u'beets 4 eva'])
+
+    def test_custom_string_query_runs_in_sql(self):
+        q = SubstringPrefixQuery(u'title', u'foo')
+        self.assertIsNone(self.plan(q)[2])
+        self.assert_items_matched(self.lib.items(q), [u'foo bar'])
+
+    def test_custom_string_query_on_flex_field(self):
+        q = SubstringPrefixQuery(u'flex', u'oth', False)
+        self.assertIsNone(self.plan(q)[2])
+        self.assert_items_matched(self.lib.items(q), [u'baz qux'])
+
+    def test_computed_field_runs_in_python(self):
+        q = dbcore.query.AndQuery([
+            dbcore.query.SubstringQuery(u'title', u'b'),
+            dbcore.query.MatchQuery(u'singleton', False, False),
+        ])
+        clause, subvals, slow = self.plan(q)
+        self.assertIsNotNone(clause)
+        self.assertEqual(slow, q.subqueries[1])
+        self.assert_items_matched(self.lib.items(q),
+                                  [u'foo bar', u'baz qux'])
+
+    def test_or_with_computed_field_runs_in_python(self):
+        q = dbcore.query.OrQuery([
+            dbcore.query.SubstringQuery(u'title', u'foo'),
+            dbcore.query.MatchQuery(u'singleton', True, False),
+        ])
+        clause, subvals, slow = self.plan(q)
+        self.assertIsNone(clause)
+        self.assertEqual(slow, q)
+        self.assert_items_matched(self.lib.items(q),
+                                  [u'foo bar', u'beets 4 eva'])
+
+
 class NotQueryMatchTest(_common.TestCase):
     """Test `query.NotQuery` matching against a single item, using the same
     cases and assertions as on `MatchTest`, plus assertion on the negated
@@ -18,10 +18,12 @@
 from __future__ import division, absolute_import, print_function
 
 import unittest
+from mock import patch
 from test import _common
 import beets.library
 from beets import dbcore
 from beets import config
+from beets.dbcore import types
 
 
 # A test case class providing a library with some dummy data and some
@@ -160,6 +162,25 @@ class SortFixedFieldTest(DummyDataTestCase):
 
 
 class SortFlexFieldTest(DummyDataTestCase):
+    def test_sort_is_fast(self):
+        _, sort = beets.library.parse_query_string(u'flex1+',
+                                                   beets.library.Item)
+        self.assertFalse(sort.is_slow())
+        self.assertIsNotNone(sort.order_clause())
+
+    def test_sort_typed_flex_field(self):
+        items = list(self.lib.items(u'id+'))
+        for item, value in zip(items, [10, 9, 100]):
+            item.flexint = value
+            item.store()
+        with patch.dict(beets.library.Item._types,
+                        {'flexint': types.Integer()}):
+            results = list(self.lib.items(u'flexint+'))
+        # The item without the field comes first; the others are
+        # sorted as numbers.
+        self.assertEqual([r.id for r in results],
+                         [items[3].id, items[1].id, items[0].id, items[2].id])
+
     def test_sort_asc(self):
         q = u''
         sort = dbcore.query.SlowFieldSort(u"flex1", True)
@@ -528,7 +549,7 @@ class NonExistingFieldTest(DummyDataTestCase):
         self.assertEqual(len(query.subqueries), 1)
         self.assertTrue(isinstance(query.subqueries[0],
                                    dbcore.query.TrueQuery))
-        self.assertTrue(isinstance(sort, dbcore.query.SlowFieldSort))
+        self.assertTrue(isinstance(sort, dbcore.query.FlexFieldSort))
         self.assertEqual(sort.field, u'-bar')
 
 
@@ -22,6 +22,7 @@ import shutil
 import re
 import subprocess
 import platform
+import threading
 from copy import deepcopy
 import six
 import unittest
@@ -71,6 +72,12 @@ class ListTest(unittest.TestCase):
             out = out.decode(stdout.encoding)
         self.assertTrue(u'na\xefve' in out)
 
+    def test_list_limit(self):
+        self.lib.add(_common.item())
+        with capture_stdout() as stdout:
+            commands.list_items(self.lib, u'', False, limit=1)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 1)
+
     def test_list_item_path(self):
         stdout = self._run_list(fmt=u'$path')
         self.assertEqual(stdout.getvalue().strip(), u'xxx/yyy')
@@ -398,6 +405,39 @@ class WriteTest(unittest.TestCase, TestHelper):
         self.assertTrue(u'{0} -> new title'.format(old_title)
                         in output)
 
+    def test_write_in_threads(self):
+        items = [self.add_item_fixture(title=u'title {0}'.format(i))
+                 for i in range(4)]
+
+        output = self.write_cmd('-j', '3')
+        self.assertEqual([line for line in output.splitlines()
+                          if line.startswith(u'  title:')],
+                         [u'  title: min -> title {0}'.format(i)
+                          for i in range(4)])
+        for item in items:
+            item.load()
+            self.assertEqual(MediaFile(syspath(item.path)).title, item.title)
+            self.assertEqual(item.mtime, item.current_mtime())
+
+    def test_write_events_sent_from_main_thread(self):
+        for i in range(4):
+            self.add_item_fixture(title=u'title {0}'.format(i))
+
+        threads = []
+        send = plugins.send
+
+        def record(event, **kwargs):
+            threads.append((event, threading.current_thread()))
+            return send(event, **kwargs)
+
+        with patch('beets.plugins.send', side_effect=record):
+            self.write_cmd('-j', '3')
+        main = threading.current_thread()
+        self.assertEqual([event for event, _ in threads
+                          if event in ('write', 'after_write')],
+                         ['write'] * 4 + ['after_write'] * 4)
+        self.assertTrue(all(thread is main for _, thread in threads))
+
 
 class MoveTest(_common.TestCase):
     def setUp(self):
@@ -528,12 +568,43 @@ class UpdateTest(_common.TestCase):
         commands.update_items(self.lib, query, album, move, False,
                               fields=fields)
 
+    def test_update_in_threads(self):
+        items = []
+        for i in range(4):
+            path = os.path.join(self.temp_dir, b'copy%d.mp3' % i)
+            shutil.copy(self.i.path, path)
+            items.append(library.Item.from_path(path))
+            self.lib.add(items[-1])
+        for i, item in enumerate(items):
+            mf = MediaFile(syspath(item.path))
+            mf.title = u'title {0}'.format(i)
+            mf.save()
+            item.mtime = 0
+            item.store()
+
+        config['ui']['color'] = False
+        commands.update_items(self.lib, (), False, False, False, None, jobs=3)
+        output = self.io.getoutput()
+        self.assertEqual(output.count(u'title:'), 4)
+        self.assertLess(output.index(u'title 0'), output.index(u'title 3'))
+        for i, item in enumerate(items):
+            item.load()
+            self.assertEqual(item.title, u'title {0}'.format(i))
+            self.assertEqual(item.mtime, item.current_mtime())
+
     def test_delete_removes_item(self):
         self.assertTrue(list(self.lib.items()))
         os.remove(self.i.path)
         self._update()
         self.assertFalse(list(self.lib.items()))
 
+    def test_unchanged_file_checked_with_one_stat(self):
+        self.i.mtime = self.i.current_mtime()
+        self.i.store()
+        with patch('os.stat', wraps=os.stat) as stat:
+            self._update(reset_mtime=False)
+        self.assertEqual(stat.call_count, 1)
+
     def test_delete_removes_album(self):
         self.assertTrue(self.lib.albums())
         os.remove(self.i.path)
@@ -641,6 +712,84 @@ class UpdateTest(_common.TestCase):
         item = self.lib.items().get()
         self.assertEqual(item.title, u'full')
 
+    def _scan(self, query=()):
+        commands.update_items(self.lib, query, False, False, False,
+                              fields=None, scan=True)
+
+    def test_scan_records_signature(self):
+        self._scan()
+        st = os.stat(syspath(self.i.path))
+        self.assertEqual(self.lib.item_stats(),
+                         {self.i.id: (self.lib.items().get().mtime,
+                                      st.st_size, st.st_ino)})
+        self.assertNotIn('size', self.lib.items().get().keys())
+
+    def test_scan_skips_unchanged_file(self):
+        self._scan()
+        with patch.object(library.Library, 'get_item') as get_item:
+            with patch.object(library.Item, 'read') as read:
+                self._scan()
+        get_item.assert_not_called()
+        read.assert_not_called()
+
+    def test_scan_detects_size_change(self):
+        self._scan()
+        mtime = os.path.getmtime(syspath(self.i.path))
+        mf = MediaFile(syspath(self.i.path))
+        mf.title = u'differentTitle'
+        mf.lyrics = u'la' * 5000  # Too long for the tag's padding.
+        mf.save()
+        os.utime(syspath(self.i.path), (mtime, mtime))
+
+        self._update(reset_mtime=False)
+        self.assertEqual(self.lib.items().get().title, u'full')
+        self._scan()
+        self.assertEqual(self.lib.items().get().title, u'differentTitle')
+
+    def test_scan_follows_moved_file(self):
+        self._scan()
+        new_path = os.path.join(self.libdir, b'moved.mp3')
+        os.rename(syspath(self.i.path), syspath(new_path))
+        self._scan()
+        item = self.lib.items().get()
+        self.assertEqual(item.path, new_path)
+        self.assertEqual(item.title, u'full')
+        self.assertIn(u'moved.mp3', self.io.getoutput())
+
+    def test_scan_removes_deleted_item(self):
+        self._scan()
+        os.remove(syspath(self.i.path))
+        self._scan()
+        self.assertFalse(list(self.lib.items()))
+        self.assertEqual(self.lib.item_stats(), {})
+
+    def test_scan_reports_new_file(self):
+        new_path = os.path.join(self.libdir, b'new.mp3')
+        shutil.copy(syspath(self.i.path), syspath(new_path))
+        _common.touch(os.path.join(self.libdir, b'notes.txt'))
+        self._scan()
+        output = self.io.getoutput()
+        self.assertIn(u'new.mp3', output)
+        self.assertIn(u'not in library', output)
+        self.assertNotIn(u'notes.txt', output)
+
+    def test_scan_limited_to_query_directories(self):
+        other_dir = os.path.join(self.libdir, b'other')
+        os.mkdir(other_dir)
+        shutil.copy(syspath(self.i.path),
+                    syspath(os.path.join(other_dir, b'new.mp3')))
+        shutil.copy(syspath(self.i.path),
+                    syspath(os.path.join(os.path.dirname(self.i.path),
+                                         b'sibling.mp3')))
+        self._scan([u'title:full'])
+        output = self.io.getoutput()
+        self.assertIn(u'sibling.mp3', output)
+        self.assertNotIn(u'new.mp3', output)
+
+    def test_scan_with_unmatched_query(self):
+        with self.assertRaises(ui.UserError):
+            self._scan([u'title:nothing'])
+
 
 class PrintTest(_common.TestCase):
     def setUp(self):
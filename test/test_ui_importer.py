@@ -96,6 +96,7 @@ class TerminalImportSessionSetup(object):
         if not hasattr(self, 'io'):
             self.io = DummyIO()
         self.io.install()
+        self.addCleanup(self.io.restore)
         self.importer = TestTerminalImportSession(
             self.lib, loghandler=None, query=None, io=self.io,
             paths=[import_dir or self.import_dir],
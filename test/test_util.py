@@ -187,6 +187,71 @@ class PathTruncationTest(_common.TestCase):
         self.assertEqual(p, u'abcde/f.ext')
 
 
+class LRUCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.cache = util.LRUCache(2)
+
+    def double(self, value):
+        self.calls.append(value)
+        return value * 2
+
+    def test_result_cached(self):
+        self.assertEqual(self.cache.call(self.double, 1), 2)
+        self.assertEqual(self.cache.call(self.double, 1), 2)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.hit_rate, 0.5)
+
+    def test_least_recently_used_forgotten(self):
+        self.cache.call(self.double, 1)
+        self.cache.call(self.double, 2)
+        self.cache.call(self.double, 1)
+        self.cache.call(self.double, 3)
+        self.cache.call(self.double, 1)
+        self.cache.call(self.double, 2)
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+
+    def test_clear(self):
+        self.cache.call(self.double, 1)
+        self.cache.clear()
+        self.cache.call(self.double, 1)
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        self.assertEqual(self.cache.hit_rate, 0.0)
+
+
+class StatWalkTest(_common.TestCase):
+    def setUp(self):
+        super(StatWalkTest, self).setUp()
+        self.base = os.path.join(self.temp_dir, b'walk')
+        for path in (b'a.mp3', b'sub/b.mp3', b'sub/c.txt', b'.hidden/d.mp3'):
+            path = os.path.join(self.base, path)
+            util.mkdirall(path)
+            _common.touch(path)
+
+    def _walk(self, **kwargs):
+        return {os.path.relpath(path, self.base): st.st_size
+                for path, st in util.stat_walk(self.base, **kwargs)}
+
+    def test_walk_recursive(self):
+        self.assertEqual(
+            set(self._walk()),
+            {b'a.mp3', os.path.join(b'sub', b'b.mp3'),
+             os.path.join(b'sub', b'c.txt'),
+             os.path.join(b'.hidden', b'd.mp3')},
+        )
+
+    def test_walk_not_recursive(self):
+        self.assertEqual(self._walk(recursive=False), {b'a.mp3': 0})
+
+    def test_ignore_patterns_and_hidden(self):
+        self.assertEqual(
+            set(self._walk(ignore=[u'*.txt'], ignore_hidden=True)),
+            {b'a.mp3', os.path.join(b'sub', b'b.mp3')},
+        )
+
+
 def suite():
     return unittest.TestLoader().loadTestsFromName(__name__)
 
@@ -7,6 +7,7 @@ from __future__ import division, absolute_import, print_function
 import json
 import unittest
 import os.path
+from mock import patch
 from six import assertCountEqual
 
 from test import _common
@@ -55,6 +56,30 @@ class WebPluginTest(_common.LibTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json['items']), 2)
 
+    def test_get_items_page(self):
+        pages = []
+        for offset in (0, 1):
+            response = self.client.get('/item/?limit=1&offset=%i' % offset)
+            response.json = json.loads(response.data.decode('utf-8'))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json['items']), 1)
+            pages.append(response.json['items'][0]['id'])
+        assertCountEqual(self, pages, [1, 2])
+
+    def test_results_streamed_only_in_wal_mode(self):
+        with patch.object(self.lib, 'items', return_value=[]) as items:
+            self.client.get('/item/')
+            self.assertFalse(items.call_args[1]['stream'])
+
+            self.lib.wal = True
+            self.client.get('/item/')
+            self.assertTrue(items.call_args[1]['stream'])
+
+    def test_get_items_negative_limit(self):
+        response = self.client.get('/item/?limit=-1')
+        self.assertEqual(response.status_code, 400)
+
     def test_get_single_item_by_id(self):
         response = self.client.get('/item/1')
         response.json = json.loads(response.data.decode('utf-8'))
@@ -117,6 +142,13 @@ class WebPluginTest(_common.LibTestCase):
         response_albums = [album['album'] for album in response.json['albums']]
         assertCountEqual(self, response_albums, [u'album', u'another album'])
 
+    def test_get_albums_page(self):
+        response = self.client.get('/album/?limit=1')
+        response.json = json.loads(response.data.decode('utf-8'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json['albums']), 1)
+
     def test_get_single_album_by_id(self):
         response = self.client.get('/album/2')
         response.json = json.loads(response.data.decode('utf-8'))